@@ -1,24 +1,27 @@
 import maya.cmds as cmds
-import pymel.core as pm
 import os
 import math
 import random
 import functools
 
-treeTrunkShader = cmds.shadingNode('lambert', asShader=True)
-cmds.setAttr(treeTrunkShader + '.color', 0.4, 0.3, 0.3, type='double3')
-treeTrunkShaderSG = cmds.sets(renderable=1, noSurfaceShader=1, empty=1, name='treeTrunkShaderSG');
-cmds.connectAttr(treeTrunkShader + '.outColor', treeTrunkShaderSG + '.surfaceShader', f=1)
-
-foliageShader = cmds.shadingNode('lambert', asShader=True)
-cmds.setAttr(foliageShader + '.color', 0.30, 0.7, 0.40, type='double3')
-foliageShaderSG = cmds.sets(renderable=True, noSurfaceShader=True, empty=True, name='foliageShaderSG');
-cmds.connectAttr(foliageShader + '.outColor', foliageShaderSG + '.surfaceShader', force=True)
+from polytree import pipeline
+from polytree.budget import MAX_FACES, MAX_SEGMENTS, Budget, BudgetExceeded
+from polytree.cache import TreeCache
+from polytree.diskcache import environment_cache
+from polytree.params import TreeParams
+from polytree.presets import write_preset
+from polytree.shading import FOLIAGE_SHADER, TRUNK_SHADER, lambert
+from polytree.sinks import MayaSink
 
 
 class Minitree():
 
     def __init__(self):
+        # skeletons are also kept on disk when POLYTREE_CACHE names a directory
+        self.cache = TreeCache(disk=environment_cache())
+        self.budget = Budget(MAX_SEGMENTS, MAX_FACES)
+        # uuids of the nodes of the last tree, replaced by the next one
+        self.tree = []
         self.create_ui('miniTree', self.apply_call_back, self.save_preset, self.load_preset)
 
     def create_ui(self, pWindowTitle, pApplyCallBack, pSavePreset, pLoadPreset):
@@ -249,6 +252,8 @@ class Minitree():
         cmds.showWindow()
 
     def load_preset(self, *pArgs):
+        import pymel.core as pm
+
         basicFilter = "*.txt"
         exportPath = pm.fileDialog2(fm=1,fileFilter=basicFilter, okc='selectFile', cap='Select preset file',
                                     dir = cmds.internalVar(upd=True))[0]
@@ -336,36 +341,19 @@ class Minitree():
         turn_amount = cmds.floatSliderGrp(pTurnAmount, query=True, value=True)
         angle_amount = cmds.floatSliderGrp(pAngleAmount, query=True, value=True)
 
-        cmds.setAttr(treeTrunkShader + '.color', treeCor[0], treeCor[1], treeCor[2], type='double3')
-        # cmds.connectAttr( treeTrunkShader+'.outColor', treeTrunkShaderSG+'.surfaceShader', f=1)
-        cmds.setAttr(foliageShader + '.color', foliageCor[0], foliageCor[1], foliageCor[2], type='double3')
-        # cmds.connectAttr( foliageShader+'.outColor', foliageShaderSG+'.surfaceShader', force=True)
-
-        random.seed(p_seed[0])
+        params = TreeParams(polycount, tree_depth, segment_length, length_dec, radius, radius_d, branches,
+                            branches_a, foliage_s, foliage_r, p_seed[0], treeCor, foliageCor, foliage_n,
+                            foliage_spread, first_segment_l, tree_type, branch_chance, angle_chance, turn_chance,
+                            turn_amount, angle_amount)
+        try:
+            params = self.budget.apply(params)
+        except BudgetExceeded as e:
+            cmds.warning(str(e))
+            return
         self.delete_previous()
-        if tree_type == 1:
-            self.create(tree_depth,
-                        segment_length, length_dec, radius, radius_d,
-                        [0.0, 1.0, 0.0],
-                        [0.0, 0.0, 0.0],
-                        0.0, 0.0,
-                        polycount, branches, branches_a,
-                        foliage_s, foliage_r, 0.0, True, foliage_n, foliage_spread, first_segment_l,
-                        branch_chance, angle_chance, turn_chance, turn_amount, angle_amount
-                        )
-        if tree_type == 2:
-            self.createPine(tree_depth,
-                            segment_length, length_dec, radius, radius_d,
-                            [0.0, 1.0, 0.0],
-                            [0.0, 0.0, 0.0],
-                            0.0, 0.0,
-                            polycount, branches, branches_a,
-                            foliage_s, foliage_r, 0.0, True, foliage_n, foliage_spread, first_segment_l, 1,
-                            branch_chance,
-                            angle_chance, turn_chance, turn_amount, angle_amount
-                            )
-
-        self.merge_tree()
+        nodes = pipeline.build_tree(params, MayaSink(pipeline.TREE_NAME), lambert(TRUNK_SHADER, treeCor),
+                                    lambert(FOLIAGE_SHADER, foliageCor), cache=self.cache)
+        self.tree = cmds.ls(nodes, uuid=True) if nodes else []
 
     def save_preset(self, pPolyNumberField,
                     pTreeDepthField,
@@ -414,358 +402,22 @@ class Minitree():
         turn_amount = cmds.floatSliderGrp(pTurnAmount, query=True, value=True)
         angle_amount = cmds.floatSliderGrp(pAngleAmount, query=True, value=True)
 
+        import pymel.core as pm
+
         basicFilter = "*.txt"
         exportPath = pm.fileDialog2(fm=0, fileFilter=basicFilter, okc='createPreset', cap='Create preset file',
                                     dir=cmds.internalVar(upd=True))[0]
         pm.optionVar['pbExportPath'] = exportPath
-        #print exportPath
-
-        # write to file
-        path = cmds.internalVar(upd=True) + "preset.txt"
-        file = open(exportPath, 'w')
-
-        # controlType, controlName, query, value
-        file.writelines(str(["intSliderGrp", "polyNumberField", "v", str(polycount)]) + "\n")
-        file.writelines(str(["intSliderGrp", "treeDepthField", "v", str(tree_depth)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "treeSegmentLength", "v", str(segment_length)]) + "\n")
 
-        file.writelines(str(["floatSliderGrp", "treeLengthDecrease", "v", str(length_dec)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "trunkRadius", "v", str(radius)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "radiusDecrease", "v", str(radius_d)]) + "\n")
-
-        file.writelines(str(["intSliderGrp", "treeBranches", "v", str(branches)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "treeBranches_a", "v", str(branches_a)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "treeFoliageSze", "v", str(foliage_s)]) + "\n")
-
-        file.writelines(str(["intSliderGrp", "treeFoliageRes", "v", str(foliage_r)]) + "\n")
-        file.writelines(str(["intFieldGrp", "randomSeed", "v1", str(p_seed)]) + "\n")
-        file.writelines(str(["colorSliderGrp", "treeColor", "rgbValue", str(treeCor)]) + "\n")
-
-        file.writelines(str(["colorSliderGrp", "foliageColor", "rgbValue", str(foliageCor)]) + "\n")
-        file.writelines(str(["intSliderGrp", "treeFoliageNumber", "v", str(foliage_n)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "treeFoliageSpread", "v", str(foliage_spread)]) + "\n")
-
-        file.writelines(str(["floatSliderGrp", "treeFirstSegmentLength", "v", str(first_segment_l)]) + "\n")
-        file.writelines(str(["radioButtonGrp", "treeTypeSelect", "select", str(tree_type)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "branchingChance", "v", str(branch_chance)]) + "\n")
-
-        file.writelines(str(["floatSliderGrp", "branchAngleChance", "v", str(angle_chance)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "branchTurnChance", "v", str(turn_chance)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "branchTurnRAmount", "v", str(turn_amount)]) + "\n")
-        file.writelines(str(["floatSliderGrp", "branchAngleRAmount", "v", str(angle_amount)]) + "\n")
-
-        file.close()
+        write_preset(TreeParams(polycount, tree_depth, segment_length, length_dec, radius, radius_d, branches,
+                                branches_a, foliage_s, foliage_r, p_seed[0], treeCor, foliageCor, foliage_n,
+                                foliage_spread, first_segment_l, tree_type, branch_chance, angle_chance,
+                                turn_chance, turn_amount, angle_amount), exportPath)
 
     def delete_previous(self):
-        segmentsList = cmds.ls('miniTreeTrunk*')
-        foliageList = cmds.ls('miniTreeFoliage*')
-        if len(segmentsList) > 0:
-            cmds.delete(segmentsList)
-        if len(foliageList) > 0:
-            cmds.delete(foliageList)
-
-    def merge_tree(self):
-        segmentsList = cmds.ls('treePart*')
-        foliageList = cmds.ls('leaves*')
-
-        if len(segmentsList) < 3:
-            treeTrunk = segmentsList[0]
-        else:
-            treeTrunk = cmds.polyUnite(segmentsList)
-
-        newTree = cmds.duplicate(treeTrunk, name='miniTreeTrunk')
-        cmds.polyMergeVertex(newTree)
-        cmds.sets(newTree, e=1, forceElement=treeTrunkShaderSG)
-        cmds.delete(treeTrunk)
-
-        if len(foliageList) < 3:
-            leaves = foliageList[0]
-        else:
-            leaves = cmds.polyUnite(foliageList)
-
-        newLeaves = cmds.duplicate(leaves, name='miniTreeFoliage')
-        cmds.sets(newLeaves, e=1, forceElement=foliageShaderSG)
-        cmds.delete(leaves)
-
-        segmentsList = cmds.ls('treePart*')
-        if len(segmentsList) > 0:
-            cmds.delete(segmentsList)
-
-        foliageList = cmds.ls('leaves*')
-        if len(foliageList) > 0:
-            cmds.delete(foliageList)
-
-    # Arguments: 'axis point 1', 'axis point 2', 'point to be rotated', 'angle of rotation (in radians)' >> 'new point'
-    def point_rotate_3d(self, p1_x, p1_y, p1_z, p2_x, p2_y, p2_z, p0_x, p0_y, p0_z, theta):
-        # Translate so axis is at origin
-        p_x = p0_x - p1_x
-        p_y = p0_y - p1_y
-        p_z = p0_z - p1_z
-        # Initialize point q
-        q = [0.0, 0.0, 0.0]
-        N_x = (p2_x - p1_x)
-        N_y = (p2_y - p1_y)
-        N_z = (p2_z - p1_z)
-        Nm = math.sqrt(math.pow(N_x, 2) + math.pow(N_y, 2) + math.pow(N_z, 2))
-        # Rotation axis unit vector
-        n = [N_x / Nm, N_y / Nm, N_z / Nm]
-        # Matrix common factors
-        c = math.cos(theta)
-        t = (1 - math.cos(theta))
-        s = math.sin(theta)
-        X = n[0]
-        Y = n[1]
-        Z = n[2]
-        # Matrix 'M'
-        d11 = t * X ** 2 + c
-        d12 = t * X * Y - s * Z
-        d13 = t * X * Z + s * Y
-        d21 = t * X * Y + s * Z
-        d22 = t * Y ** 2 + c
-        d23 = t * Y * Z - s * X
-        d31 = t * X * Z - s * Y
-        d32 = t * Y * Z + s * X
-        d33 = t * Z ** 2 + c
-        #            |p.x|
-        # Matrix 'M'*|p.y|
-        #            |p.z|
-        q[0] = d11 * p_x + d12 * p_y + d13 * p_z
-        q[1] = d21 * p_x + d22 * p_y + d23 * p_z
-        q[2] = d31 * p_x + d32 * p_y + d33 * p_z
-        # Translate axis and rotated point back to original location
-        return [q[0] + p1_x, q[1] + p1_y, q[2] + p1_z]
-
-    def get_sp_point(self, a, b, c):
-        # first convert line to normalized unit vector
-        dx = b[0] - a[0]
-        dy = b[1] - a[1]
-        dz = b[2] - a[2]
-        mag = math.sqrt(dx * dx + dy * dy + dz * dz)
-        dx = dx / mag
-        dy = dy / mag
-        dz = dz / mag
-        # translate the point and get the dot product
-        theta = (dx * (c[0] - a[0])) + (dy * (c[1] - a[1])) + (dz * (c[2] - a[2]))
-        x4 = (dx * theta) + a[0]
-        y4 = (dy * theta) + a[1]
-        z4 = (dz * theta) + a[2]
-        return [x4, y4, z4]
-
-    def get_point_given_dist(self, a, b, dist):
-        # """Return the point c such that line segment bc is perpendicular to
-        # line segment ab and segment bc has length dist.
-        # a and b are tuples of length 3, dist is a positive float.
-        vec_ab = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
-        # Find a vector not parallel or anti-parallel to vector ab
-        if vec_ab[1] != 0 or vec_ab[2] != 0:
-            vec = (1, 0, 0)
-        else:
-            vec = (0, 1, 0)
-        # Find the cross product of the vectors
-        cross = (vec_ab[1] * vec[2] - vec_ab[2] * vec[1],
-                 vec_ab[2] * vec[0] - vec_ab[0] * vec[2],
-                 vec_ab[0] * vec[1] - vec_ab[1] * vec[0])
-        # Find the vector in the same direction with length dist
-        factor = dist / math.sqrt(cross[0] ** 2 + cross[1] ** 2 + cross[2] ** 2)
-        newvec = (factor * cross[0], factor * cross[1], factor * cross[2])
-        # Find point c such that vector bc is that vector
-        c = (b[0] + newvec[0], b[1] + newvec[1], b[2] + newvec[2])
-        # Done!
-        return c
-
-    def polytube(self, p1_x, p1_y, p1_z,
-                 p2_x, p2_y, p2_z,
-                 p0_x, p0_y, p0_z,
-                 p1_r, p2_r,
-                 polys):
-        for i in range(0, polys):
-            inc = math.pi * 2.0 / polys
-            p = self.get_point_given_dist([p0_x, p0_y, p0_z], [p1_x, p1_y, p1_z], p1_r)
-            point1 = self.point_rotate_3d(p0_x, p0_y, p0_z,
-                                          p1_x, p1_y, p1_z,
-                                          p[0], p[1], p[2],
-                                          -(inc * i)
-                                          )
-            point2 = self.point_rotate_3d(p0_x, p0_y, p0_z,
-                                          p1_x, p1_y, p1_z,
-                                          p[0], p[1], p[2],
-                                          -(inc * i + inc)
-                                          )
-            p = self.get_point_given_dist([p1_x, p1_y, p1_z], [p2_x, p2_y, p2_z], p2_r)
-            point3 = self.point_rotate_3d(p1_x, p1_y, p1_z,
-                                          p2_x, p2_y, p2_z,
-                                          p[0], p[1], p[2],
-                                          -(inc * i)
-                                          )
-            point4 = self.point_rotate_3d(p1_x, p1_y, p1_z,
-                                          p2_x, p2_y, p2_z,
-                                          p[0], p[1], p[2],
-                                          -(inc * i + inc)
-                                          )
-            cmds.polyCreateFacet(p=[point2,
-                                    point1,
-                                    point3,
-                                    point4],
-                                 name='treePart#')
-
-    def create(self, p_depth,  # tree depth,
-               p_length, p_length_inc, p_r, p_rate,
-               p_l,  # last segment tip
-               p_ll,  # last segment base
-               branch_turn, branch_shift,
-               polygons, num_branches, branch_ang, foliage_sze, foliage_res, turn, branch, foliage_num, foliage_spr,
-               first_segment_l, branch_chance, angle_chance, turn_chance, turn_amount, angle_amount):
-        if p_depth > 0:
-            branch_length = p_length * first_segment_l
-            lv = [p_l[0] - p_ll[0], p_l[1] - p_ll[1], p_l[2] - p_ll[2]]
-            m = math.sqrt(math.pow(lv[0], 2) + math.pow(lv[1], 2) + math.pow(lv[2], 2))
-            u = [lv[0] / m, lv[1] / m, lv[2] / m]
-            v = [lv[0] + p_ll[0] + (u[0] * branch_length), lv[1] + p_ll[1] + (u[1] * branch_length),
-                 lv[2] + p_ll[2] + (u[2] * branch_length)]
-            newP = [p_l[0] + 0.1, p_l[1], p_l[2]]
-            p = self.get_sp_point(p_l, p_ll, newP)
-            points = self.point_rotate_3d(p[0], p[1], p[2],
-                                          newP[0], newP[1], newP[2],
-                                          v[0], v[1], v[2],
-                                          branch_turn)
-            yTurn = self.point_rotate_3d(p_l[0], p_l[1], p_l[2],
-                                         v[0], v[1], v[2],
-                                         points[0], points[1], points[2],
-                                         branch_shift)
-            p_n = yTurn
-            self.polytube(
-                p_l[0], p_l[1], p_l[2],  # base point
-                p_n[0], p_n[1], p_n[2],  # top point
-                p_ll[0], p_ll[1], p_ll[2],
-                p_r, p_r * p_rate,  # base and top radius
-                polygons)
-            p_length = (p_length * p_length_inc)
-            p_r = p_r * p_rate
-            p_depth = p_depth - 1.0
-            c = 0
-            if p_depth > 0:
-                branch_turn = branch_ang
-                turn = turn + math.pi / 2.0
-                for i in range(0, num_branches):
-                    p_length = p_length + random.uniform(-0.5, 0.5)
-                    branch = True
-                    if random.uniform(0, 1) < turn_chance:
-                        turn = turn + random.uniform(-turn_amount, turn_amount)
-                    if random.uniform(0, 1) < angle_chance:
-                        branch_turn = branch_turn + random.uniform(-angle_amount, angle_amount)
-                    if random.uniform(0, 1) < 1.0 - branch_chance:
-                        branch = False
-                        c = c + 1
-                    if branch:
-                        branch_shift = (i * ((math.pi * 2.0) / num_branches)) + turn
-                        self.create(p_depth, p_length, p_length_inc, p_r, p_rate,
-                                    p_n,
-                                    p_l,
-                                    branch_turn, branch_shift,
-                                    polygons, num_branches, branch_ang,
-                                    foliage_sze, foliage_res, turn, branch, foliage_num, foliage_spr, 1, branch_chance,
-                                    angle_chance, turn_chance, turn_amount, angle_amount)
-
-            if c == num_branches or p_depth <= 0:
-                randx = []
-                randy = []
-                randz = []
-                for r in range(0, 20):
-                    randx.append(random.uniform(-foliage_spr, foliage_spr))
-                    randy.append(random.uniform(-foliage_spr, foliage_spr))
-                    randz.append(random.uniform(-foliage_spr, foliage_spr))
-                for j in range(0, foliage_num):
-                    my_sphere = cmds.polyPlatonicSolid(l=foliage_sze, name='leaves#')
-                    for i in range(0, foliage_res):
-                        cmds.polySmooth(my_sphere)
-                    cmds.move(p_n[0] + randx[j],
-                              p_n[1] + randy[j],
-                              p_n[2] + randz[j], my_sphere)
-
-    def createPine(self, p_depth,  # tree depth,
-                   p_length, p_length_inc, p_r, p_rate,
-                   p_l,  # last segment tip
-                   p_ll,  # last segment base
-                   branch_turn, branch_shift,
-                   polygons, num_branches, branch_ang, foliage_sze, foliage_res, turn, branch, foliage_num, foliage_spr,
-                   first_segment_l, pine_level, branch_chance, angle_chance, turn_chance, turn_amount, angle_amount):
-        if p_depth > 0:
-            branch_length = p_length * first_segment_l
-            lv = [p_l[0] - p_ll[0], p_l[1] - p_ll[1], p_l[2] - p_ll[2]]
-            m = math.sqrt(math.pow(lv[0], 2) + math.pow(lv[1], 2) + math.pow(lv[2], 2))
-            u = [lv[0] / m, lv[1] / m, lv[2] / m]
-            v = [lv[0] + p_ll[0] + (u[0] * branch_length), lv[1] + p_ll[1] + (u[1] * branch_length),
-                 lv[2] + p_ll[2] + (u[2] * branch_length)]
-            if pine_level == 3 or pine_level == 2:
-                newP = [p_l[0] + 0.1, p_l[1], p_l[2]]
-                p = self.get_sp_point(p_l, p_ll, newP)
-                points = self.point_rotate_3d(p[0], p[1], p[2],
-                                         newP[0], newP[1], newP[2],
-                                         v[0], v[1], v[2],
-                                         branch_turn)
-                yTurn = self.point_rotate_3d(p_l[0], p_l[1], p_l[2],
-                                        v[0], v[1], v[2],
-                                        points[0], points[1], points[2],
-                                        branch_shift)
-
-                p_n = yTurn
-            else:
-                p_n = v
-
-            self.polytube(
-                p_l[0], p_l[1], p_l[2],  # base point
-                p_n[0], p_n[1], p_n[2],  # top point
-                p_ll[0], p_ll[1], p_ll[2],
-                p_r, p_r * p_rate,  # base and top radius
-                polygons)
-            p_length = (p_length * p_length_inc)
-            p_r = p_r * p_rate
-            p_depth = p_depth - 1.0
-            if pine_level == 1:
-                self.createPine(p_depth, p_length, p_length_inc, p_r, p_rate,
-                           p_n,
-                           p_l,
-                           branch_turn, branch_shift,
-                           polygons, num_branches, branch_ang,
-                           foliage_sze, foliage_res, turn, branch, foliage_num, foliage_spr, 1, 1, branch_chance,
-                           angle_chance, turn_chance, turn_amount, angle_amount)
-            c = 0
-            if p_depth > 0:
-                branch_turn = branch_ang
-                turn = turn + math.pi / 2.0
-                for i in range(0, num_branches):
-                    branch = True
-                    p_length = p_length + random.uniform(-0.5, 0.5)
-                    if random.uniform(0, 1) < turn_chance:
-                        turn = turn + random.uniform(-turn_amount, turn_amount)
-                    if random.uniform(0, 1) < angle_chance:
-                        branch_turn = branch_turn + random.uniform(-angle_amount, angle_amount)
-                    if random.uniform(0, 1) < 1.0 - branch_chance:
-                        branch = False
-                        c = c + 1
-                    branch_shift = (i * ((math.pi * 2.0) / num_branches)) + turn
-                    if branch:
-                        self.createPine(p_depth * 0.5, p_length * 0.7, p_length_inc, p_r, p_rate,
-                                   p_n,
-                                   p_l,
-                                   branch_turn, branch_shift,
-                                   polygons, num_branches, branch_ang,
-                                   foliage_sze, foliage_res, turn, branch, foliage_num, foliage_spr, 1, 2,
-                                   branch_chance,
-                                   angle_chance, turn_chance, turn_amount, angle_amount)
-
-            if c == num_branches or p_depth <= 0:
-                randx = []
-                randy = []
-                randz = []
-                for r in range(0, 20):
-                    randx.append(random.uniform(-foliage_spr, foliage_spr))
-                    randy.append(random.uniform(-foliage_spr, foliage_spr))
-                    randz.append(random.uniform(-foliage_spr, foliage_spr))
-                for j in range(0, foliage_num):
-                    my_sphere = cmds.polyPlatonicSolid(l=foliage_sze, name='leaves#')
-                    for i in range(0, foliage_res):
-                        cmds.polySmooth(my_sphere)
-                    cmds.move(p_n[0] + randx[j],
-                              p_n[1] + randy[j],
-                              p_n[2] + randz[j], my_sphere)
+        # the last tree's nodes by uuid, whatever they were renamed or moved
+        # to since; already deleted ones resolve to nothing
+        nodes = cmds.ls(self.tree) if self.tree else []
+        if len(nodes) > 0:
+            cmds.delete(nodes)
+        self.tree = []
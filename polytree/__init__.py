@@ -0,0 +1 @@
+"""Maya-free geometry and growth core shared by the miniTree front ends."""
@@ -0,0 +1,183 @@
+"""Grow a forest of trees from presets on a pool of worker processes.
+
+Every job is a (preset file, seed) pair: the preset's parameters with the
+seed replaced.  Each tree is exported to its own file in the output directory
+and manifest.json there lists every tree with its file, timing and counts.
+
+    python -m polytree.batch forest --preset oak.txt --seeds 0:200 --format glb
+    python -m polytree.batch forest --jobs jobs.txt
+
+A jobs file has one 'preset seed' pair per line; preset paths are relative to
+the jobs file and lines starting with '#' are skipped.
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from polytree import growth
+from polytree.budget import MODES, Budget, BudgetExceeded
+from polytree.export import FORMATS, export_tree
+from polytree.presets import read_preset
+from polytree.streams import SEEDINGS
+
+Job = collections.namedtuple('Job', ['preset', 'seed'])
+
+MANIFEST = 'manifest.json'
+
+
+def seed_jobs(preset, seeds):
+    # One job per seed of the same preset
+    return [Job(preset, int(seed)) for seed in seeds]
+
+
+def read_jobs(path):
+    # Jobs of a jobs file
+    jobs = []
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            preset, sep, seed = line.rpartition(' ')
+            try:
+                seed = int(seed)
+            except ValueError:
+                seed = None
+            if not preset.strip() or seed is None:
+                raise ValueError('%s:%d: expected PRESET SEED, got %r' % (path, number, line))
+            jobs.append(Job(os.path.join(directory, preset.strip()), seed))
+    return jobs
+
+
+def run_batch(jobs, directory, format='obj', processes=None, seeding='legacy', engine='iterative', budget=None):
+    # Export the tree of every job into 'directory' on 'processes' workers
+    # (all cores by default), write the manifest there and return it.  Trees
+    # refused by the budget.Budget are listed with their error and skipped.
+    if format not in FORMATS:
+        raise ValueError('unknown export format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+    # presets are read once here, so a broken one fails before any tree is grown
+    presets = {}
+    for job in jobs:
+        if job.preset not in presets:
+            presets[job.preset] = read_preset(job.preset)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    names = _file_names(jobs, format)
+    tasks = [(presets[job.preset]._replace(seed=job.seed), os.path.join(directory, name), format, seeding, engine,
+              budget) for job, name in zip(jobs, names)]
+
+    start = time.time()
+    if processes == 1 or len(tasks) < 2:
+        results = [_run_task(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            # map() returns results in job order whatever finishes first
+            results = pool.map(_run_task, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    seconds = time.time() - start
+
+    trees = []
+    for job, name, result in zip(jobs, names, results):
+        tree = collections.OrderedDict([('preset', job.preset), ('seed', job.seed), ('path', name)])
+        tree.update(result)
+        trees.append(tree)
+    built = [t for t in trees if 'error' not in t]
+    manifest = collections.OrderedDict([
+        ('format', format),
+        ('seeding', seeding),
+        ('engine', engine),
+        ('processes', processes or multiprocessing.cpu_count()),
+        ('seconds', round(seconds, 3)),
+        ('trees_built', len(built)),
+        ('trees_failed', len(trees) - len(built)),
+        ('segments', sum(t['segments'] for t in built)),
+        ('foliage_clusters', sum(t['foliage_clusters'] for t in built)),
+        ('vertices', sum(t['vertices'] for t in built)),
+        ('faces', sum(t['faces'] for t in built)),
+        ('trees', trees),
+    ])
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+        f.write('\n')
+    return manifest
+
+
+def _file_names(jobs, format):
+    # '<preset>_<seed>.<format>' per job, numbered when two jobs would share one
+    names = []
+    seen = collections.Counter()
+    for job in jobs:
+        stem = '%s_%d' % (os.path.splitext(os.path.basename(job.preset))[0], job.seed)
+        seen[stem] += 1
+        if seen[stem] > 1:
+            stem = '%s_%d' % (stem, seen[stem] - 1)
+        names.append('%s.%s' % (stem, format))
+    return names
+
+
+def _run_task(task):
+    # Export one tree, returning its counts and time or its error
+    params, path, format, seeding, engine, budget = task
+    start = time.time()
+    try:
+        result = collections.OrderedDict(export_tree(params, path, format, seeding=seeding, engine=engine,
+                                                     budget=budget))
+    except BudgetExceeded as e:
+        result = collections.OrderedDict([('error', str(e))])
+    result['seconds'] = round(time.time() - start, 4)
+    return result
+
+
+def parse_seeds(text):
+    # 'START:STOP' for range(START, STOP), or a comma separated list
+    try:
+        if ':' in text:
+            start, stop = text.split(':')
+            return list(range(int(start), int(stop)))
+        return [int(seed) for seed in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected START:STOP or SEED,SEED,..., got %r' % text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Grow a forest of trees from presets without Maya.')
+    parser.add_argument('directory', help='output directory for the trees and %s' % MANIFEST)
+    parser.add_argument('--preset', help='preset file written by miniTree\'s save preset')
+    parser.add_argument('--seeds', type=parse_seeds, help='seeds of the preset, START:STOP or SEED,SEED,...')
+    parser.add_argument('--jobs', metavar='PATH', help='file of PRESET SEED lines, instead of --preset')
+    parser.add_argument('--format', choices=FORMATS, default='obj')
+    parser.add_argument('--processes', type=int, help='worker processes, defaults to the number of cores')
+    parser.add_argument('--seeding', choices=SEEDINGS, default='legacy',
+                        help='legacy: the scripts\' random sequence, branch: a stream per branch')
+    parser.add_argument('--engine', choices=growth.ENGINES, default='iterative',
+                        help='growth engine, level needs branch seeding')
+    parser.add_argument('--max-segments', type=int, help='expected segment budget per tree')
+    parser.add_argument('--max-faces', type=int, help='expected face budget per tree')
+    parser.add_argument('--over-budget', choices=MODES, default='refuse',
+                        help='skip the tree or lower its level of detail')
+    args = parser.parse_args(argv)
+    if args.jobs and (args.preset or args.seeds):
+        parser.error('--jobs replaces --preset and --seeds')
+    if not args.jobs and not (args.preset and args.seeds):
+        parser.error('give --preset and --seeds, or --jobs')
+    budget = Budget(args.max_segments, args.max_faces, args.over_budget)
+    try:
+        jobs = read_jobs(args.jobs) if args.jobs else seed_jobs(args.preset, args.seeds)
+        manifest = run_batch(jobs, args.directory, args.format, args.processes, args.seeding, args.engine, budget)
+    except (ValueError, EnvironmentError) as e:
+        parser.exit(1, '%s\n' % e)
+    sys.stdout.write('%s: %d trees in %.1fs, %d failed, %d segments, %d faces\n' % (
+        args.directory, manifest['trees_built'], manifest['seconds'], manifest['trees_failed'],
+        manifest['segments'], manifest['faces']))
+
+
+if __name__ == '__main__':
+    main()
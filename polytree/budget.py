@@ -0,0 +1,116 @@
+"""Predicted tree sizes and a budget checked before growing.
+
+estimate() works out the expected number of segments, foliage clusters,
+vertices and faces from the parameters alone, taking branch_chance into
+account, so that a runaway tree can be refused or cut down before any
+growth starts.
+"""
+import collections
+
+from polytree.growth import PINE
+
+Cost = collections.namedtuple('Cost', ['segments', 'foliage_clusters', 'vertices', 'faces'])
+
+MODES = ('refuse', 'reduce')
+
+# limits of the miniTree UIs, well below what hangs a Maya session
+MAX_SEGMENTS = 1000000
+MAX_FACES = 5000000
+
+
+class BudgetExceeded(ValueError):
+    pass
+
+
+def estimate(params):
+    # Expected Cost of growing and meshing 'params'
+    segments, tips = _expected(params, params.tree_depth, True)
+    roots = 1 if segments else 0
+    cluster_vertices, cluster_faces = cluster_size(params.foliage_r)
+    clusters = tips * params.foliage_n
+    return Cost(segments,
+                clusters,
+                (segments + roots) * params.polycount + clusters * cluster_vertices,
+                segments * params.polycount + clusters * cluster_faces)
+
+
+def cluster_size(resolution):
+    # (vertices, faces) of a foliage cluster: a dodecahedron smoothed
+    # 'resolution' times, every smoothing turns an n-gon into n quads
+    vertices, edges, faces, corners = 20, 30, 12, 60
+    for i in range(0, resolution):
+        vertices, edges, faces, corners = vertices + edges + faces, 2 * edges + corners, corners, 4 * corners
+    return vertices, faces
+
+
+def _expected(params, p_depth, trunk):
+    # (segments, foliage tips) expected from a branch grown with 'p_depth',
+    # following the recursion of create()/createPine().  Each of the
+    # 'branches' children is grown with probability branch_chance, and a tip
+    # gets foliage when it is the last level or all of its children were
+    # skipped.
+    if p_depth <= 0:
+        return 0.0, 0.0
+    chance = min(max(params.branch_chance, 0.0), 1.0)
+    p_depth = p_depth - 1.0
+    if p_depth <= 0:
+        return 1.0, 1.0
+    pine = params.tree_type == PINE
+    segments, tips = _expected(params, p_depth * 0.5 if pine else p_depth, False)
+    segments = 1.0 + params.branches * chance * segments
+    tips = (1.0 - chance) ** params.branches + params.branches * chance * tips
+    if pine and trunk:
+        trunk_segments, trunk_tips = _expected(params, p_depth, True)
+        segments += trunk_segments
+        tips += trunk_tips
+    return segments, tips
+
+
+class Budget(object):
+    # Limits on the expected segments and faces of a tree.  Over budget,
+    # 'refuse' raises BudgetExceeded and 'reduce' lowers the level of detail:
+    # foliage resolution while the foliage has more faces than the trunk,
+    # then the tube sides down to 3, then the tree depth.
+
+    def __init__(self, max_segments=None, max_faces=None, mode='refuse'):
+        if mode not in MODES:
+            raise ValueError('unknown budget mode %r, expected one of %s' % (mode, ', '.join(MODES)))
+        self.max_segments = max_segments
+        self.max_faces = max_faces
+        self.mode = mode
+
+    def exceeded(self, cost):
+        return ((self.max_segments is not None and cost.segments > self.max_segments) or
+                (self.max_faces is not None and cost.faces > self.max_faces))
+
+    def apply(self, params):
+        # 'params', or 'params' at a lower level of detail that fits
+        cost = estimate(params)
+        if not self.exceeded(cost):
+            return params
+        if self.mode == 'refuse':
+            raise BudgetExceeded(self._describe(cost))
+        reduced = params
+        while self.exceeded(cost):
+            trunk_faces = cost.segments * reduced.polycount
+            if reduced.foliage_r > 0 and cost.faces - trunk_faces > trunk_faces:
+                reduced = reduced._replace(foliage_r=reduced.foliage_r - 1)
+            elif reduced.polycount > 3 and (self.max_faces is not None and cost.faces > self.max_faces):
+                reduced = reduced._replace(polycount=reduced.polycount - 1)
+            elif reduced.tree_depth > 1:
+                reduced = reduced._replace(tree_depth=reduced.tree_depth - 1)
+            elif reduced.foliage_r > 0:
+                reduced = reduced._replace(foliage_r=reduced.foliage_r - 1)
+            else:
+                raise BudgetExceeded(self._describe(cost))
+            cost = estimate(reduced)
+        return reduced
+
+    def _describe(self, cost):
+        limits = []
+        if self.max_segments is not None:
+            limits.append('%d segments' % self.max_segments)
+        if self.max_faces is not None:
+            limits.append('%d faces' % self.max_faces)
+        return 'tree over budget: about %d segments and %d faces, the limit is %s' % (
+            cost.segments, cost.faces, ' and '.join(limits))
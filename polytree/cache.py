@@ -0,0 +1,117 @@
+"""In-memory cache of grown skeletons and trunk meshes.
+
+Entries are keyed by a hash of the parameters that change them, so edits to
+the colours or to the foliage reuse the trunk instead of growing the tree
+again.  Cached arrays are shared with every caller and must not be modified.
+"""
+import collections
+import hashlib
+
+from polytree import growth, mesh
+
+# TreeParams fields that change the skeleton; foliage draws are stored raw in
+# it, so foliage size, resolution, number and spread do not
+GROWTH_FIELDS = ('tree_depth', 'segment_length', 'length_dec', 'radius', 'radius_d', 'branches', 'branches_a',
+                 'first_segment_l', 'tree_type', 'branch_chance', 'angle_chance', 'turn_chance', 'turn_amount',
+                 'angle_amount')
+
+MAX_ENTRIES = 32
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def growth_key(params, seeding='legacy'):
+    # Hex digest of everything the skeleton of 'params' depends on.  Numbers
+    # are hashed as floats, an integer slider value grows the same tree as
+    # the equal float one.
+    values = [seeding, params.seed] + [float(getattr(params, name)) for name in GROWTH_FIELDS]
+    return hashlib.sha1(repr(values).encode('ascii')).hexdigest()
+
+
+def params_key(params, seeding='legacy'):
+    # Hex digest of every parameter, colours and foliage included: equal keys
+    # make identical trees
+    values = [seeding, int(params.seed)] + [tuple(float(c) for c in value) if isinstance(value, (list, tuple))
+                                       else float(value) for name, value in zip(params._fields, params)
+                                       if name != 'seed']
+    return hashlib.sha1(repr(values).encode('ascii')).hexdigest()
+
+
+def trunk_key(params, seeding='legacy', twist='legacy', min_polys=None, twig_radius=0.0):
+    return '%s-%d-%s-%s-%r' % (growth_key(params, seeding), params.polycount, twist, min_polys, float(twig_radius))
+
+
+class LRUCache(object):
+    # Keeps at most max_entries values and max_bytes of them, dropping the
+    # least recently used first
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            self.misses += 1
+            return default
+        self.hits += 1
+        # move to the most recently used end
+        item = self._items.pop(key)
+        self._items[key] = item
+        return item[0]
+
+    def put(self, key, value, nbytes):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        if nbytes > self.max_bytes or self.max_entries < 1:
+            return
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while len(self._items) > self.max_entries or self.nbytes > self.max_bytes:
+            self.nbytes -= self._items.popitem(last=False)[1][1]
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+class TreeCache(object):
+    # Skeletons and trunk meshes sharing one LRUCache.  Skeletons missing from
+    # it are looked up in 'disk', a diskcache.DiskCache, before being grown.
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, disk=None):
+        self.entries = LRUCache(max_entries, max_bytes)
+        self.disk = disk
+
+    def skeleton(self, params, seeding='legacy', engine='iterative'):
+        key = growth_key(params, seeding)
+        skeleton = self.entries.get(key)
+        if skeleton is None:
+            if self.disk is not None:
+                skeleton = self.disk.get(key)
+            if skeleton is None:
+                skeleton = growth.grow(params, engine=engine, seeding=seeding)
+                if self.disk is not None:
+                    self.disk.put(key, skeleton)
+            self.entries.put(key, skeleton, skeleton.nbytes)
+        return skeleton
+
+    def trunk(self, params, seeding='legacy', engine='iterative', twist='legacy', min_polys=None, twig_radius=0.0):
+        key = trunk_key(params, seeding, twist, min_polys, twig_radius)
+        trunk = self.entries.get(key)
+        if trunk is None:
+            trunk = mesh.tube_mesh(self.skeleton(params, seeding, engine), params.polycount, twist, min_polys,
+                                   twig_radius)
+            self.entries.put(key, trunk, trunk.nbytes)
+        return trunk
+
+    def clear(self):
+        self.entries.clear()
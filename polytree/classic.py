@@ -0,0 +1,156 @@
+"""Growth of the two early generator scripts.
+
+tree_generator_polygonal grows straight segments and turns them with euler
+angles, alternating the branch spread between the x and y angles.
+tree_generator_vector_calculation grows each segment along the previous one
+and turns it with point_rotate_3d.  Neither is random.  Both end every branch
+with a sphere.  Here they produce a trunk mesh and the branch tips instead of
+one facet per quad and one polySphere per tip.
+"""
+import math
+
+import numpy as np
+
+from polytree import foliage, mesh, rings
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.vectors import get_rotations, point_rotate_3d
+
+STYLES = ('polygonal', 'vector')
+
+
+def grow(params, style):
+    # (trunk mesh, (L, 3) branch tips) of the given script's tree.  Only the
+    # polycount, tree_depth, segment_length, length_dec, radius, radius_d,
+    # branches and branches_a fields of 'params' are used.
+    if style == 'polygonal':
+        return _polygonal_tree(params)
+    if style == 'vector':
+        return _vector_tree(params)
+    raise ValueError('unknown generator style %r, expected one of %s' % (style, ', '.join(STYLES)))
+
+
+def build_tree(params, sink, style, trunk_material=None, foliage_material=None):
+    # Grow the tree of the given script and send its trunk and spheres to
+    # 'sink' as one mesh each.  foliage_s is the sphere radius and foliage_r
+    # its axis and height divisions.
+    trunk, tips = grow(params, style)
+    sink.add_mesh(TRUNK_NAME, trunk, trunk_material)
+    sink.add_mesh(FOLIAGE_NAME, foliage.place_clusters(foliage.sphere_mesh(params.foliage_s, params.foliage_r),
+                                                       tips), foliage_material)
+    return sink.commit()
+
+
+def _tips(tips):
+    return np.array(tips, dtype=np.float64).reshape(-1, 3)
+
+
+def _polygonal_tree(params):
+    # Arguments of the polygonal script's applyCallBack: the trunk starts at
+    # the origin, turned by these angles, with the switch at -1
+    angles = (math.pi + math.pi / 2, math.pi / 2, math.pi / 2)
+    segments = []
+    tips = []
+    _polygonal(segments, tips, params, params.tree_depth, params.segment_length, params.radius,
+               (0.0, 0.0, 0.0), angles, angles, -1)
+    if not segments:
+        return mesh.concatenate([]), _tips(tips)
+
+    base, tip, base_radius, top_radius, base_angles, tip_angles = [np.array(c, dtype=np.float64)
+                                                                   for c in zip(*segments)]
+    # both rings turn about the segment base
+    base_rings = rings.euler_ring(base, base_radius, base_angles, base, params.polycount)
+    tip_rings = rings.euler_ring(tip, top_radius, tip_angles, base, params.polycount)
+    return mesh.ring_tubes(base_rings, tip_rings), _tips(tips)
+
+
+def _polygonal(segments, tips, params, depth, length, r, last, last_angles, angles, switch):
+    # create() of the polygonal script; segments are (base, straight tip,
+    # base radius, top radius, base ring angles, tip ring angles)
+    if depth <= 0:
+        return
+    length = length * params.length_dec
+    lx, ly, lz = last
+    segments.append((last, (lx, ly + length, lz), r, r * params.radius_d, last_angles, angles))
+    point = tuple(get_rotations(lx, ly + length, lz, angles[0], angles[1], angles[2], lx, ly, lz))
+
+    r = r * params.radius_d
+    depth = depth - 1
+    switch = switch * -1
+    if depth <= 0:
+        tips.append(point)
+        return
+    num_branches = params.branches
+    branch_ang = params.branches_a
+    ax, ay, az = angles
+    for i in range(0, num_branches):
+        ang_split = ax
+        ang_turn = ay
+        if switch > 0:
+            ang_split = (ax - branch_ang) + (branch_ang / num_branches) * (i + (num_branches + 1.0) / 2.0)
+        else:
+            ang_turn = (ay - branch_ang) + (branch_ang / num_branches) * (i + (num_branches + 1.0) / 2.0)
+        _polygonal(segments, tips, params, depth, length, r, point, angles, (ang_split, ang_turn, az), switch)
+
+
+def _vector_tree(params):
+    # Arguments of the vector calculation script's applyCallBack: the trunk
+    # grows from (0, 1, 0) away from the origin, branching turned on
+    segments = []
+    tips = []
+    _vector(segments, tips, params, params.tree_depth, params.segment_length, params.radius,
+            (0.0, 1.0, 0.0), (0.0, 0.0, 0.0), 0.0, 0.0, 0.0, True)
+    if not segments:
+        return mesh.concatenate([]), _tips(tips)
+
+    prev, base, tip, base_radius, top_radius = [np.array(c, dtype=np.float64) for c in zip(*segments)]
+    base_rings = rings.axis_ring(prev, base, base_radius, params.polycount)
+    tip_rings = rings.axis_ring(base, tip, top_radius, params.polycount)
+    return mesh.ring_tubes(base_rings, tip_rings), _tips(tips)
+
+
+def _vector(segments, tips, params, depth, length, r, last, before, branch_ax, branch_ay, turn, branch):
+    # create() of the vector calculation script; segments are (point before
+    # the base, base, tip, base radius, top radius)
+    if depth <= 0:
+        return
+    p_lx, p_ly, p_lz = last
+    p_llx, p_lly, p_llz = before
+
+    # unit vector of the last segment
+    p_lxv = p_lx - p_llx
+    p_lyv = p_ly - p_lly
+    p_lzv = p_lz - p_llz
+    m = math.sqrt(math.pow(p_lxv, 2) + math.pow(p_lyv, 2) + math.pow(p_lzv, 2))
+    ux = p_lxv / m
+    uy = p_lyv / m
+    uz = p_lzv / m
+
+    # continue it by 'length'
+    p_vx = p_lxv + p_llx + (ux * length)
+    p_vy = p_lyv + p_lly + (uy * length)
+    p_vz = p_lzv + p_llz + (uz * length)
+
+    if branch:
+        points = point_rotate_3d(p_lx, p_ly, p_lz,
+                                 p_lx + 1, p_ly, p_lz,
+                                 p_vx, p_vy, p_vz,
+                                 branch_ax)
+        # the script's turn axis starts at (z, y, z) of the base
+        new = tuple(point_rotate_3d(p_lz, p_ly, p_lz,
+                                    p_vx, p_vy, p_vz,
+                                    points[0], points[1], points[2],
+                                    branch_ay))
+    else:
+        new = (p_vx, p_vy, p_vz)
+    segments.append((before, last, new, r, r * params.radius_d))
+
+    length = length * params.length_dec
+    r = r * params.radius_d
+    depth = depth - 1
+    if depth <= 0:
+        tips.append(new)
+        return
+    turn = turn + math.pi / 2.0
+    for i in range(0, params.branches):
+        branch_ay = (i * ((math.pi * 2.0) / params.branches)) + turn
+        _vector(segments, tips, params, depth, length, r, new, last, params.branches_a, branch_ay, turn, branch)
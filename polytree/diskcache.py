@@ -0,0 +1,207 @@
+"""Skeletons saved to a local cache directory in a compact binary format.
+
+A skeleton file is a 64 byte header followed by its arrays, stored raw and
+little-endian so that loading is a memory map:
+
+    header  magic 'PTSK', version, foliage draws per tip, segment count N,
+            leaf count L, origin (3 float64)
+    base, tip           (N, 3) float32
+    base_radius,
+    top_radius          (N,) float32
+    parent              (N,) uint32, 0xFFFFFFFF for the root
+    foliage_jitter      (L, draws, 3) float32
+    depth               (N,) uint16
+    leaf                (N,) uint8
+
+Points and radii are stored as float32, a reloaded tree is the grown one
+rounded to float32.
+
+The directory is kept under max_entries files and max_bytes, the files used
+least recently (by modification time, which a hit renews) are removed first.
+"""
+import errno
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from polytree import growth
+from polytree.cache import growth_key
+from polytree.skeleton import FOLIAGE_DRAWS, TreeSkeleton
+
+MAGIC = b'PTSK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII3d')
+HEADER_SIZE = 64
+EXTENSION = '.ptsk'
+
+MAX_ENTRIES = 256
+MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_directory():
+    return os.environ.get('POLYTREE_CACHE', os.path.join(os.path.expanduser('~'), '.polytree', 'skeletons'))
+
+
+def environment_cache():
+    # A DiskCache in the POLYTREE_CACHE directory, or None when it is not
+    # set: front ends only keep skeletons on disk when asked to
+    directory = os.environ.get('POLYTREE_CACHE')
+    return DiskCache(directory) if directory else None
+
+
+def _layout(count, leaves, draws):
+    # (name, dtype, shape, offset) of every array of a file
+    fields = [('base', '<f4', (count, 3)),
+              ('tip', '<f4', (count, 3)),
+              ('base_radius', '<f4', (count,)),
+              ('top_radius', '<f4', (count,)),
+              ('parent', '<u4', (count,)),
+              ('foliage_jitter', '<f4', (leaves, draws, 3)),
+              ('depth', '<u2', (count,)),
+              ('leaf', '<u1', (count,))]
+    layout = []
+    offset = HEADER_SIZE
+    for name, dtype, shape in fields:
+        layout.append((name, dtype, shape, offset))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def save_skeleton(skeleton, path):
+    # Write 'skeleton' to 'path' through a temporary file, so that a reader
+    # never sees half a file
+    count = len(skeleton)
+    leaves = len(skeleton.foliage_jitter)
+    arrays = {'base': skeleton.base,
+              'tip': skeleton.tip,
+              'base_radius': skeleton.base_radius,
+              'top_radius': skeleton.top_radius,
+              'parent': np.asarray(skeleton.parent, dtype=np.int32).view(np.uint32),
+              'foliage_jitter': skeleton.foliage_jitter,
+              'depth': skeleton.depth,
+              'leaf': skeleton.leaf}
+    layout, size = _layout(count, leaves, FOLIAGE_DRAWS)
+    directory = os.path.dirname(os.path.abspath(path))
+    # not named like a skeleton file, so eviction leaves it alone
+    handle, temp = tempfile.mkstemp(suffix=EXTENSION + '.part', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            header = HEADER.pack(MAGIC, VERSION, FOLIAGE_DRAWS, count, leaves, *[float(x) for x in skeleton.origin])
+            f.write(header + b'\0' * (HEADER_SIZE - len(header)))
+            for name, dtype, shape, offset in layout:
+                f.write(np.ascontiguousarray(arrays[name], dtype=dtype).reshape(shape).tobytes())
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp, path)
+    except Exception:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def load_skeleton(path):
+    # Memory map the skeleton file 'path', copy on write so the file never
+    # changes
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError('%s: not a skeleton file' % path)
+    magic, version, draws, count, leaves = HEADER.unpack(header)[:5]
+    if magic != MAGIC or version != VERSION or draws != FOLIAGE_DRAWS:
+        raise ValueError('%s: not a version %d skeleton file' % (path, VERSION))
+    layout, size = _layout(count, leaves, draws)
+    if os.path.getsize(path) != size:
+        raise ValueError('%s: truncated skeleton file' % path)
+    arrays = {}
+    for name, dtype, shape, offset in layout:
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=offset, shape=shape)
+    return TreeSkeleton(arrays['parent'].view(np.int32),
+                        arrays['base'],
+                        arrays['tip'],
+                        arrays['base_radius'],
+                        arrays['top_radius'],
+                        arrays['depth'],
+                        arrays['leaf'].view(bool),
+                        arrays['foliage_jitter'],
+                        np.array(HEADER.unpack(header)[5:], dtype=np.float64))
+
+
+class DiskCache(object):
+    # Skeletons by growth_key() in 'directory', at most max_entries files and
+    # max_bytes of them
+
+    def __init__(self, directory=None, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def get(self, key):
+        # the cached skeleton, or None if it is missing or unreadable
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            skeleton = load_skeleton(path)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            # mark it used, for eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+        return skeleton
+
+    def put(self, key, skeleton):
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            # another process may have made it first
+            if e.errno != errno.EEXIST or not os.path.isdir(self.directory):
+                raise
+        save_skeleton(skeleton, self.path(key))
+        self.evict()
+
+    def evict(self):
+        # Remove the least recently used files until the directory is within
+        # its limits.  Other processes may share it, so files that vanish
+        # meanwhile are skipped, as are files that cannot be removed yet (a
+        # mapped file on Windows).
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        count = len(files)
+        nbytes = sum(size for mtime, size, path in files)
+        for mtime, size, path in files:
+            if count <= self.max_entries and nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    continue
+            count -= 1
+            nbytes -= size
+
+    def skeleton(self, params, seeding='legacy', engine='iterative'):
+        key = growth_key(params, seeding)
+        skeleton = self.get(key)
+        if skeleton is None:
+            skeleton = growth.grow(params, engine=engine, seeding=seeding)
+            self.put(key, skeleton)
+        return skeleton
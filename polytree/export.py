@@ -0,0 +1,458 @@
+"""Headless streaming export of generated trees to .obj, .ply and .glb.
+
+The exporter is a growth builder: segments and foliage tips are meshed in
+chunks as the growth engine walks the tree and spooled to temporary files,
+which are then streamed into the output file.  Peak memory stays bounded by
+the chunk size, whatever the size of the tree.
+
+    python -m polytree.export tree.glb --seed 42 --param tree_depth=7
+
+With --foliage-points the foliage is written as a point cloud of cluster
+transforms instead (see pointcloud) and the mesh file only holds the trunk.
+"""
+import argparse
+import ast
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from polytree import foliage, growth, mesh, pointcloud, rings
+from polytree.budget import MODES, Budget, BudgetExceeded
+from polytree.params import DEFAULT_PARAMS, TreeParams
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.skeleton import FOLIAGE_DRAWS
+from polytree.streams import SEEDINGS, foliage_draws
+
+FORMATS = ('obj', 'ply', 'glb')
+
+# segments or foliage centres meshed per chunk
+CHUNK_SIZE = 4096
+
+
+class MeshSpool(object):
+    # One mesh written piecewise to temporary files: float32 points, int32
+    # face counts and int32 face connects local to this mesh
+
+    def __init__(self, name, color):
+        self.name = name
+        self.color = color
+        self.vertex_count = 0
+        self.face_count = 0
+        self.connect_count = 0
+        self.triangle_count = 0
+        self.bounds_min = np.full(3, np.inf)
+        self.bounds_max = np.full(3, -np.inf)
+        self._points = tempfile.TemporaryFile()
+        self._counts = tempfile.TemporaryFile()
+        self._connects = tempfile.TemporaryFile()
+
+    def write(self, points, face_counts, face_connects):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        face_counts = np.asarray(face_counts, dtype=np.int32)
+        if len(points):
+            self.bounds_min = np.minimum(self.bounds_min, points.min(axis=0))
+            self.bounds_max = np.maximum(self.bounds_max, points.max(axis=0))
+        self._points.write(points.tobytes())
+        self._counts.write(face_counts.tobytes())
+        self._connects.write(np.asarray(face_connects, dtype=np.int32).tobytes())
+        self.vertex_count += len(points)
+        self.face_count += len(face_counts)
+        self.connect_count += int(face_counts.sum())
+        self.triangle_count += int(np.maximum(face_counts - 2, 0).sum())
+
+    def points(self, chunk=CHUNK_SIZE * 64):
+        # (n, 3) float32 point chunks
+        self._points.seek(0)
+        while True:
+            data = self._points.read(chunk * 12)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype=np.float32).reshape(-1, 3)
+
+    def faces(self, chunk=CHUNK_SIZE * 64):
+        # (face_counts, face_connects) chunks
+        self._counts.seek(0)
+        self._connects.seek(0)
+        while True:
+            data = self._counts.read(chunk * 4)
+            if not data:
+                return
+            counts = np.frombuffer(data, dtype=np.int32)
+            connects = np.frombuffer(self._connects.read(int(counts.sum()) * 4), dtype=np.int32)
+            yield counts, connects
+
+    def close(self):
+        for f in (self._points, self._counts, self._connects):
+            f.close()
+
+
+class StreamingMesher(object):
+    # Growth builder meshing the trunk and foliage chunk by chunk into two
+    # MeshSpools.  Ring 0 is the root's base ring and ring s + 1 the tip ring
+    # of segment s, so a child's base ring is found from its parent index
+    # alone.  With a pointcloud.PointWriter as 'points' the foliage centres
+    # are written to it and 'leaves' stays empty.  With min_polys or
+    # twig_radius the rings' side counts follow their radius as in
+    # mesh.tube_mesh, and the first point and sides of every ring are kept in
+    # a table of 16 bytes per segment to find them.  Foliage is placed at the
+    # tip of its segment, which is still on the path of segments from the root
+    # to the last one grown (see skeleton.SkeletonBuilder).
+
+    def __init__(self, params, trunk, leaves, chunk_size=CHUNK_SIZE, points=None, min_polys=None, twig_radius=0.0):
+        self.params = params
+        self.trunk = trunk
+        self.leaves = leaves
+        self.chunk_size = chunk_size
+        self.points = points
+        self.min_polys = min_polys
+        self.twig_radius = twig_radius
+        self.cluster = foliage.cluster_mesh(params.foliage_s, params.foliage_r)
+        self.reference = None
+        self._rings = None if min_polys is None and twig_radius <= 0 else np.zeros((chunk_size + 1, 2), dtype=np.int64)
+        self._ring_count = 0
+        self.segment_count = 0
+        self.foliage_count = 0
+        self._segments = []
+        self._centres = []
+        self._foliage_keys = []
+        self._foliage_tips = []
+        # (index, tip) of the segments from the root to the last one grown
+        self._path = []
+
+    def add_segment(self, parent, prev, base, tip, base_radius, top_radius, depth):
+        index = self.segment_count
+        while self._path and self._path[-1][0] != parent:
+            self._path.pop()
+        self._path.append((index, tip))
+        if parent < 0:
+            if index:
+                raise ValueError('a streamed tree must have a single root')
+            self.reference = base_radius
+            sides = self._sides([base_radius])
+            self._record_rings(sides)
+            self.trunk.write(rings.ring_points(prev, base, base_radius, int(sides[0])), [], [])
+        self._segments.append((parent, base, tip, top_radius))
+        self.segment_count += 1
+        if len(self._segments) >= self.chunk_size:
+            self._flush_segments()
+        return index
+
+    def add_foliage(self, index, jitter):
+        spread = self.params.foliage_spread
+        jitter = np.array(jitter, dtype=np.float64).reshape(-1, 3)[:self.params.foliage_n]
+        self._centres.append(np.asarray(self._tip(index), dtype=np.float64) + (-spread + (spread + spread) * jitter))
+        if len(self._centres) >= self.chunk_size:
+            self._flush_foliage()
+
+    def add_foliage_key(self, index, key):
+        self._foliage_keys.append(key)
+        self._foliage_tips.append(self._tip(index))
+        if len(self._foliage_keys) >= self.chunk_size:
+            self._flush_foliage()
+
+    def build(self):
+        self._flush_segments()
+        self._flush_foliage()
+        return {'segments': self.segment_count,
+                'foliage_clusters': self.foliage_count,
+                'vertices': self.trunk.vertex_count + self.leaves.vertex_count,
+                'faces': self.trunk.face_count + self.leaves.face_count}
+
+    def _tip(self, index):
+        for i, tip in reversed(self._path):
+            if i == index:
+                return tip
+        raise ValueError('foliage of segment %d added after its branch was left' % index)
+
+    def _flush_segments(self):
+        if not self._segments:
+            return
+        parent = np.array([s[0] for s in self._segments], dtype=np.int64)
+        first = self.segment_count - len(self._segments)
+        top_radius = np.array([s[3] for s in self._segments], dtype=np.float64)
+        tip_sides = self._sides(top_radius)
+        tip_points = mesh.ring_array(rings.ring_points, tip_sides, np.array([s[1] for s in self._segments]),
+                                     np.array([s[2] for s in self._segments]), top_radius)
+        # the chunk's rings are recorded first, parents may be among them
+        self._record_rings(tip_sides)
+        base_start, base_sides = self._ring_lookup(parent + 1)
+        tip_start, tip_sides = self._ring_lookup(np.arange(first, self.segment_count) + 1)
+        counts, connects = mesh.tube_faces(base_start, base_sides, tip_start, tip_sides)
+        self.trunk.write(tip_points, counts, connects)
+        self._segments = []
+
+    def _sides(self, radius):
+        return rings.ring_sides(radius, self.reference, self.params.polycount, self.min_polys, self.twig_radius)
+
+    def _record_rings(self, sides):
+        # Ring n is the root's base ring for n = 0 and the tip ring of segment
+        # n - 1 after it; rings are stored one after the other.  Uniform rings
+        # need no table.
+        if self._rings is None:
+            return
+        count = self._ring_count + len(sides)
+        if count > len(self._rings):
+            grown = np.zeros((max(count, 2 * len(self._rings)), 2), dtype=np.int64)
+            grown[:self._ring_count] = self._rings[:self._ring_count]
+            self._rings = grown
+        self._rings[self._ring_count:count, 0] = self.trunk.vertex_count + mesh.ring_starts(sides)
+        self._rings[self._ring_count:count, 1] = sides
+        self._ring_count = count
+
+    def _ring_lookup(self, ring):
+        # (first point, side count) of the given ring numbers
+        if self._rings is None:
+            polys = self.params.polycount
+            return ring * polys, np.full(len(ring), polys, dtype=np.int64)
+        return self._rings[ring, 0], self._rings[ring, 1]
+
+    def _flush_foliage(self):
+        if self._foliage_keys:
+            # branch stream foliage, drawn for the whole chunk at once; none
+            # is drawn without clusters
+            spread = self.params.foliage_spread
+            count = min(self.params.foliage_n, FOLIAGE_DRAWS)
+            if count > 0:
+                jitter = foliage_draws(self._foliage_keys, count * 3).reshape(-1, count, 3)
+                offsets = -spread + (spread + spread) * jitter
+                self._centres.append((np.array(self._foliage_tips, dtype=np.float64)[:, None, :] +
+                                      offsets).reshape(-1, 3))
+            self._foliage_keys = []
+            self._foliage_tips = []
+        if not self._centres:
+            return
+        centres = np.concatenate(self._centres)
+        if self.points is not None:
+            self.points.write(centres)
+        else:
+            clusters = foliage.place_clusters(self.cluster, centres)
+            self.leaves.write(clusters.points, clusters.face_counts,
+                              clusters.face_connects + self.foliage_count * self.cluster.vertex_count)
+        self.foliage_count += len(centres)
+        self._centres = []
+
+
+def export_tree(params, path, format=None, chunk_size=CHUNK_SIZE, seeding='legacy', engine='iterative', budget=None,
+                foliage_points=None, min_polys=None, twig_radius=0.0):
+    # Grow 'params' straight into an .obj, .ply or .glb file and return the
+    # tree's counts.  The format defaults to the file extension, a
+    # budget.Budget is applied first.  With a foliage_points path the foliage
+    # goes there as a .bin or .txt point cloud.  min_polys and twig_radius
+    # make the ring sides follow the branch radius (see rings.ring_sides).
+    if budget is not None:
+        params = budget.apply(params)
+    format = (format or os.path.splitext(path)[1][1:]).lower()
+    if format not in FORMATS:
+        raise ValueError('unknown export format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+    trunk = MeshSpool(TRUNK_NAME, params.tree_color)
+    leaves = MeshSpool(FOLIAGE_NAME, params.foliage_color)
+    points = None
+    try:
+        if foliage_points:
+            points = pointcloud.PointWriter(foliage_points, params.foliage_s, params.seed)
+        counts = growth.grow(params, builder=StreamingMesher(params, trunk, leaves, chunk_size, points, min_polys,
+                                                             twig_radius),
+                             engine=engine, seeding=seeding)
+        with open(path, 'wb') as f:
+            WRITERS[format](f, [trunk] if points else [trunk, leaves])
+    finally:
+        trunk.close()
+        leaves.close()
+        if points is not None:
+            points.close()
+    return counts
+
+
+def write_obj(f, spools):
+    # one object per spool, its vertices followed by its faces; the face
+    # indices count the vertices of every object before it
+    f.write(b'# polytree\n')
+    offset = 1
+    for spool in spools:
+        f.write(('o %s\n' % spool.name).encode('ascii'))
+        for points in spool.points():
+            np.savetxt(f, points, fmt='v %.6f %.6f %.6f')
+        for counts, connects in spool.faces():
+            _write_obj_faces(f, counts, connects + offset)
+        offset += spool.vertex_count
+
+
+def _write_obj_faces(f, counts, connects):
+    if not len(counts):
+        return
+    if (counts == counts[0]).all():
+        np.savetxt(f, connects.reshape(-1, counts[0]), fmt='f' + ' %d' * counts[0])
+        return
+    start = 0
+    for count in counts.tolist():
+        f.write(('f %s\n' % ' '.join(str(k) for k in connects[start:start + count].tolist())).encode('ascii'))
+        start += count
+
+
+def write_ply(f, spools):
+    # binary little endian, one mesh with per vertex colours
+    vertex_count = sum(s.vertex_count for s in spools)
+    face_count = sum(s.face_count for s in spools)
+    f.write(('ply\n'
+             'format binary_little_endian 1.0\n'
+             'comment polytree\n'
+             'element vertex %d\n'
+             'property float x\n'
+             'property float y\n'
+             'property float z\n'
+             'property uchar red\n'
+             'property uchar green\n'
+             'property uchar blue\n'
+             'element face %d\n'
+             'property list uchar int vertex_indices\n'
+             'end_header\n' % (vertex_count, face_count)).encode('ascii'))
+    vertex = np.dtype([('p', '<f4', (3,)), ('c', 'u1', (3,))])
+    for spool in spools:
+        color = np.clip(np.round(np.array(spool.color) * 255.0), 0, 255)
+        for points in spool.points():
+            records = np.empty(len(points), dtype=vertex)
+            records['p'] = points
+            records['c'] = color
+            f.write(records.tobytes())
+    offset = 0
+    for spool in spools:
+        for counts, connects in spool.faces():
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            for count in np.unique(counts).tolist():
+                faces = np.flatnonzero(counts == count)
+                records = np.empty(len(faces), dtype=np.dtype([('n', 'u1'), ('v', '<i4', (count,))]))
+                records['n'] = count
+                records['v'] = connects[starts[faces][:, None] + np.arange(count)] + offset
+                f.write(records.tobytes())
+        offset += spool.vertex_count
+
+
+def write_glb(f, spools, meshes=None, nodes=None):
+    # Binary glTF 2.0, faces as triangle fans.  Every spool is one primitive;
+    # spools of the same name and colour share their material.  'meshes'
+    # lists (name, spool indices) and defaults to one mesh per spool, 'nodes'
+    # lists (name, mesh index, further node properties such as translation,
+    # rotation and scale) and defaults to one node per mesh.  Spools without
+    # faces are left out, and so are the meshes and nodes left empty.
+    if meshes is None:
+        meshes = [(spool.name, [i]) for i, spool in enumerate(spools)]
+    if nodes is None:
+        nodes = [(name, i, {}) for i, (name, parts) in enumerate(meshes)]
+    gltf = {'asset': {'version': '2.0', 'generator': 'polytree'},
+            'scene': 0,
+            'scenes': [{'nodes': []}],
+            'nodes': [],
+            'meshes': [],
+            'materials': [],
+            'accessors': [],
+            'bufferViews': [],
+            'buffers': []}
+    offset = 0
+    materials = {}
+    primitives = {}
+    for i, spool in enumerate(spools):
+        if not spool.face_count:
+            continue
+        points_length = spool.vertex_count * 12
+        indices_length = spool.triangle_count * 12
+        gltf['bufferViews'].append({'buffer': 0, 'byteOffset': offset, 'byteLength': points_length,
+                                    'target': 34962})
+        gltf['bufferViews'].append({'buffer': 0, 'byteOffset': offset + points_length,
+                                    'byteLength': indices_length, 'target': 34963})
+        offset += points_length + indices_length
+        accessor = len(gltf['accessors'])
+        gltf['accessors'].append({'bufferView': len(gltf['bufferViews']) - 2, 'componentType': 5126,
+                                  'count': spool.vertex_count, 'type': 'VEC3', 'min': spool.bounds_min.tolist(),
+                                  'max': spool.bounds_max.tolist()})
+        gltf['accessors'].append({'bufferView': len(gltf['bufferViews']) - 1, 'componentType': 5125,
+                                  'count': spool.triangle_count * 3, 'type': 'SCALAR'})
+        material = (spool.name, tuple(float(c) for c in spool.color))
+        if material not in materials:
+            materials[material] = len(gltf['materials'])
+            gltf['materials'].append({'name': spool.name,
+                                      'pbrMetallicRoughness': {'baseColorFactor': list(material[1]) + [1.0],
+                                                               'metallicFactor': 0.0, 'roughnessFactor': 1.0}})
+        primitives[i] = {'attributes': {'POSITION': accessor}, 'indices': accessor + 1,
+                         'material': materials[material], 'mode': 4}
+    mesh_index = {}
+    for i, (name, parts) in enumerate(meshes):
+        parts = [primitives[part] for part in parts if part in primitives]
+        if parts:
+            mesh_index[i] = len(gltf['meshes'])
+            gltf['meshes'].append({'name': name, 'primitives': parts})
+    for name, mesh_number, properties in nodes:
+        if mesh_number not in mesh_index:
+            continue
+        node = {'name': name, 'mesh': mesh_index[mesh_number]}
+        node.update(properties)
+        gltf['scenes'][0]['nodes'].append(len(gltf['nodes']))
+        gltf['nodes'].append(node)
+    gltf['buffers'].append({'byteLength': offset})
+
+    # points and indices are 4-byte sized so no padding is needed in between
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    f.write(struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(json_chunk) + 8 + offset))
+    f.write(struct.pack('<II', len(json_chunk), 0x4E4F534A))
+    f.write(json_chunk)
+    f.write(struct.pack('<II', offset, 0x004E4942))
+    for spool in spools:
+        if not spool.face_count:
+            continue
+        for points in spool.points():
+            f.write(points.astype('<f4').tobytes())
+        for counts, connects in spool.faces():
+            f.write(mesh.triangulate(counts, connects).astype('<u4').tobytes())
+
+
+WRITERS = {'obj': write_obj, 'ply': write_ply, 'glb': write_glb}
+
+
+def parse_param(text):
+    # 'name=value' to a (field, value) pair of TreeParams
+    name, sep, value = text.partition('=')
+    if not sep or name not in TreeParams._fields:
+        raise argparse.ArgumentTypeError('expected NAME=VALUE with NAME one of %s' % ', '.join(TreeParams._fields))
+    return name, ast.literal_eval(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Grow a tree and export it without Maya.')
+    parser.add_argument('path', help='output .obj, .ply or .glb file')
+    parser.add_argument('--format', choices=FORMATS, help='output format, defaults to the file extension')
+    parser.add_argument('--seed', type=int, default=DEFAULT_PARAMS.seed)
+    parser.add_argument('--seeding', choices=SEEDINGS, default='legacy',
+                        help='legacy: the scripts\' random sequence, branch: a stream per branch')
+    parser.add_argument('--engine', choices=growth.ENGINES, default='iterative',
+                        help='growth engine, level needs branch seeding')
+    parser.add_argument('--max-segments', type=int, help='expected segment budget')
+    parser.add_argument('--max-faces', type=int, help='expected face budget')
+    parser.add_argument('--over-budget', choices=MODES, default='refuse',
+                        help='refuse the tree or lower its level of detail')
+    parser.add_argument('--min-polys', type=int,
+                        help='let thinner branches have fewer ring sides, down to this many')
+    parser.add_argument('--twig-radius', type=float, default=0.0,
+                        help='branches thinner than this get 3-sided rings')
+    parser.add_argument('--foliage-points', metavar='PATH',
+                        help='write the foliage as a .bin or .txt point cloud of cluster transforms')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=VALUE',
+                        help='override a growth parameter, may be repeated')
+    args = parser.parse_args(argv)
+    params = DEFAULT_PARAMS._replace(seed=args.seed, **dict(args.param))
+    budget = Budget(args.max_segments, args.max_faces, args.over_budget)
+    try:
+        counts = export_tree(params, args.path, args.format, seeding=args.seeding, engine=args.engine, budget=budget,
+                             foliage_points=args.foliage_points, min_polys=args.min_polys,
+                             twig_radius=args.twig_radius)
+    except BudgetExceeded as e:
+        parser.exit(1, '%s: %s\n' % (args.path, e))
+    sys.stdout.write('%s: %d segments, %d foliage clusters, %d vertices, %d faces\n' % (
+        args.path, counts['segments'], counts['foliage_clusters'], counts['vertices'], counts['faces']))
+
+
+if __name__ == '__main__':
+    main()
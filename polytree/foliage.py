@@ -0,0 +1,154 @@
+"""Foliage cluster meshing.
+
+Every cluster of a tree has the same topology, so the subdivided solid is
+built once per (size, resolution), kept in a prototype cache shared by all
+trees, and placed as translated copies or instances.
+"""
+import numpy as np
+
+from polytree import polyhedra
+from polytree.cache import LRUCache
+from polytree.mesh import Mesh
+
+# cluster prototypes by (size, resolution); shared, never modify them
+_prototypes = LRUCache(max_entries=16, max_bytes=64 * 1024 * 1024)
+
+
+def cluster_mesh(size, resolution):
+    # One foliage cluster at the origin: polyPlatonicSolid(l=size) smoothed
+    # 'resolution' times
+    key = (float(size), int(resolution))
+    cluster = _prototypes.get(key)
+    if cluster is None:
+        cluster = polyhedra.dodecahedron(size)
+        for i in range(0, resolution):
+            cluster = polyhedra.smooth(cluster)
+        _prototypes.put(key, cluster, cluster.nbytes)
+    return cluster
+
+
+def sphere_mesh(radius, resolution):
+    # One sphere foliage cluster at the origin, as the early generator scripts
+    # made with polySphere(r=radius, sa=resolution, sh=resolution)
+    key = ('sphere', float(radius), int(resolution))
+    cluster = _prototypes.get(key)
+    if cluster is None:
+        cluster = polyhedra.sphere(radius, resolution, resolution)
+        _prototypes.put(key, cluster, cluster.nbytes)
+    return cluster
+
+
+def foliage_mesh(centres, size, resolution):
+    # One mesh with a foliage cluster at every centre.  All clusters share one
+    # topology, so it is built once and copied with array operations.
+    return place_clusters(cluster_mesh(size, resolution), centres)
+
+
+def place_clusters(cluster, centres):
+    # Copies of the cluster mesh translated to every centre, as one mesh
+    centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+    offsets = np.arange(len(centres)) * cluster.vertex_count
+    return Mesh((centres[:, None, :] + cluster.points[None, :, :]).reshape(-1, 3),
+                np.tile(cluster.face_counts, len(centres)),
+                (offsets[:, None] + cluster.face_connects[None, :]).reshape(-1).astype(np.int32))
+
+
+def cluster_radius(cluster):
+    # Radius of the sphere inside a cluster mesh: the distance of its nearest
+    # face centre
+    starts = np.concatenate(([0], np.cumsum(cluster.face_counts)[:-1]))
+    centres = np.add.reduceat(cluster.points[cluster.face_connects], starts) / cluster.face_counts[:, None]
+    return float(np.sqrt((centres * centres).sum(1)).min())
+
+
+def cull_clusters(centres, radius, min_distance=0.0):
+    # Indices of the foliage clusters worth meshing.  A cluster is dropped
+    # when it sits exactly on an earlier one (the clusters of a tip coincide
+    # without foliage_spread), when it is closer than min_distance to an
+    # earlier kept one, or when it is enclosed: on each side (+-x, +-y, +-z)
+    # a kept neighbour overlaps it by more than half its radius.  Neighbours are found with a uniform hash
+    # grid, and the minimum distance pass works on arrays of close pairs in
+    # rounds (see _thin): the cost is linear in the number of close pairs
+    # per round, and the rounds are as many as the longest chain of clusters
+    # each close to the one before, a handful for scattered foliage.
+    centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+    keep = ~_duplicates(centres)
+    if min_distance > 0:
+        kept = np.flatnonzero(keep)
+        first, second, offsets = _neighbour_pairs(centres[kept], min_distance)
+        keep[kept] = _thin(len(kept), first, second)
+    if radius > 0:
+        kept = np.flatnonzero(keep)
+        first, second, offsets = _neighbour_pairs(centres[kept], radius * 1.5)
+        directions = offsets / np.sqrt((offsets * offsets).sum(1))[:, None]
+        sides = np.zeros((len(kept), 6), dtype=bool)
+        for axis in range(3):
+            sides[first[directions[:, axis] > 0.5], axis * 2] = True
+            sides[first[directions[:, axis] < -0.5], axis * 2 + 1] = True
+        keep[kept[sides.all(1)]] = False
+    return np.flatnonzero(keep)
+
+
+def _duplicates(centres):
+    # (count,) bool, the centres equal to one with a lower index.  Coincident
+    # centres would have no direction from each other in the occlusion test.
+    order = np.lexsort(centres.T[::-1])
+    duplicate = np.zeros(len(centres), dtype=bool)
+    duplicate[order[1:]] = (centres[order[1:]] == centres[order[:-1]]).all(1)
+    return duplicate
+
+
+def _thin(count, first, second):
+    # (count,) bool, the clusters kept when each one in index order is
+    # dropped if an earlier kept one is close to it, given the close pairs.
+    # A round drops the clusters next to a kept earlier one, then keeps those
+    # with no earlier neighbour left undecided; every round keeps at least
+    # the first undecided cluster.
+    earlier = first < second
+    first, second = first[earlier], second[earlier]
+    undecided, kept, dropped = 0, 1, 2
+    state = np.zeros(count, dtype=np.int8)
+    while True:
+        state[second[state[first] == kept]] = dropped
+        live = (state[first] != dropped) & (state[second] == undecided)
+        first, second = first[live], second[live]
+        blocked = np.zeros(count, dtype=bool)
+        blocked[second] = True
+        state[(state == undecided) & ~blocked] = kept
+        if not len(first):
+            return state != dropped
+
+
+def _neighbour_pairs(centres, distance):
+    # (first, second, second - first offsets) of every ordered pair of
+    # distinct centres closer than 'distance', found through a hash grid of
+    # 'distance' sized cells and their 27 neighbour cells
+    empty = np.zeros(0, dtype=np.int64)
+    if len(centres) < 2:
+        return empty, empty, np.zeros((0, 3))
+    cells = np.floor((centres - centres.min(0)) / distance).astype(np.int64) + 1
+    dims = cells.max(0) + 2
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    order = np.argsort(keys, kind='mergesort')
+    cell_keys, cell_starts, cell_sizes = np.unique(keys[order], return_index=True, return_counts=True)
+    firsts = []
+    seconds = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                near = keys + (dx * dims[1] + dy) * dims[2] + dz
+                slot = np.minimum(np.searchsorted(cell_keys, near), len(cell_keys) - 1)
+                sizes = np.where(cell_keys[slot] == near, cell_sizes[slot], 0)
+                total = int(sizes.sum())
+                if not total:
+                    continue
+                first = np.repeat(np.arange(len(centres)), sizes)
+                ends = np.cumsum(sizes)
+                position = np.arange(total) - np.repeat(ends - sizes, sizes) + np.repeat(cell_starts[slot], sizes)
+                firsts.append(first)
+                seconds.append(order[position])
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+    offsets = centres[second] - centres[first]
+    close = (first != second) & ((offsets * offsets).sum(1) < distance * distance)
+    return first[close], second[close], offsets[close]
@@ -0,0 +1,170 @@
+"""Forest layouts: many tree instances over a small pool of unique variants.
+
+Variants are deduplicated by a hash of their parameters, so listing the same
+preset and seed twice grows it once.  Every instance is a transform (position
+on the ground, turn about y, uniform scale) and the index of its variant.
+The .glb writer stores one mesh per variant and one node per instance
+pointing at it, so a forest of thousands of trees holds only the geometry of
+its variants.
+
+    python -m polytree.forest forest.glb --preset oak.txt --seeds 0:20 --count 5000 --size 500
+"""
+import argparse
+import collections
+import json
+import math
+import sys
+
+import numpy as np
+
+from polytree import export, growth, pipeline
+from polytree.batch import parse_seeds
+from polytree.cache import params_key
+from polytree.presets import read_preset
+from polytree.sinks import MemorySink
+from polytree.streams import SEEDINGS
+
+SCALE_RANGE = (0.8, 1.2)
+
+
+class Forest(object):
+
+    def __init__(self, variants, variant, translations, yaw, scale):
+        self.variants = variants  # unique TreeParams
+        self.variant = variant  # (N,) int32 variant index of each instance
+        self.translations = translations  # (N, 3) float64
+        self.yaw = yaw  # (N,) float64 turn about y in radians
+        self.scale = scale  # (N,) float64 uniform scale
+
+    def __len__(self):
+        return len(self.variant)
+
+    def rotations(self):
+        # (N, 4) x, y, z, w quaternions of the turns about y
+        half = self.yaw / 2.0
+        zero = np.zeros_like(half)
+        return np.stack((zero, np.sin(half), zero, np.cos(half)), axis=-1)
+
+
+def unique_variants(params_list, seeding='legacy'):
+    # (unique TreeParams in first seen order, index of each input among them)
+    keys = collections.OrderedDict()
+    index = []
+    for params in params_list:
+        key = params_key(params, seeding)
+        if key not in keys:
+            keys[key] = (len(keys), params)
+        index.append(keys[key][0])
+    return [params for i, params in keys.values()], np.array(index, dtype=np.int32)
+
+
+def scatter(params_list, count, width, depth=None, seed=0, scale_range=SCALE_RANGE, seeding='legacy'):
+    # Forest of 'count' instances of the given trees spread uniformly over a
+    # width x depth rectangle centred on the origin, each one a random pick
+    # among the unique variants with a random turn and scale
+    depth = width if depth is None else depth
+    variants, index = unique_variants(params_list, seeding)
+    if not variants:
+        raise ValueError('a forest needs at least one tree variant')
+    rng = np.random.RandomState(seed)
+    # picking among the inputs keeps the weights of repeated ones
+    variant = index[rng.randint(0, len(index), count)]
+    translations = np.zeros((count, 3))
+    translations[:, 0] = rng.uniform(-width / 2.0, width / 2.0, count)
+    translations[:, 2] = rng.uniform(-depth / 2.0, depth / 2.0, count)
+    yaw = rng.uniform(0.0, math.pi * 2.0, count)
+    scale = rng.uniform(scale_range[0], scale_range[1], count)
+    return Forest(variants, variant.astype(np.int32), translations, yaw, scale)
+
+
+def variant_meshes(forest, seeding='legacy', engine='iterative', budget=None):
+    # [(trunk mesh, foliage mesh)] of every variant, each grown once
+    meshes = []
+    for params in forest.variants:
+        built = pipeline.build_tree(params, MemorySink(), seeding=seeding, engine=engine, budget=budget)
+        meshes.append((built[pipeline.TRUNK_NAME], built[pipeline.FOLIAGE_NAME]))
+    return meshes
+
+
+def write_glb(forest, path, seeding='legacy', engine='iterative', budget=None):
+    # Binary glTF 2.0 (see export.write_glb) with one mesh per variant, its
+    # trunk and foliage as two primitives, and one node per instance.
+    # Returns the counts of the file.
+    meshes = variant_meshes(forest, seeding, engine, budget)
+    spools = []
+    try:
+        for params, parts in zip(forest.variants, meshes):
+            for name, part, color in zip((pipeline.TRUNK_NAME, pipeline.FOLIAGE_NAME), parts,
+                                         (params.tree_color, params.foliage_color)):
+                spool = export.MeshSpool(name, color)
+                spools.append(spool)
+                spool.write(part.points, part.face_counts, part.face_connects)
+        variants = [('variant%d' % (i + 1), [2 * i, 2 * i + 1]) for i in range(len(meshes))]
+        instances = [('tree%d' % i, variant, collections.OrderedDict([('translation', translation),
+                                                                      ('rotation', rotation),
+                                                                      ('scale', [scale] * 3)]))
+                     for i, (variant, translation, rotation, scale) in enumerate(zip(forest.variant.tolist(),
+                                                                                     forest.translations.tolist(),
+                                                                                     forest.rotations().tolist(),
+                                                                                     forest.scale.tolist()))]
+        with open(path, 'wb') as f:
+            export.write_glb(f, spools, variants, instances)
+    finally:
+        for spool in spools:
+            spool.close()
+    empty = [not (t.face_count or l.face_count) for t, l in meshes]
+    return {'variants': len(forest.variants),
+            'instances': sum(1 for variant in forest.variant.tolist() if not empty[variant]),
+            'vertices': sum(t.vertex_count + l.vertex_count for t, l in meshes),
+            'faces': sum(t.face_count + l.face_count for t, l in meshes)}
+
+
+def write_layout(forest, path, seeding='legacy'):
+    # The forest as json: every variant's parameters and key, and every
+    # instance's variant index and transform, for placing variants exported
+    # separately (by polytree.batch, say) in another application
+    layout = collections.OrderedDict([
+        ('variants', [collections.OrderedDict([('key', params_key(params, seeding)),
+                                               ('params', params._asdict())]) for params in forest.variants]),
+        ('instances', [collections.OrderedDict([('variant', variant), ('translation', translation),
+                                                ('rotation', rotation), ('scale', scale)])
+                       for variant, translation, rotation, scale in zip(forest.variant.tolist(),
+                                                                        forest.translations.tolist(),
+                                                                        forest.rotations().tolist(),
+                                                                        forest.scale.tolist())]),
+    ])
+    with open(path, 'w') as f:
+        json.dump(layout, f)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scatter instances of a few tree variants into one .glb forest.')
+    parser.add_argument('path', help='output .glb file')
+    parser.add_argument('--preset', required=True, help='preset file written by miniTree\'s save preset')
+    parser.add_argument('--seeds', type=parse_seeds, required=True,
+                        help='variant seeds of the preset, START:STOP or SEED,SEED,...')
+    parser.add_argument('--count', type=int, default=1000, help='number of tree instances')
+    parser.add_argument('--size', type=float, default=200.0, help='width of the square area')
+    parser.add_argument('--layout-seed', type=int, default=0, help='seed of the instance placement')
+    parser.add_argument('--layout', metavar='PATH', help='also write the variants and instances as json')
+    parser.add_argument('--seeding', choices=SEEDINGS, default='legacy',
+                        help='legacy: the scripts\' random sequence, branch: a stream per branch')
+    parser.add_argument('--engine', choices=growth.ENGINES, default='iterative',
+                        help='growth engine, level needs branch seeding')
+    args = parser.parse_args(argv)
+    try:
+        params = read_preset(args.preset)
+    except (ValueError, EnvironmentError) as e:
+        parser.exit(1, '%s\n' % e)
+    forest = scatter([params._replace(seed=seed) for seed in args.seeds], args.count, args.size,
+                     seed=args.layout_seed, seeding=args.seeding)
+    counts = write_glb(forest, args.path, args.seeding, args.engine)
+    if args.layout:
+        write_layout(forest, args.layout, args.seeding)
+    sys.stdout.write('%s: %d instances of %d variants, %d vertices, %d faces\n' % (
+        args.path, counts['instances'], counts['variants'], counts['vertices'], counts['faces']))
+
+
+if __name__ == '__main__':
+    main()
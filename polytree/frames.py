@@ -0,0 +1,76 @@
+"""Per-segment orientation frames.
+
+A segment with unit direction d has the orthonormal frame (a, d, b): 'a' is
+the x axis made perpendicular to d, the axis the scripts' get_sp_point and
+first point_rotate_3d call turned branches about, and b = a x d.  The two
+axis-angle rotations of a branch then compose into one:
+
+    child direction = cos(turn) d + sin(turn) (cos(shift) b + sin(shift) a)
+
+and the same frame gives the segment's ring basis, side = -b and up = -a
+(see rings.ring_basis).  Frames can instead be carried down the tree by
+parallel transport, which keeps the twist of the rings continuous where the
+x-projected frame flips around.
+
+The level engine in growth works out the frame of a segment once, when it
+is grown, and hands it down to the branches growing from it.
+"""
+import numpy as np
+
+
+def x_frames(direction):
+    # (a, b) of each unit direction row, a from the x axis
+    direction = np.asarray(direction, dtype=np.float64)
+    a = -direction[..., 0:1] * direction
+    a[..., 0] += 1.0
+    a /= np.sqrt((a * a).sum(axis=-1))[..., None]
+    return a, np.cross(a, direction)
+
+
+def branch_tips(p_l, direction, a, b, branch_length, branch_turn, branch_shift):
+    # Tip of each branch grown from p_l: the point _branch_tip() in growth
+    # gets with get_sp_point and two point_rotate_3d calls, from the frame of
+    # the last segment.  A negative branch_length turns the shift axis round.
+    ux = direction[:, 0:1]
+    shift = branch_shift * np.sign(branch_length)
+    k = (branch_length[:, None] - 0.1 * ux)
+    sin_turn = np.sin(branch_turn)[:, None]
+    turned = (np.cos(branch_turn)[:, None] * direction +
+              sin_turn * (np.cos(shift)[:, None] * b + np.sin(shift)[:, None] * a))
+    return p_l + 0.1 * ux * direction + k * turned
+
+
+def transport(a, direction, new_direction):
+    # 'a' carried from frames along 'direction' to frames along
+    # 'new_direction' by the smallest rotation between them, re-orthogonalised
+    v = np.cross(direction, new_direction)
+    c = (direction * new_direction).sum(axis=-1)
+    a = (a * c[..., None] + np.cross(v, a) +
+         v * ((v * a).sum(axis=-1) / np.maximum(1.0 + c, 1e-12))[..., None])
+    a = a - (a * new_direction).sum(axis=-1)[..., None] * new_direction
+    a /= np.sqrt((a * a).sum(axis=-1))[..., None]
+    return a, np.cross(a, new_direction)
+
+
+def transported_frames(skeleton):
+    # (a, b) of every segment, and of the root base rings, with frames
+    # transported from parent to child.  Each root starts from the
+    # x-projected frame of its origin->base direction.
+    direction = unit(skeleton.tip - skeleton.base)
+    a = np.empty_like(direction)
+    roots = np.flatnonzero(skeleton.parent < 0)
+    root_direction = unit(skeleton.base[roots] - skeleton.prev_points()[roots])
+    root_a, root_b = x_frames(root_direction)
+    a[roots] = transport(root_a, root_direction, direction[roots])[0]
+    # parents come first and are one level up, so a level at a time will do
+    depth = skeleton.depth
+    for level in range(1, int(depth.max()) + 1 if len(depth) else 0):
+        rows = np.flatnonzero((depth == level) & (skeleton.parent >= 0))
+        parent = skeleton.parent[rows]
+        a[rows] = transport(a[parent], direction[parent], direction[rows])[0]
+    return (a, np.cross(a, direction)), (root_a, root_b)
+
+
+def unit(v):
+    # rows of v scaled to unit length
+    return v / np.sqrt((v * v).sum(axis=-1))[..., None]
@@ -0,0 +1,483 @@
+"""Tree growth engines filling a TreeSkeleton without any scene calls.
+
+These are the growth algorithms of the Maya scripts' create() and
+createPine(), with the polytube and foliage calls replaced by records passed
+to a builder (see skeleton.SkeletonBuilder).  Random draws happen in the same
+order as in the scripts, so a seed grows the same tree.  With 'branch'
+seeding every branch draws from its own stream instead (see streams), which
+makes a branch independent of the order the tree is grown in.
+
+Two engines are available: 'iterative' (the default) walks the tree with an
+explicit work stack of compact branch records, 'recursive' is the straight
+port of the scripts' recursion and serves as the reference for
+engines_agree().  A third, 'level', grows every branch of a level in one
+NumPy batch, turning branches with one composed rotation of the parent
+segment's frame (see frames); it needs 'branch' seeding, whose draws can be
+taken as arrays.
+"""
+import math
+
+import numpy as np
+
+from polytree import frames
+from polytree.skeleton import FOLIAGE_DRAWS, SkeletonBuilder, TreeSkeleton
+from polytree.streams import TRUNK_SLOT, child_keys, draws, foliage_draws, make_streams
+from polytree.vectors import get_sp_point, point_rotate_3d
+
+NORMAL = 1
+PINE = 2
+
+ENGINES = ('iterative', 'recursive', 'level')
+
+# work stack record tags
+_GROW = 0  # a branch still to be grown
+_SPLIT = 1  # a grown segment whose child branches are being drawn
+
+
+def grow(params, builder=None, engine='iterative', seeding='legacy'):
+    # Grow the tree described by 'params' (a TreeParams) and return the
+    # builder's result, a TreeSkeleton by default
+    if engine == 'level':
+        skeleton = _grow_levels(params, seeding)
+        if builder is None:
+            return skeleton
+        _replay(skeleton, builder)
+        return builder.build()
+    if builder is None:
+        builder = SkeletonBuilder()
+    streams = make_streams(seeding, params.seed)
+    if engine == 'iterative':
+        _grow_iterative(builder, streams, params)
+    elif engine == 'recursive':
+        root = streams.root
+        if params.tree_type == PINE:
+            _grow_pine(builder, streams, params, root, -1, params.tree_depth, params.segment_length, params.radius,
+                       [0.0, 1.0, 0.0], [0.0, 0.0, 0.0], 0.0, 0.0, 0.0, params.first_segment_l, 1, 0)
+        else:
+            _grow_normal(builder, streams, params, root, -1, params.tree_depth, params.segment_length, params.radius,
+                         [0.0, 1.0, 0.0], [0.0, 0.0, 0.0], 0.0, 0.0, 0.0, params.first_segment_l, 0)
+    else:
+        raise ValueError('unknown growth engine %r, expected one of %s' % (engine, ', '.join(ENGINES)))
+    return builder.build()
+
+
+def grow_split(params, split_level, seeding='branch'):
+    # The tree grown by the iterative engine down to split_level, and the
+    # branches starting there: (TreeSkeleton, [(branch, parent segment,
+    # number of segments grown before it)]).  grow_branch() grows a branch
+    # into a subtree of its own; see parallel for putting them together.
+    builder = SkeletonBuilder()
+    frontier = []
+    _grow_iterative(builder, make_streams(seeding, params.seed), params, split_level=split_level, frontier=frontier)
+    return builder.build(), [(record, record[1], grown) for record, grown in frontier]
+
+
+def grow_branch(params, branch, seeding='branch'):
+    # The TreeSkeleton of a branch left by grow_split(), grown as a tree whose
+    # root has no parent.  Only with 'branch' seeding does it not depend on
+    # the rest of the tree.
+    builder = SkeletonBuilder()
+    _grow_iterative(builder, make_streams(seeding, params.seed), params, stack=[branch[:1] + (-1,) + branch[2:]])
+    return builder.build()
+
+
+def engines_agree(params, seeding='legacy'):
+    # Equivalence mode: grow 'params' with every engine and check that they
+    # produce the same skeleton as the recursive reference.  The level
+    # engine only runs with branch seeding, and its composed rotations put
+    # points within rounding of the scalar engines' ones.
+    reference = grow(params, engine='recursive', seeding=seeding)
+    for engine in ENGINES:
+        if engine == 'level' and seeding != 'branch':
+            continue
+        skeleton = grow(params, engine=engine, seeding=seeding)
+        for name in ('parent', 'base', 'tip', 'base_radius', 'top_radius', 'depth', 'leaf', 'foliage_jitter',
+                     'origin'):
+            a = getattr(skeleton, name)
+            b = getattr(reference, name)
+            if engine == 'level' and a.dtype.kind == 'f' and a.shape == b.shape:
+                if not np.allclose(a, b, rtol=1e-9, atol=1e-9):
+                    return False
+            elif not np.array_equal(a, b):
+                return False
+    return True
+
+
+def _straight_tip(p_l, p_ll, branch_length):
+    # the last segment extended by branch_length
+    lv = [p_l[0] - p_ll[0], p_l[1] - p_ll[1], p_l[2] - p_ll[2]]
+    m = math.sqrt(math.pow(lv[0], 2) + math.pow(lv[1], 2) + math.pow(lv[2], 2))
+    u = [lv[0] / m, lv[1] / m, lv[2] / m]
+    return [lv[0] + p_ll[0] + (u[0] * branch_length), lv[1] + p_ll[1] + (u[1] * branch_length),
+            lv[2] + p_ll[2] + (u[2] * branch_length)]
+
+
+def _branch_tip(p_l, p_ll, v, branch_turn, branch_shift):
+    # v tilted away from the last segment by branch_turn, then turned around
+    # it by branch_shift
+    newP = [p_l[0] + 0.1, p_l[1], p_l[2]]
+    p = get_sp_point(p_l, p_ll, newP)
+    points = point_rotate_3d(p[0], p[1], p[2],
+                             newP[0], newP[1], newP[2],
+                             v[0], v[1], v[2],
+                             branch_turn)
+    return point_rotate_3d(p_l[0], p_l[1], p_l[2],
+                           v[0], v[1], v[2],
+                           points[0], points[1], points[2],
+                           branch_shift)
+
+
+def _add_foliage(builder, streams, key, index):
+    # Legacy foliage draws come from the shared sequence and are taken now,
+    # branch streams' ones are left to the builder to draw in one batch
+    if streams.batched:
+        builder.add_foliage_key(index, key)
+    else:
+        rng = streams.foliage(key)
+        builder.add_foliage(index, [rng.random() for r in range(FOLIAGE_DRAWS * 3)])
+
+
+def _grow_normal(builder, streams, params, key, parent, p_depth, p_length, p_r, p_l, p_ll,
+                 branch_turn, branch_shift, turn, first_segment_l, level):
+    if p_depth > 0:
+        rng = streams.node(key)
+        v = _straight_tip(p_l, p_ll, p_length * first_segment_l)
+        p_n = _branch_tip(p_l, p_ll, v, branch_turn, branch_shift)
+        index = builder.add_segment(parent, p_ll, p_l, p_n, p_r, p_r * params.radius_d, level)
+
+        # reducing length and radius for a new segment, counting depth
+        p_length = (p_length * params.length_dec)
+        p_r = p_r * params.radius_d
+        p_depth = p_depth - 1.0
+
+        num_branches = params.branches
+        c = 0
+        if p_depth > 0:
+            branch_turn = params.branches_a
+            turn = turn + math.pi / 2.0
+            for i in range(0, num_branches):
+                p_length = p_length + rng.uniform(-0.5, 0.5)
+                branch = True
+                if rng.uniform(0, 1) < params.turn_chance:
+                    turn = turn + rng.uniform(-params.turn_amount, params.turn_amount)
+                if rng.uniform(0, 1) < params.angle_chance:
+                    branch_turn = branch_turn + rng.uniform(-params.angle_amount, params.angle_amount)
+                if rng.uniform(0, 1) < 1.0 - params.branch_chance:
+                    branch = False
+                    c = c + 1
+                if branch:
+                    branch_shift = (i * ((math.pi * 2.0) / num_branches)) + turn
+                    _grow_normal(builder, streams, params, streams.child(key, i + 1), index, p_depth, p_length, p_r,
+                                 p_n, p_l, branch_turn, branch_shift, turn, 1, level + 1)
+
+        if c == num_branches or p_depth <= 0:
+            _add_foliage(builder, streams, key, index)
+
+
+def _grow_pine(builder, streams, params, key, parent, p_depth, p_length, p_r, p_l, p_ll,
+               branch_turn, branch_shift, turn, first_segment_l, pine_level, level):
+    # pine_level 1 grows the straight trunk, 2 the side branches
+    if p_depth > 0:
+        rng = streams.node(key)
+        v = _straight_tip(p_l, p_ll, p_length * first_segment_l)
+        if pine_level == 3 or pine_level == 2:
+            p_n = _branch_tip(p_l, p_ll, v, branch_turn, branch_shift)
+        else:
+            p_n = v
+        index = builder.add_segment(parent, p_ll, p_l, p_n, p_r, p_r * params.radius_d, level)
+
+        # reducing length and radius for a new segment, counting depth
+        p_length = (p_length * params.length_dec)
+        p_r = p_r * params.radius_d
+        p_depth = p_depth - 1.0
+
+        if pine_level == 1:
+            _grow_pine(builder, streams, params, streams.child(key, TRUNK_SLOT), index, p_depth, p_length, p_r,
+                       p_n, p_l, branch_turn, branch_shift, turn, 1, 1, level + 1)
+        num_branches = params.branches
+        c = 0
+        if p_depth > 0:
+            branch_turn = params.branches_a
+            turn = turn + math.pi / 2.0
+            for i in range(0, num_branches):
+                branch = True
+                p_length = p_length + rng.uniform(-0.5, 0.5)
+                if rng.uniform(0, 1) < params.turn_chance:
+                    turn = turn + rng.uniform(-params.turn_amount, params.turn_amount)
+                if rng.uniform(0, 1) < params.angle_chance:
+                    branch_turn = branch_turn + rng.uniform(-params.angle_amount, params.angle_amount)
+                if rng.uniform(0, 1) < 1.0 - params.branch_chance:
+                    branch = False
+                    c = c + 1
+                branch_shift = (i * ((math.pi * 2.0) / num_branches)) + turn
+                if branch:
+                    _grow_pine(builder, streams, params, streams.child(key, i + 1), index, p_depth * 0.5,
+                               p_length * 0.7, p_r, p_n, p_l, branch_turn, branch_shift, turn, 1, 2, level + 1)
+
+        if c == num_branches or p_depth <= 0:
+            _add_foliage(builder, streams, key, index)
+
+
+def _grow_iterative(builder, streams, params, stack=None, split_level=None, frontier=None):
+    # create()/createPine() without recursion.  The stack holds _GROW records
+    # for branches still to be grown and _SPLIT frames for grown segments
+    # whose branch loop is in progress; a frame stays under the branches it
+    # spawns, so draws happen in the same order as in the recursive engine.
+    # Branches starting at split_level are not grown but appended to
+    # 'frontier' as (record, number of segments grown before it).
+    pine = params.tree_type == PINE
+    num_branches = params.branches
+    branches_a = params.branches_a
+    length_dec = params.length_dec
+    radius_d = params.radius_d
+    turn_chance = params.turn_chance
+    turn_amount = params.turn_amount
+    angle_chance = params.angle_chance
+    angle_amount = params.angle_amount
+    skip_chance = 1.0 - params.branch_chance
+    shift_step = (math.pi * 2.0) / num_branches
+    quarter = math.pi / 2.0
+    node = streams.node
+    child = streams.child
+    add_segment = builder.add_segment
+
+    # record: tag, parent, depth, length, radius, tip, prev, branch_turn, branch_shift, turn, first segment
+    #         length factor, pine level, level, stream key
+    if stack is None:
+        stack = [(_GROW, -1, params.tree_depth, params.segment_length, params.radius, [0.0, 1.0, 0.0],
+                  [0.0, 0.0, 0.0], 0.0, 0.0, 0.0, params.first_segment_l, 1, 0, streams.root)]
+    grown = 0
+    while stack:
+        item = stack[-1]
+        if item[0] == _GROW:
+            stack.pop()
+            (tag, parent, p_depth, p_length, p_r, p_l, p_ll,
+             branch_turn, branch_shift, turn, first_segment_l, pine_level, level, key) = item
+            if p_depth <= 0:
+                continue
+            if level == split_level:
+                frontier.append((item, grown))
+                continue
+            v = _straight_tip(p_l, p_ll, p_length * first_segment_l)
+            if pine and pine_level == 1:
+                p_n = v
+            else:
+                p_n = _branch_tip(p_l, p_ll, v, branch_turn, branch_shift)
+            index = add_segment(parent, p_ll, p_l, p_n, p_r, p_r * radius_d, level)
+            grown += 1
+
+            p_length = (p_length * length_dec)
+            p_r = p_r * radius_d
+            p_depth = p_depth - 1.0
+            if p_depth > 0:
+                # frame: tag, segment, depth, length, radius, tip, base, branch_turn, turn, next branch,
+                #        skipped branches, pine level, level, stream key, stream
+                stack.append([_SPLIT, index, p_depth, p_length, p_r, p_n, p_l, branches_a, turn + quarter, 0, 0,
+                              pine_level, level, key, node(key)])
+                if pine and pine_level == 1:
+                    # the trunk carries on before the side branches are drawn
+                    stack.append((_GROW, index, p_depth, p_length, p_r, p_n, p_l, branch_turn, branch_shift, turn,
+                                  1, 1, level + 1, child(key, TRUNK_SLOT)))
+            else:
+                _add_foliage(builder, streams, key, index)
+        else:
+            i = item[9]
+            if i == num_branches:
+                stack.pop()
+                if item[10] == num_branches:
+                    _add_foliage(builder, streams, item[13], item[1])
+                continue
+            item[9] = i + 1
+            uniform = item[14].uniform
+            p_length = item[3] + uniform(-0.5, 0.5)
+            item[3] = p_length
+            branch = True
+            if uniform(0, 1) < turn_chance:
+                item[8] = item[8] + uniform(-turn_amount, turn_amount)
+            if uniform(0, 1) < angle_chance:
+                item[7] = item[7] + uniform(-angle_amount, angle_amount)
+            if uniform(0, 1) < skip_chance:
+                branch = False
+                item[10] = item[10] + 1
+            if branch:
+                turn = item[8]
+                branch_shift = (i * shift_step) + turn
+                if pine:
+                    stack.append((_GROW, item[1], item[2] * 0.5, p_length * 0.7, item[4], item[5], item[6],
+                                  item[7], branch_shift, turn, 1, 2, item[12] + 1, child(item[13], i + 1)))
+                else:
+                    stack.append((_GROW, item[1], item[2], p_length, item[4], item[5], item[6],
+                                  item[7], branch_shift, turn, 1, 2, item[12] + 1, child(item[13], i + 1)))
+
+
+def _grow_levels(params, seeding):
+    # create()/createPine() one level at a time: the branches starting at a
+    # level are grown as one batch of arrays, and each branch's draws are
+    # taken from its counter-based stream with a counter per branch.  The
+    # segments come out level by level and are put back into the depth-first
+    # order of the other engines at the end.
+    if seeding != 'branch':
+        raise ValueError('the level engine needs branch seeding, got %r' % seeding)
+    streams = make_streams(seeding, params.seed)
+    pine = params.tree_type == PINE
+    num_branches = params.branches
+    turn_amount = params.turn_amount
+    angle_amount = params.angle_amount
+    skip_chance = 1.0 - params.branch_chance
+    shift_step = (math.pi * 2.0) / num_branches
+    quarter = math.pi / 2.0
+
+    # branches starting at the current level, one array entry each
+    parent = np.array([-1])
+    p_depth = np.array([params.tree_depth], dtype=np.float64)
+    p_length = np.array([params.segment_length], dtype=np.float64)
+    p_r = np.array([params.radius], dtype=np.float64)
+    p_l = np.array([[0.0, 1.0, 0.0]])
+    p_ll = np.array([[0.0, 0.0, 0.0]])
+    branch_turn = np.zeros(1)
+    branch_shift = np.zeros(1)
+    turn = np.zeros(1)
+    first_segment_l = np.array([params.first_segment_l], dtype=np.float64)
+    trunk = np.ones(1, dtype=bool)  # pine_level 1
+    key = np.array([streams.root], dtype=np.uint64)
+    # unit direction and frame of the last segment, worked out once per
+    # segment and carried to the branches growing from it
+    u = frames.unit(p_l - p_ll)
+    a, b = frames.x_frames(u)
+
+    levels = []
+    count = 0
+    level = 0
+    while True:
+        live = p_depth > 0
+        if not live.any():
+            break
+        (parent, p_depth, p_length, p_r, p_l, p_ll, branch_turn, branch_shift, turn, first_segment_l, trunk,
+         key, u, a, b) = [c[live] for c in (parent, p_depth, p_length, p_r, p_l, p_ll, branch_turn, branch_shift,
+                                            turn, first_segment_l, trunk, key, u, a, b)]
+        n = len(parent)
+        branch_length = p_length * first_segment_l
+        # the last segment extended by branch_length, turned for bent branches
+        p_n = p_l + u * branch_length[:, None]
+        bent = ~trunk if pine else np.ones(n, dtype=bool)
+        if bent.any():
+            p_n[bent] = frames.branch_tips(p_l[bent], u[bent], a[bent], b[bent], branch_length[bent],
+                                           branch_turn[bent], branch_shift[bent])
+        index = np.arange(count, count + n)
+        count += n
+        segments = [parent, p_ll, p_l, p_n, p_r, p_r * params.radius_d]
+
+        p_length = (p_length * params.length_dec)
+        p_r = p_r * params.radius_d
+        p_depth = p_depth - 1.0
+        split = np.flatnonzero(p_depth > 0)
+        # frames of the segments with children, handed down to them
+        split_u = frames.unit(p_n[split] - p_l[split])
+        split_a, split_b = frames.x_frames(split_u)
+
+        # children of this level, one list entry per child slot, trunk first
+        children = []
+        if pine:
+            carried = trunk[split]
+            carry = split[carried]
+            children.append((index[carry], p_depth[carry], p_length[carry], p_r[carry], p_n[carry], p_l[carry],
+                             branch_turn[carry], branch_shift[carry], turn[carry], np.ones(len(carry)),
+                             np.ones(len(carry), dtype=bool), child_keys(key[carry], TRUNK_SLOT),
+                             split_u[carried], split_a[carried], split_b[carried]))
+        counter = np.zeros(len(split), dtype=np.int64)
+        split_key = key[split]
+        split_length = p_length[split]
+        split_turn = np.full(len(split), params.branches_a)
+        split_spin = turn[split] + quarter
+        skipped = np.zeros(len(split), dtype=np.int64)
+        for i in range(0, num_branches):
+            split_length = split_length + _uniform(-0.5, 0.5, draws(split_key, counter))
+            turned = draws(split_key, counter + 1) < params.turn_chance
+            counter += 2
+            split_spin = np.where(turned, split_spin + _uniform(-turn_amount, turn_amount, draws(split_key, counter)),
+                                  split_spin)
+            counter += turned
+            angled = draws(split_key, counter) < params.angle_chance
+            counter += 1
+            split_turn = np.where(angled, split_turn + _uniform(-angle_amount, angle_amount, draws(split_key, counter)),
+                                  split_turn)
+            counter += angled
+            branch = ~(draws(split_key, counter) < skip_chance)
+            counter += 1
+            skipped += ~branch
+            grown = split[branch]
+            if pine:
+                child_depth = p_depth[grown] * 0.5
+                child_length = split_length[branch] * 0.7
+            else:
+                child_depth = p_depth[grown]
+                child_length = split_length[branch]
+            children.append((index[grown], child_depth, child_length, p_r[grown], p_n[grown], p_l[grown],
+                             split_turn[branch], (i * shift_step) + split_spin[branch], split_spin[branch],
+                             np.ones(len(grown)), np.zeros(len(grown), dtype=bool),
+                             child_keys(split_key[branch], i + 1), split_u[branch], split_a[branch],
+                             split_b[branch]))
+
+        leaf = p_depth <= 0
+        leaf[split] = skipped == num_branches
+        jitter = foliage_draws(key[leaf], FOLIAGE_DRAWS * 3)
+        levels.append(segments + [leaf, jitter])
+
+        # next level's branches, grouped by parent with the trunk first
+        columns = [np.concatenate(c) for c in zip(*children)]
+        order = np.argsort(columns[0], kind='mergesort')
+        (parent, p_depth, p_length, p_r, p_l, p_ll, branch_turn, branch_shift, turn, first_segment_l, trunk,
+         key, u, a, b) = [c[order] for c in columns]
+        p_l, p_ll, u, a, b = [c.reshape(-1, 3) for c in (p_l, p_ll, u, a, b)]
+        level += 1
+
+    if not levels:
+        return SkeletonBuilder().build()
+    return _depth_first([np.concatenate(c) for c in zip(*levels)], [len(l[0]) for l in levels])
+
+
+def _uniform(a, b, r):
+    # random.uniform(a, b) for the draws r
+    return a + (b - a) * r
+
+
+def _depth_first(columns, sizes):
+    # Reorder level-by-level segments into depth-first order.  A segment's
+    # place is its parent's place, plus one, plus the sizes of the subtrees
+    # of its earlier siblings; siblings are stored next to each other.
+    parent, prev, base, tip, base_radius, top_radius, leaf, jitter = columns
+    count = len(parent)
+    depth = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+    starts = np.cumsum([0] + sizes)
+    subtree = np.ones(count, dtype=np.int64)
+    for level in range(len(sizes) - 1, 0, -1):
+        rows = np.arange(starts[level], starts[level + 1])
+        np.add.at(subtree, parent[rows], subtree[rows])
+    place = np.zeros(count, dtype=np.int64)
+    for level in range(1, len(sizes)):
+        rows = np.arange(starts[level], starts[level + 1])
+        before = np.cumsum(subtree[rows]) - subtree[rows]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = parent[rows][1:] != parent[rows][:-1]
+        before -= before[first][np.cumsum(first) - 1]
+        place[rows] = place[parent[rows]] + 1 + before
+    order = np.empty(count, dtype=np.int64)
+    order[place] = np.arange(count)
+    parent = parent[order]
+    jitter = jitter.reshape(-1, FOLIAGE_DRAWS, 3)[np.argsort(place[leaf], kind='mergesort')]
+    return TreeSkeleton(np.where(parent < 0, -1, place[np.maximum(parent, 0)]).astype(np.int32),
+                        base[order], tip[order], base_radius[order], top_radius[order], depth[order], leaf[order],
+                        jitter, prev[0].copy())
+
+
+def _replay(skeleton, builder):
+    # Feed a grown skeleton to a builder in its depth-first order, the
+    # foliage of a leaf right after its segment
+    prev = skeleton.prev_points()
+    jitter = iter(skeleton.foliage_jitter)
+    for i in range(len(skeleton)):
+        builder.add_segment(int(skeleton.parent[i]), prev[i].tolist(), skeleton.base[i].tolist(),
+                            skeleton.tip[i].tolist(), float(skeleton.base_radius[i]),
+                            float(skeleton.top_radius[i]), int(skeleton.depth[i]))
+        if skeleton.leaf[i]:
+            builder.add_foliage(i, next(jitter).reshape(-1).tolist())
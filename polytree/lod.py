@@ -0,0 +1,188 @@
+"""Level of detail chains grown from a single skeleton.
+
+Every level meshes the same skeleton and the same foliage centres, so the
+silhouettes match from level to level.  A level lowers the ring side count,
+keeps fewer, larger foliage clusters smoothed fewer times and drops the
+thinnest twigs, but never the trunk, so the outline of the tree holds.
+
+    python -m polytree.lod tree.glb --seed 42 --levels 4
+
+writes tree_LOD0.glb to tree_LOD3.glb.
+"""
+import argparse
+import collections
+import os
+import sys
+
+import numpy as np
+
+from polytree import foliage, frames, growth, mesh
+from polytree.budget import MODES, Budget, BudgetExceeded
+from polytree.export import FORMATS, WRITERS, MeshSpool, parse_param
+from polytree.params import DEFAULT_PARAMS
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.streams import SEEDINGS
+
+LEVELS = 4
+
+Level = collections.namedtuple('Level', [
+    'polycount',  # ring sides
+    'min_radius',  # segments with a thinner base are dropped, with all they carry, the trunk excepted
+    'foliage_r',  # foliage smooth iterations
+    'foliage_spacing',  # clusters closer than this to a kept one are dropped
+])
+
+
+def default_levels(params, count=LEVELS):
+    # 'count' levels from the full tree down: each one halves the ring sides
+    # (at least 3), spaces the foliage clusters half a cluster further apart
+    # and smooths them once less.  All but the first drop the twigs, the
+    # segments thinner than the branches they grow from.
+    levels = []
+    for i in range(count):
+        # base radii are radius * radius_d ** depth, cut halfway between the
+        # last two levels
+        twigs = i > 0 and params.tree_depth > 1
+        min_radius = params.radius * params.radius_d ** (params.tree_depth - 1.5) if twigs else 0.0
+        levels.append(Level(max(3, int(round(params.polycount / 2.0 ** i))), min_radius,
+                            max(0, params.foliage_r - i), params.foliage_s * i * 0.5))
+    return levels
+
+
+def prune(skeleton, min_radius):
+    # The skeleton without the segments whose base radius is below
+    # min_radius, nor anything growing from them; the trunk is always kept
+    return skeleton.subset(kept_segments(skeleton, min_radius))
+
+
+def kept_segments(skeleton, min_radius):
+    # (N,) bool, the segments prune() keeps
+    keep = (skeleton.base_radius >= min_radius) | trunk_segments(skeleton)
+    has_parent = skeleton.parent >= 0
+    while True:
+        kept = keep.copy()
+        kept[has_parent] &= keep[skeleton.parent[has_parent]]
+        if (kept == keep).all():
+            break
+        keep = kept
+    return keep
+
+
+def trunk_segments(skeleton):
+    # (N,) bool, the trunk: the root and, from every segment of it on, the
+    # child going on the straightest.  On pines that is the straight stem,
+    # on other trees the branch line that carries the height.
+    direction = frames.unit(skeleton.tip - skeleton.base)
+    child = np.flatnonzero(skeleton.parent >= 0)
+    parent = skeleton.parent[child]
+    straight = (direction[child] * direction[parent]).sum(1)
+    order = np.lexsort((-straight, parent))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = parent[order][1:] != parent[order][:-1]
+    straightest = np.full(len(skeleton), -1)
+    straightest[parent[order][first]] = child[order][first]
+    trunk = np.zeros(len(skeleton), dtype=bool)
+    segment = np.flatnonzero(skeleton.parent < 0)
+    while len(segment):
+        trunk[segment] = True
+        segment = straightest[segment]
+        segment = segment[segment >= 0]
+    return trunk
+
+
+def lod_meshes(params, levels=None, seeding='legacy', engine='iterative', cache=None, twist='legacy', min_polys=None,
+               twig_radius=0.0):
+    # [(trunk mesh, foliage mesh)] of every level, meshed from one grown
+    # skeleton (taken from a cache.TreeCache when given) and one set of
+    # foliage centres.  Clusters stay where they are on every level, thinned
+    # out by foliage.cull_clusters() and scaled up to keep the volume of the
+    # foliage.  min_polys and twig_radius make the ring sides of every level
+    # follow the branch radius, as in mesh.tube_mesh.
+    levels = default_levels(params) if levels is None else levels
+    if cache is None:
+        skeleton = growth.grow(params, engine=engine, seeding=seeding)
+    else:
+        skeleton = cache.skeleton(params, seeding, engine)
+    centres = skeleton.foliage_centres(params.foliage_n, params.foliage_spread)
+    meshes = []
+    for level in levels:
+        trunk = mesh.tube_mesh(prune(skeleton, level.min_radius), level.polycount, twist, min_polys, twig_radius)
+        kept = centres
+        if level.foliage_spacing > 0 and len(centres):
+            kept = centres[foliage.cull_clusters(centres, 0.0, level.foliage_spacing)]
+        scale = (float(len(centres)) / len(kept)) ** (1 / 3.0) if len(kept) else 1.0
+        leaves = foliage.foliage_mesh(kept, params.foliage_s * scale, level.foliage_r)
+        meshes.append((trunk, leaves))
+    return meshes
+
+
+def level_path(path, index):
+    # tree.glb -> tree_LOD<index>.glb
+    stem, ext = os.path.splitext(path)
+    return '%s_LOD%d%s' % (stem, index, ext)
+
+
+def export_lods(params, path, levels=None, format=None, seeding='legacy', engine='iterative', budget=None,
+                twist='legacy', min_polys=None, twig_radius=0.0):
+    # Write every level to its own file named by level_path() and return
+    # [(path, counts)].  The format defaults to the file extension, a
+    # budget.Budget is applied to the full tree first.
+    if budget is not None:
+        params = budget.apply(params)
+    format = (format or os.path.splitext(path)[1][1:]).lower()
+    if format not in FORMATS:
+        raise ValueError('unknown export format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+    written = []
+    for i, (trunk, leaves) in enumerate(lod_meshes(params, levels, seeding, engine, twist=twist,
+                                                   min_polys=min_polys, twig_radius=twig_radius)):
+        spools = [MeshSpool(TRUNK_NAME, params.tree_color), MeshSpool(FOLIAGE_NAME, params.foliage_color)]
+        try:
+            for spool, part in zip(spools, (trunk, leaves)):
+                spool.write(part.points, part.face_counts, part.face_connects)
+            with open(level_path(path, i), 'wb') as f:
+                WRITERS[format](f, spools)
+        finally:
+            for spool in spools:
+                spool.close()
+        written.append((level_path(path, i), {'vertices': trunk.vertex_count + leaves.vertex_count,
+                                              'faces': trunk.face_count + leaves.face_count}))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Grow a tree once and export a chain of levels of detail.')
+    parser.add_argument('path', help='output .obj, .ply or .glb file, _LOD<n> is added to its name')
+    parser.add_argument('--format', choices=FORMATS, help='output format, defaults to the file extension')
+    parser.add_argument('--levels', type=int, default=LEVELS, help='number of levels')
+    parser.add_argument('--seed', type=int, default=DEFAULT_PARAMS.seed)
+    parser.add_argument('--seeding', choices=SEEDINGS, default='legacy',
+                        help='legacy: the scripts\' random sequence, branch: a stream per branch')
+    parser.add_argument('--engine', choices=growth.ENGINES, default='iterative',
+                        help='growth engine, level needs branch seeding')
+    parser.add_argument('--max-segments', type=int, help='expected segment budget')
+    parser.add_argument('--max-faces', type=int, help='expected face budget')
+    parser.add_argument('--over-budget', choices=MODES, default='refuse',
+                        help='refuse the tree or lower its level of detail')
+    parser.add_argument('--twist', choices=mesh.TWISTS, default='legacy',
+                        help='legacy: the scripts\' ring orientation, continuous: frames carried down the tree')
+    parser.add_argument('--min-polys', type=int,
+                        help='let thinner branches have fewer ring sides, down to this many')
+    parser.add_argument('--twig-radius', type=float, default=0.0,
+                        help='branches thinner than this get 3-sided rings')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=VALUE',
+                        help='override a growth parameter, may be repeated')
+    args = parser.parse_args(argv)
+    params = DEFAULT_PARAMS._replace(seed=args.seed, **dict(args.param))
+    budget = Budget(args.max_segments, args.max_faces, args.over_budget)
+    try:
+        params = budget.apply(params)
+    except BudgetExceeded as e:
+        parser.exit(1, '%s: %s\n' % (args.path, e))
+    for path, counts in export_lods(params, args.path, default_levels(params, args.levels), args.format,
+                                    args.seeding, args.engine, twist=args.twist, min_polys=args.min_polys,
+                                    twig_radius=args.twig_radius):
+        sys.stdout.write('%s: %d vertices, %d faces\n' % (path, counts['vertices'], counts['faces']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Indexed polygon meshes and the shared-vertex tube mesher.
+
+Meshes use the flat layout of MFnMesh.create: a (V, 3) point array, the
+vertex count of every face and the concatenated face vertex indices.
+"""
+import numpy as np
+
+from polytree import frames, rings
+
+TWISTS = ('legacy', 'continuous')
+
+
+class Mesh(object):
+
+    def __init__(self, points, face_counts, face_connects):
+        self.points = points  # (V, 3) float64
+        self.face_counts = face_counts  # (F,) int32 vertices per face
+        self.face_connects = face_connects  # (sum(face_counts),) int32 point indices
+
+    @property
+    def vertex_count(self):
+        return len(self.points)
+
+    @property
+    def face_count(self):
+        return len(self.face_counts)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.face_counts.nbytes + self.face_connects.nbytes
+
+
+def concatenate(meshes):
+    # One mesh holding all the given meshes, indices offset accordingly
+    meshes = list(meshes)
+    if not meshes:
+        return Mesh(np.zeros((0, 3)), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+    offsets = np.cumsum([0] + [m.vertex_count for m in meshes[:-1]])
+    return Mesh(np.concatenate([m.points for m in meshes]),
+                np.concatenate([m.face_counts for m in meshes]).astype(np.int32),
+                np.concatenate([m.face_connects + offset for m, offset in zip(meshes, offsets)]).astype(np.int32))
+
+
+def triangulate(face_counts, face_connects):
+    # (T, 3) triangle fan indices of the given faces
+    face_counts = np.asarray(face_counts)
+    starts = np.concatenate(([0], np.cumsum(face_counts)[:-1])).astype(np.int64)
+    fans = np.maximum(face_counts - 2, 0)
+    first = np.repeat(starts, fans)
+    step = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans) + 1
+    return np.stack((face_connects[first], face_connects[first + step], face_connects[first + step + 1]),
+                    axis=-1)
+
+
+def ring_tubes(base_rings, tip_rings):
+    # One mesh of separate tubes between the (N, polys, 3) base and tip rings,
+    # for trees whose segments do not share their joint rings
+    count, polys = base_rings.shape[:2]
+    points = np.concatenate((base_rings, tip_rings), axis=1).reshape(-1, 3)
+    connects = (np.arange(count) * 2 * polys)[:, None, None] + rings.quad_indices(polys)
+    return Mesh(points,
+                np.full(count * polys, 4, dtype=np.int32),
+                connects.reshape(-1).astype(np.int32))
+
+
+def tube_mesh(skeleton, polys, twist='legacy', min_polys=None, twig_radius=0.0):
+    # All segment tubes of a skeleton as one indexed mesh.  Every segment
+    # adds only its tip ring: its base ring is its parent's tip ring (same
+    # centre, axis and radius), so joints are shared instead of welded
+    # afterwards.  Only root segments get a base ring of their own.
+    # twist='continuous' orients the rings with frames carried down the tree
+    # instead of the scripts' x-projected ones, so they do not twist.
+    # With min_polys the rings have fewer sides the thinner they are, from
+    # 'polys' at the root down to min_polys, and 3 below twig_radius (see
+    # rings.ring_sides); tubes between rings of different sizes are closed
+    # with triangles.
+    count = len(skeleton)
+    roots = np.flatnonzero(skeleton.parent < 0)
+    if twist not in TWISTS:
+        raise ValueError('unknown ring twist %r, expected one of %s' % (twist, ', '.join(TWISTS)))
+    reference = skeleton.base_radius[roots].max() if len(roots) else 1.0
+    tip_sides = rings.ring_sides(skeleton.top_radius, reference, polys, min_polys, twig_radius)
+    root_sides = rings.ring_sides(skeleton.base_radius[roots], reference, polys, min_polys, twig_radius)
+    if twist == 'legacy':
+        tip_points = ring_array(rings.ring_points, tip_sides, skeleton.base, skeleton.tip, skeleton.top_radius)
+        root_points = ring_array(rings.ring_points, root_sides, skeleton.prev_points()[roots], skeleton.base[roots],
+                                 skeleton.base_radius[roots])
+    else:
+        (a, b), (root_a, root_b) = frames.transported_frames(skeleton)
+        tip_points = ring_array(rings.ring_around, tip_sides, skeleton.tip, skeleton.top_radius, -b, -a)
+        root_points = ring_array(rings.ring_around, root_sides, skeleton.base[roots], skeleton.base_radius[roots],
+                                 -root_b, -root_a)
+    points = np.concatenate((tip_points, root_points))
+
+    # first point of each segment's base and tip ring
+    tip_start = ring_starts(tip_sides)
+    base_start = np.empty(count, dtype=np.int64)
+    base_sides = np.empty(count, dtype=np.int64)
+    has_parent = skeleton.parent >= 0
+    base_start[has_parent] = tip_start[skeleton.parent[has_parent]]
+    base_sides[has_parent] = tip_sides[skeleton.parent[has_parent]]
+    base_start[roots] = len(tip_points) + ring_starts(root_sides)
+    base_sides[roots] = root_sides
+
+    face_counts, face_connects = tube_faces(base_start, base_sides, tip_start, tip_sides)
+    return Mesh(points, face_counts, face_connects)
+
+
+def ring_starts(sides):
+    # First point of each ring when rings of the given side counts are
+    # stored one after the other
+    sides = np.asarray(sides, dtype=np.int64)
+    return np.cumsum(sides) - sides
+
+
+def ring_array(ring, sides, *columns):
+    # (sum(sides), 3) points of rings with the given side counts, stored one
+    # after the other.  Ring k is ring(column[k]..., sides[k]) for a batched
+    # ring function such as rings.ring_points; every side count is one call.
+    starts = ring_starts(sides)
+    points = np.empty((int(np.sum(sides)), 3))
+    for polys in np.unique(sides).tolist():
+        rows = np.flatnonzero(sides == polys)
+        made = ring(*([column[rows] for column in columns] + [polys]))
+        points[(starts[rows][:, None] + np.arange(polys)).reshape(-1)] = made.reshape(-1, 3)
+    return points
+
+
+def tube_faces(base_start, base_sides, tip_start, tip_sides):
+    # (face counts, face connects) of the sides of tubes from base rings to
+    # tip rings, given the first point and side count of every ring, in
+    # segment order.  Each pair of side counts is indexed in one go.
+    count = len(base_start)
+    pairs = base_sides * (int(tip_sides.max()) + 1 if count else 1) + tip_sides
+    groups = []
+    face_total = np.zeros(count, dtype=np.int64)
+    connect_total = np.zeros(count, dtype=np.int64)
+    for pair in np.unique(pairs).tolist():
+        rows = np.flatnonzero(pairs == pair)
+        m = int(base_sides[rows[0]])
+        counts, connects = rings.transition_indices(m, int(tip_sides[rows[0]]))
+        local = np.where(connects < m,
+                         base_start[rows][:, None] + connects,
+                         tip_start[rows][:, None] + (connects - m))
+        face_total[rows] = len(counts)
+        connect_total[rows] = len(connects)
+        groups.append((rows, counts, local))
+
+    face_start = ring_starts(face_total)
+    connect_start = ring_starts(connect_total)
+    face_counts = np.empty(int(face_total.sum()), dtype=np.int32)
+    face_connects = np.empty(int(connect_total.sum()), dtype=np.int32)
+    for rows, counts, local in groups:
+        face_counts[face_start[rows][:, None] + np.arange(len(counts))] = counts
+        face_connects[connect_start[rows][:, None] + np.arange(local.shape[1])] = local
+    return face_counts, face_connects
@@ -0,0 +1,101 @@
+"""Grow a tree's subtrees on a pool of worker processes.
+
+The tree is grown down to split_level in this process; every branch starting
+at split_level is then grown as an independent subtree by a worker, and the
+subtrees are merged back into one skeleton.  Only 'branch' seeding makes a
+subtree independent of the rest of the tree, and with it the merged skeleton
+is exactly the one growth.grow() produces, segment order included.
+
+This is a standalone API for growing one big tree on several cores:
+
+    skeleton = grow_parallel(params, processes=4)
+
+The front ends and the batch exporter grow each tree in one process; the
+batch exporter already spreads whole trees over its workers.
+"""
+import multiprocessing
+
+import numpy as np
+
+from polytree import growth
+from polytree.skeleton import FOLIAGE_DRAWS, TreeSkeleton
+
+SPLIT_LEVEL = 2
+
+
+def grow_parallel(params, processes=None, split_level=SPLIT_LEVEL, seeding='branch'):
+    # Grow 'params' on 'processes' workers (all cores by default) and return
+    # its TreeSkeleton
+    if seeding != 'branch':
+        raise ValueError('parallel growth needs branch seeding, the %r sequence is shared by all branches' % seeding)
+    if split_level < 1:
+        raise ValueError('split_level must be at least 1, got %r' % split_level)
+    top, branches = growth.grow_split(params, split_level, seeding)
+    jobs = [(params, seeding, branch) for branch, parent, grown in branches]
+    if processes == 1 or len(jobs) < 2:
+        subtrees = [_grow_subtree(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            # map() returns results in job order whatever finishes first
+            subtrees = pool.map(_grow_subtree, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return merge(top, [grown for branch, parent, grown in branches], [parent for branch, parent, grown in branches],
+                 subtrees)
+
+
+def _grow_subtree(job):
+    # the subtree is grown as a tree of its own, its root's parent is set by
+    # merge()
+    params, seeding, branch = job
+    return growth.grow_branch(params, branch, seeding)
+
+
+def merge(top, positions, parents, subtrees):
+    # Merge 'subtrees' into the skeleton 'top'.  Subtree j hangs from top
+    # segment parents[j] and was split off after positions[j] top segments
+    # had been grown; it is put back there, so the result keeps the
+    # depth-first order of an unsplit grow.
+    top_index = np.empty(len(top), dtype=np.int64)
+    offsets = []
+    cursor = 0
+    done = 0
+    for position, subtree in zip(positions, subtrees):
+        top_index[done:position] = np.arange(cursor, cursor + position - done)
+        cursor += position - done
+        done = position
+        offsets.append(cursor)
+        cursor += len(subtree)
+    top_index[done:] = np.arange(cursor, cursor + len(top) - done)
+    count = cursor + len(top) - done
+
+    parent = np.empty(count, dtype=np.int32)
+    base = np.empty((count, 3), dtype=np.float64)
+    tip = np.empty((count, 3), dtype=np.float64)
+    base_radius = np.empty(count, dtype=np.float64)
+    top_radius = np.empty(count, dtype=np.float64)
+    depth = np.empty(count, dtype=np.int32)
+    leaf = np.empty(count, dtype=bool)
+    leaf_index = []
+    jitter = []
+
+    parts = [(top_index, np.where(top.parent < 0, -1, top_index[np.maximum(top.parent, 0)]), top)]
+    for offset, subtree_parent, subtree in zip(offsets, parents, subtrees):
+        index = np.arange(offset, offset + len(subtree))
+        parts.append((index, np.where(subtree.parent < 0, top_index[subtree_parent], subtree.parent + offset),
+                      subtree))
+    for index, part_parent, part in parts:
+        parent[index] = part_parent
+        base[index] = part.base
+        tip[index] = part.tip
+        base_radius[index] = part.base_radius
+        top_radius[index] = part.top_radius
+        depth[index] = part.depth
+        leaf[index] = part.leaf
+        leaf_index.append(index[part.leaf])
+        jitter.append(part.foliage_jitter)
+    leaf_index = np.concatenate(leaf_index)
+    jitter = np.concatenate(jitter).reshape(-1, FOLIAGE_DRAWS, 3)[np.argsort(leaf_index, kind='mergesort')]
+    return TreeSkeleton(parent, base, tip, base_radius, top_radius, depth, leaf, jitter, top.origin)
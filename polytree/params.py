@@ -0,0 +1,57 @@
+"""Tree generation parameters, as gathered from the miniTree UI controls."""
+import collections
+import math
+
+TreeParams = collections.namedtuple('TreeParams', [
+    'polycount',  # sides of each segment tube (polyNumberField)
+    'tree_depth',  # branching levels (treeDepthField)
+    'segment_length',  # initial branch length (treeSegmentLength)
+    'length_dec',  # branch length decrease rate (treeLengthDecrease)
+    'radius',  # trunk radius (trunkRadius)
+    'radius_d',  # radius decrease rate (radiusDecrease)
+    'branches',  # max branches per split (treeBranches)
+    'branches_a',  # branch angle (treeBranches_a)
+    'foliage_s',  # foliage solid side length (treeFoliageSze)
+    'foliage_r',  # foliage smooth iterations (treeFoliageRes)
+    'seed',  # random seed (randomSeed)
+    'tree_color',  # trunk rgb (treeColor)
+    'foliage_color',  # foliage rgb (foliageColor)
+    'foliage_n',  # foliage clusters per tip (treeFoliageNumber)
+    'foliage_spread',  # foliage position jitter (treeFoliageSpread)
+    'first_segment_l',  # first segment length factor (treeFirstSegmentLength)
+    'tree_type',  # 1 normal, 2 pine (treeTypeSelect)
+    'branch_chance',  # branchingChance
+    'angle_chance',  # branchAngleChance
+    'turn_chance',  # branchTurnChance
+    'turn_amount',  # branchTurnRAmount
+    'angle_amount',  # branchAngleRAmount
+])
+
+# The defaults of the miniTree UI sliders
+DEFAULT_PARAMS = TreeParams(polycount=4,
+                            tree_depth=3,
+                            segment_length=5.0,
+                            length_dec=0.8,
+                            radius=1.0,
+                            radius_d=0.45,
+                            branches=2,
+                            branches_a=0.5,
+                            foliage_s=1.0,
+                            foliage_r=1,
+                            seed=9981,
+                            tree_color=(0.4, 0.3, 0.3),
+                            foliage_color=(0.30, 0.7, 0.40),
+                            foliage_n=1,
+                            foliage_spread=0.0,
+                            first_segment_l=1.0,
+                            tree_type=1,
+                            branch_chance=0.9,
+                            angle_chance=0.9,
+                            turn_chance=0.9,
+                            turn_amount=math.pi / 2,
+                            angle_amount=math.pi / 6)
+
+
+def make_params(**kwargs):
+    # DEFAULT_PARAMS with the given fields replaced
+    return DEFAULT_PARAMS._replace(**kwargs)
@@ -0,0 +1,39 @@
+"""Grow, mesh and hand a tree to a mesh sink in one go."""
+from polytree import foliage, growth, mesh
+
+TREE_NAME = 'miniTree'
+TRUNK_NAME = 'miniTreeTrunk'
+FOLIAGE_NAME = 'miniTreeFoliage'
+
+
+def build_tree(params, sink, trunk_material=None, foliage_material=None, seeding='legacy', engine='iterative',
+               cache=None, budget=None, instance_foliage=False, cull_foliage=False, cull_distance=0.0,
+               twist='legacy', min_polys=None, twig_radius=0.0):
+    # Grow 'params' and send the trunk and foliage to 'sink' as one mesh each,
+    # or the foliage as instances of one cluster with instance_foliage.
+    # cull_foliage drops clusters hidden by their neighbours or closer than
+    # cull_distance to another one (see foliage.cull_clusters).  twist is the
+    # ring orientation of mesh.tube_mesh, min_polys and twig_radius make its
+    # ring sides follow the branch radius.
+    # With a cache.TreeCache the skeleton and trunk are reused when only the
+    # colours or the foliage changed.  A budget.Budget is applied first.
+    if budget is not None:
+        params = budget.apply(params)
+    if cache is None:
+        skeleton = growth.grow(params, engine=engine, seeding=seeding)
+        trunk = mesh.tube_mesh(skeleton, params.polycount, twist, min_polys, twig_radius)
+    else:
+        skeleton = cache.skeleton(params, seeding, engine)
+        trunk = cache.trunk(params, seeding, engine, twist, min_polys, twig_radius)
+    sink.add_mesh(TRUNK_NAME, trunk, trunk_material)
+    centres = skeleton.foliage_centres(params.foliage_n, params.foliage_spread)
+    if cull_foliage:
+        cluster = foliage.cluster_mesh(params.foliage_s, params.foliage_r)
+        centres = centres[foliage.cull_clusters(centres, foliage.cluster_radius(cluster), cull_distance)]
+    if instance_foliage:
+        sink.add_instances(FOLIAGE_NAME, foliage.cluster_mesh(params.foliage_s, params.foliage_r), centres,
+                           foliage_material)
+    else:
+        sink.add_mesh(FOLIAGE_NAME, foliage.foliage_mesh(centres, params.foliage_s, params.foliage_r),
+                      foliage_material)
+    return sink.commit()
@@ -0,0 +1,95 @@
+"""Foliage as a point cloud of transforms, for instancing in a renderer.
+
+Every foliage cluster becomes one row x, y, z, scale, qx, qy, qz, qw: its
+centre, the uniform scale foliage_s of a unit size leaf asset and a random
+rotation quaternion.  Rows are written either as a compact binary file,
+
+    header  magic 'PTPC', version, floats per row (8), row count N
+    rows    (N, 8) float32, little-endian
+
+or as a plain-text file with one space separated row per line.
+"""
+import os
+import struct
+
+import numpy as np
+
+FORMATS = ('bin', 'txt')
+COLUMNS = ('x', 'y', 'z', 'scale', 'qx', 'qy', 'qz', 'qw')
+
+MAGIC = b'PTPC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+
+
+def random_rotations(rng, count):
+    # (count, 4) quaternions uniformly distributed over all rotations
+    # (Shoemake's method)
+    u = rng.random_sample((count, 3))
+    a = np.sqrt(1.0 - u[:, 0])
+    b = np.sqrt(u[:, 0])
+    return np.column_stack((a * np.sin(2.0 * np.pi * u[:, 1]),
+                            a * np.cos(2.0 * np.pi * u[:, 1]),
+                            b * np.sin(2.0 * np.pi * u[:, 2]),
+                            b * np.cos(2.0 * np.pi * u[:, 2])))
+
+
+class PointWriter(object):
+    # Writes foliage transforms chunk by chunk.  Rotations are drawn from a
+    # RandomState seeded with 'seed', in row order, so chunking does not
+    # change them.
+
+    def __init__(self, path, size, seed, format=None):
+        format = (format or os.path.splitext(path)[1][1:]).lower()
+        if format not in FORMATS:
+            raise ValueError('unknown point format %r, expected one of %s' % (format, ', '.join(FORMATS)))
+        self.path = path
+        self.format = format
+        self.size = size
+        self.count = 0
+        self._rng = np.random.RandomState(seed & 0xFFFFFFFF)
+        if format == 'bin':
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS), 0))
+        else:
+            self._file = open(path, 'w')
+            self._file.write('# %s\n' % ' '.join(COLUMNS))
+
+    def write(self, centres):
+        centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+        rows = np.column_stack((centres, np.full(len(centres), float(self.size)),
+                                random_rotations(self._rng, len(centres))))
+        if self.format == 'bin':
+            self._file.write(rows.astype('<f4').tobytes())
+        else:
+            self._file.write(''.join('%.7g %.7g %.7g %.7g %.7g %.7g %.7g %.7g\n' % tuple(row)
+                                     for row in rows.tolist()))
+        self.count += len(centres)
+
+    def close(self):
+        if self.format == 'bin':
+            # the row count is only known now
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS), self.count))
+        self._file.close()
+
+
+def write_points(path, centres, size, seed, format=None):
+    writer = PointWriter(path, size, seed, format)
+    try:
+        writer.write(centres)
+    finally:
+        writer.close()
+    return writer.count
+
+
+def read_points(path):
+    # (N, 8) rows of a binary or text point file
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) == HEADER.size and header[:4] == MAGIC:
+            magic, version, columns, count = HEADER.unpack(header)
+            if version != VERSION or columns != len(COLUMNS):
+                raise ValueError('%s: not a version %d point file' % (path, VERSION))
+            return np.frombuffer(f.read(count * columns * 4), dtype='<f4').reshape(count, columns)
+    return np.loadtxt(path, ndmin=2).reshape(-1, len(COLUMNS))
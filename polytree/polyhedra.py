@@ -0,0 +1,116 @@
+"""Foliage solids built without Maya: a dodecahedron like polyPlatonicSolid's
+default, a Catmull-Clark subdivision like polySmooth's default and a polySphere
+like uv sphere."""
+import math
+
+import numpy as np
+
+from polytree.mesh import Mesh
+
+
+def dodecahedron(side_length):
+    # Dodecahedron centred on the origin with the given edge length
+    phi = (1.0 + math.sqrt(5.0)) / 2.0
+    points = [(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+    for a in (-1.0 / phi, 1.0 / phi):
+        for b in (-phi, phi):
+            points.extend([(0, a, b), (a, b, 0), (b, 0, a)])
+    points = np.array(points, dtype=np.float64) * (side_length * phi / 2.0)
+
+    # every face is the five points furthest along one of the icosahedron's
+    # vertex directions, ordered counter-clockwise seen from outside
+    normals = []
+    for a in (-phi, phi):
+        for b in (-1.0, 1.0):
+            normals.extend([(0, a, b), (a, b, 0), (b, 0, a)])
+    faces = []
+    for normal in np.array(normals):
+        face = np.argsort(points.dot(normal))[-5:]
+        centre = points[face].mean(axis=0)
+        u = points[face[0]] - centre
+        w = np.cross(normal, u)
+        angles = np.arctan2((points[face] - centre).dot(w), (points[face] - centre).dot(u))
+        faces.append(face[np.argsort(angles)])
+    return Mesh(points, np.full(12, 5, dtype=np.int32), np.concatenate(faces).astype(np.int32))
+
+
+def sphere(radius, axis_divisions, height_divisions):
+    # Sphere centred on the origin like polySphere(r, sa, sh): rings of
+    # axis_divisions points from bottom to top, then the bottom and top poles.
+    # Quads between the rings and triangle fans at the poles.
+    sa = axis_divisions
+    rows = height_divisions - 1
+    polar = math.pi * np.arange(1, height_divisions) / height_divisions
+    azimuth = (math.pi * 2.0 / sa) * np.arange(sa)
+    ring_radius = radius * np.sin(polar)[:, None]
+    points = np.stack((ring_radius * np.cos(azimuth),
+                       np.repeat(-radius * np.cos(polar)[:, None], sa, axis=1),
+                       -ring_radius * np.sin(azimuth)), axis=-1).reshape(-1, 3)
+    points = np.concatenate((points, [(0.0, -radius, 0.0), (0.0, radius, 0.0)]))
+    bottom = rows * sa
+    top = bottom + 1
+
+    i = np.arange(sa)
+    j = (i + 1) % sa
+    row = np.arange(rows - 1)[:, None] * sa
+    quads = np.stack((row + i, row + j, row + sa + j, row + sa + i), axis=-1).reshape(-1)
+    last = (rows - 1) * sa
+    fans = np.concatenate((np.stack((np.full(sa, bottom), j, i), axis=-1).reshape(-1),
+                           np.stack((last + i, last + j, np.full(sa, top)), axis=-1).reshape(-1)))
+    return Mesh(points,
+                np.concatenate((np.full((rows - 1) * sa, 4), np.full(2 * sa, 3))).astype(np.int32),
+                np.concatenate((quads, fans)).astype(np.int32))
+
+
+def smooth(mesh):
+    # One Catmull-Clark subdivision of a closed polygon mesh; every n-gon
+    # becomes n quads
+    points = mesh.points
+    counts = mesh.face_counts
+    connects = mesh.face_connects
+    vertex_count = len(points)
+    face_count = len(counts)
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    corner_face = np.repeat(np.arange(face_count), counts)
+    corner_pos = np.arange(len(connects)) - np.repeat(starts, counts)
+    next_corner = np.repeat(starts, counts) + (corner_pos + 1) % np.repeat(counts, counts)
+    prev_corner = np.repeat(starts, counts) + (corner_pos - 1) % np.repeat(counts, counts)
+
+    face_points = np.zeros((face_count, 3))
+    np.add.at(face_points, corner_face, points[connects])
+    face_points /= counts[:, None]
+
+    # edge i of a face runs from corner i to the next corner
+    v0 = connects
+    v1 = connects[next_corner]
+    keys = np.minimum(v0, v1).astype(np.int64) * vertex_count + np.maximum(v0, v1)
+    edge_keys, corner_edge = np.unique(keys, return_inverse=True)
+    corner_edge = corner_edge.reshape(-1)
+    edge_count = len(edge_keys)
+    edge_v0 = edge_keys // vertex_count
+    edge_v1 = edge_keys % vertex_count
+
+    edge_faces = np.zeros((edge_count, 3))
+    np.add.at(edge_faces, corner_edge, face_points[corner_face])
+    edge_points = (points[edge_v0] + points[edge_v1] + edge_faces) / 4.0
+
+    # vertex points: (F + 2R + (n - 3)P) / n
+    valence = np.bincount(np.concatenate((edge_v0, edge_v1)), minlength=vertex_count).astype(np.float64)
+    face_avg = np.zeros((vertex_count, 3))
+    np.add.at(face_avg, connects, face_points[corner_face])
+    face_avg /= np.bincount(connects, minlength=vertex_count)[:, None]
+    midpoints = (points[edge_v0] + points[edge_v1]) / 2.0
+    edge_avg = np.zeros((vertex_count, 3))
+    np.add.at(edge_avg, edge_v0, midpoints)
+    np.add.at(edge_avg, edge_v1, midpoints)
+    edge_avg /= valence[:, None]
+    vertex_points = (face_avg + 2.0 * edge_avg + (valence - 3.0)[:, None] * points) / valence[:, None]
+
+    # corner i becomes the quad: vertex i, edge i, face, edge i - 1
+    new_points = np.concatenate((vertex_points, edge_points, face_points))
+    quads = np.stack((connects,
+                      vertex_count + corner_edge,
+                      vertex_count + edge_count + corner_face,
+                      vertex_count + corner_edge[prev_corner]), axis=-1)
+    return Mesh(new_points, np.full(len(connects), 4, dtype=np.int32), quads.reshape(-1).astype(np.int32))
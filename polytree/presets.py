@@ -0,0 +1,88 @@
+"""miniTree preset files.
+
+A preset is the window state save_preset() writes: one line per control,
+str([control type, control name, query flag, value]), which load_preset()
+replays into the controls.  read_preset() turns such a file into TreeParams
+without Maya, so that batch tools can grow the trees it describes.
+"""
+import ast
+
+from polytree.params import DEFAULT_PARAMS
+
+# (TreeParams field, control type, control name, query flag) in file order
+CONTROLS = (
+    ('polycount', 'intSliderGrp', 'polyNumberField', 'v'),
+    ('tree_depth', 'intSliderGrp', 'treeDepthField', 'v'),
+    ('segment_length', 'floatSliderGrp', 'treeSegmentLength', 'v'),
+    ('length_dec', 'floatSliderGrp', 'treeLengthDecrease', 'v'),
+    ('radius', 'floatSliderGrp', 'trunkRadius', 'v'),
+    ('radius_d', 'floatSliderGrp', 'radiusDecrease', 'v'),
+    ('branches', 'intSliderGrp', 'treeBranches', 'v'),
+    ('branches_a', 'floatSliderGrp', 'treeBranches_a', 'v'),
+    ('foliage_s', 'floatSliderGrp', 'treeFoliageSze', 'v'),
+    ('foliage_r', 'intSliderGrp', 'treeFoliageRes', 'v'),
+    ('seed', 'intFieldGrp', 'randomSeed', 'v1'),
+    ('tree_color', 'colorSliderGrp', 'treeColor', 'rgbValue'),
+    ('foliage_color', 'colorSliderGrp', 'foliageColor', 'rgbValue'),
+    ('foliage_n', 'intSliderGrp', 'treeFoliageNumber', 'v'),
+    ('foliage_spread', 'floatSliderGrp', 'treeFoliageSpread', 'v'),
+    ('first_segment_l', 'floatSliderGrp', 'treeFirstSegmentLength', 'v'),
+    ('tree_type', 'radioButtonGrp', 'treeTypeSelect', 'select'),
+    ('branch_chance', 'floatSliderGrp', 'branchingChance', 'v'),
+    ('angle_chance', 'floatSliderGrp', 'branchAngleChance', 'v'),
+    ('turn_chance', 'floatSliderGrp', 'branchTurnChance', 'v'),
+    ('turn_amount', 'floatSliderGrp', 'branchTurnRAmount', 'v'),
+    ('angle_amount', 'floatSliderGrp', 'branchAngleRAmount', 'v'),
+)
+
+_FIELDS = dict((name, field) for field, control_type, name, query in CONTROLS)
+
+
+class PresetError(ValueError):
+    pass
+
+
+def write_preset(params, path):
+    # Write 'params' as a preset file load_preset() can read back
+    with open(path, 'w') as f:
+        for field, control_type, name, query in CONTROLS:
+            f.write(str([control_type, name, query, _format(field, control_type, getattr(params, field))]) + '\n')
+
+
+def read_preset(path):
+    # TreeParams of a preset file; fields missing from it keep their defaults
+    values = {}
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                control_type, name, query, value = ast.literal_eval(line.strip())
+                value = _parse(control_type, ast.literal_eval(value))
+            except (ValueError, SyntaxError, TypeError):
+                raise PresetError('%s:%d: not a preset line: %r' % (path, number, line.strip()))
+            if name in _FIELDS:
+                values[_FIELDS[name]] = value
+    return DEFAULT_PARAMS._replace(**values)
+
+
+def _format(field, control_type, value):
+    # the value as save_preset() wrote it from the control's query
+    if control_type == 'colorSliderGrp':
+        return str([float(c) for c in value])
+    if field == 'seed':
+        return str([int(value)])
+    if control_type == 'floatSliderGrp':
+        return repr(float(value))
+    return str(int(value))
+
+
+def _parse(control_type, value):
+    if control_type == 'colorSliderGrp':
+        return tuple(float(c) for c in value)
+    if isinstance(value, (list, tuple)):
+        # intFieldGrp queries return a list of one value
+        value, = value
+    if control_type == 'floatSliderGrp':
+        return float(value)
+    return int(value)
@@ -0,0 +1,181 @@
+"""Batched ring and quad generation for tree segment tubes.
+
+A segment tube is drawn between a base ring and a tip ring of ``polys``
+vertices each.  The rings are built here in one NumPy pass per segment (or per
+batch of segments) instead of one ``point_rotate_3d`` call per vertex.  The
+cos/sin of the ring angles only depend on ``polys`` and are computed once per
+side count by ring_table() and shared by every segment and every front end.
+"""
+import math
+
+import numpy as np
+
+_tables = {}
+_transitions = {}
+
+
+def ring_table(polys):
+    # (cos, sin) of the 'polys' ring angles 2*pi*i/polys, computed on first use
+    # and shared afterwards.  The arrays are read-only since every caller gets
+    # the same ones.
+    polys = int(polys)
+    table = _tables.get(polys)
+    if table is None:
+        angles = (math.pi * 2.0 / polys) * np.arange(polys)
+        cos = np.cos(angles)
+        sin = np.sin(angles)
+        cos.flags.writeable = False
+        sin.flags.writeable = False
+        table = _tables[polys] = (cos, sin)
+    return table
+
+
+def ring_basis(start, end):
+    # Returns the unit vectors (side, up) spanning the plane perpendicular to
+    # start->end.  'side' is the same perpendicular the Maya scripts picked in
+    # get_point_given_dist, 'up' is axis x side, so that
+    # cos(a) * side - sin(a) * up is that point rotated by -a about the axis.
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    axis = end - start
+    ax = axis[..., 0]
+    ay = axis[..., 1]
+    az = axis[..., 2]
+    zero = np.zeros_like(ax)
+    # cross with (1, 0, 0), or with (0, 1, 0) when the axis lies on x
+    use_x = (ay != 0) | (az != 0)
+    side = np.where(use_x[..., None],
+                    np.stack((zero, az, -ay), axis=-1),
+                    np.stack((-az, zero, ax), axis=-1))
+    side /= np.sqrt((side * side).sum(axis=-1))[..., None]
+    normal = axis / np.sqrt((axis * axis).sum(axis=-1))[..., None]
+    up = np.cross(normal, side)
+    return side, up
+
+
+def ring_points(start, center, radius, polys):
+    # Ring of 'polys' points of the given radius around 'center', perpendicular
+    # to start->center.  Accepts single points (3,) or batches (N, 3) and
+    # returns (polys, 3) or (N, polys, 3).
+    side, up = ring_basis(start, center)
+    return ring_around(center, radius, side, up, polys)
+
+
+def ring_around(center, radius, side, up, polys):
+    # Ring of 'polys' points around 'center' in the plane of the unit vectors
+    # side and up, starting at side
+    center = np.asarray(center, dtype=np.float64)
+    cos, sin = ring_table(polys)
+    offsets = (cos[:, None] * side[..., None, :] -
+               sin[:, None] * up[..., None, :])
+    radius = np.asarray(radius, dtype=np.float64)[..., None, None]
+    return center[..., None, :] + radius * offsets
+
+
+def euler_ring(center, radius, angles, pivot, polys):
+    # Ring of the polygonal script: 'polys' points of the given radius around
+    # 'center' in its xz plane, rotated by the euler angles (x, y, z) about
+    # 'pivot' in get_rotations() order (z first, then y, then x).  Accepts
+    # single rings or batches like ring_points().
+    cos, sin = ring_table(polys)
+    center = np.asarray(center, dtype=np.float64)[..., None, :]
+    pivot = np.asarray(pivot, dtype=np.float64)[..., None, :]
+    radius = np.asarray(radius, dtype=np.float64)[..., None]
+    angles = np.asarray(angles, dtype=np.float64)[..., None, :]
+    x = center[..., 0] + radius * cos - pivot[..., 0]
+    y = (center[..., 1] - pivot[..., 1]) + np.zeros_like(x)
+    z = center[..., 2] + radius * sin - pivot[..., 2]
+    ax, ay, az = angles[..., 0], angles[..., 1], angles[..., 2]
+    # z rotation
+    x, y = (x * np.cos(az) - y * np.sin(az),
+            x * np.sin(az) + y * np.cos(az))
+    # y rotation
+    z, x = (z * np.cos(ay) - x * np.sin(ay),
+            z * np.sin(ay) + x * np.cos(ay))
+    # x rotation
+    y, z = (y * np.cos(ax) - z * np.sin(ax),
+            y * np.sin(ax) + z * np.cos(ax))
+    return np.stack((x, y, z), axis=-1) + pivot
+
+
+def axis_ring(start, center, radius, polys):
+    # Ring of the vector calculation script: the point 'radius' along +x from
+    # 'center' rotated about the axis start->center by -2*pi*i/polys, as
+    # point_rotate_3d() does it.  The ring is only perpendicular to the axis
+    # when the axis is.  Accepts single rings or batches.
+    cos, sin = ring_table(polys)
+    start = np.asarray(start, dtype=np.float64)
+    center = np.asarray(center, dtype=np.float64)
+    axis = center - start
+    n = axis / np.sqrt((axis * axis).sum(axis=-1))[..., None]
+    nx, ny, nz = n[..., 0, None], n[..., 1, None], n[..., 2, None]
+    # Rodrigues' rotation of (1, 0, 0): cos * x + sin(-a) * (n x x) + (1 - cos) * nx * n
+    offsets = np.stack((cos + (1 - cos) * nx * nx,
+                        -sin * nz + (1 - cos) * nx * ny,
+                        sin * ny + (1 - cos) * nx * nz), axis=-1)
+    radius = np.asarray(radius, dtype=np.float64)[..., None, None]
+    return center[..., None, :] + radius * offsets
+
+
+def segment_rings(prev, base, tip, base_radius, top_radius, polys):
+    # Base and tip rings of the segment base->tip.  The base ring is
+    # perpendicular to the previous segment (prev->base), as in polytube().
+    base_ring = ring_points(prev, base, base_radius, polys)
+    tip_ring = ring_points(base, tip, top_radius, polys)
+    return base_ring, tip_ring
+
+
+def quad_indices(polys):
+    # (polys, 4) vertex indices of the side quads of one tube, indexing the
+    # base ring as 0..polys-1 and the tip ring as polys..2*polys-1.  Winding
+    # matches the facets polytube() used to create.
+    i = np.arange(polys)
+    j = (i + 1) % polys
+    return np.stack((j, i, i + polys, j + polys), axis=-1)
+
+
+def ring_sides(radius, reference, polys, min_polys=None, twig_radius=0.0):
+    # Side count of rings of the given radii: 'polys' at the reference radius
+    # and down in proportion to the radius, to no less than min_polys.  Rings
+    # thinner than twig_radius get 3 sides.  Without min_polys every ring
+    # gets 'polys'.
+    radius = np.asarray(radius, dtype=np.float64)
+    if min_polys is None:
+        sides = np.full(radius.shape, polys, dtype=np.int64)
+    else:
+        sides = np.ceil(polys * radius / reference).astype(np.int64)
+        sides = np.clip(sides, min(min_polys, polys), polys)
+    sides[radius < twig_radius] = min(3, polys)
+    return sides
+
+
+def transition_indices(base_polys, tip_polys):
+    # (face counts, face connects) of the side of a tube from a base ring of
+    # base_polys points to a tip ring of tip_polys, indexed like
+    # quad_indices().  Equal rings are joined by quad_indices() quads, others
+    # by base_polys + tip_polys triangles zipped around by angle, wound the
+    # same way.  Computed once per pair and shared, do not modify.
+    key = (int(base_polys), int(tip_polys))
+    faces = _transitions.get(key)
+    if faces is None:
+        m, n = key
+        if m == n:
+            connects = quad_indices(m).reshape(-1)
+            counts = np.full(m, 4, dtype=np.int32)
+        else:
+            triangles = []
+            i = j = 0
+            while i < m or j < n:
+                # advance along the ring whose next point comes first
+                if j == n or (i < m and (i + 1) * n <= (j + 1) * m):
+                    triangles.append(((i + 1) % m, i, m + j % n))
+                    i += 1
+                else:
+                    triangles.append((i % m, m + j, m + (j + 1) % n))
+                    j += 1
+            connects = np.array(triangles, dtype=np.int64).reshape(-1)
+            counts = np.full(m + n, 3, dtype=np.int32)
+        counts.flags.writeable = False
+        connects.flags.writeable = False
+        faces = _transitions[key] = (counts, connects)
+    return faces
@@ -0,0 +1,27 @@
+"""Tree shaders in the Maya scene.
+
+Each shader is a lambert with a shading group named after it.  They are made
+the first time a tree needs them and found by name afterwards, so repeated
+trees, reloaded scripts and batch workers all share the same two nodes.
+"""
+TRUNK_SHADER = 'treeTrunkShader'
+FOLIAGE_SHADER = 'foliageShader'
+
+
+def lambert(name, color):
+    # Shading group of the lambert 'name', created if the scene has none,
+    # with its colour set to the (r, g, b) 'color'.  The lambert is connected
+    # to the group whenever it is not already, so groups left by the older
+    # scripts without it (or fed by another shader) get it too.
+    import maya.cmds as cmds
+
+    group = name + 'SG'
+    if not cmds.objExists(name):
+        cmds.shadingNode('lambert', asShader=True, name=name)
+    if not cmds.objExists(group):
+        cmds.sets(renderable=True, noSurfaceShader=True, empty=True, name=group)
+    if name + '.outColor' not in (cmds.listConnections(group + '.surfaceShader', source=True, destination=False,
+                                                       plugs=True) or []):
+        cmds.connectAttr(name + '.outColor', group + '.surfaceShader', force=True)
+    cmds.setAttr(name + '.color', color[0], color[1], color[2], type='double3')
+    return group
@@ -0,0 +1,123 @@
+"""Mesh sinks: where finished tree meshes are sent.
+
+A sink receives whole meshes in the flat points / face counts / face connects
+layout.  MayaSink builds each of them in the scene with one MFnMesh.create
+call; MemorySink just keeps them, for use and testing without Maya.
+
+Repeated meshes such as foliage clusters can be sent once with the
+translations of their copies; sinks without instancing merge the copies into
+one mesh.
+"""
+import collections
+
+import numpy as np
+
+from polytree.foliage import place_clusters
+
+# A mesh sent once with the translations of its copies
+Instances = collections.namedtuple('Instances', 'mesh translations')
+
+
+class MeshSink(object):
+
+    def add_mesh(self, name, mesh, material=None):
+        # Receive one mesh; 'material' is a backend specific shading reference
+        raise NotImplementedError
+
+    def add_instances(self, name, mesh, translations, material=None):
+        # Receive copies of 'mesh' moved by each (3,) row of 'translations'
+        return self.add_mesh(name, place_clusters(mesh, translations), material)
+
+    def commit(self):
+        # Finish the tree and return what the backend produced
+        raise NotImplementedError
+
+
+class MemorySink(MeshSink):
+
+    def __init__(self):
+        self.meshes = collections.OrderedDict()
+        self.instances = collections.OrderedDict()
+        self.parts = collections.OrderedDict()
+        self.materials = {}
+
+    def add_mesh(self, name, mesh, material=None):
+        self.meshes[name] = self.parts[name] = mesh
+        self.materials[name] = material
+
+    def add_instances(self, name, mesh, translations, material=None):
+        translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+        self.instances[name] = self.parts[name] = Instances(mesh, translations)
+        self.materials[name] = material
+
+    def commit(self):
+        # Every part by name in the order sent: a Mesh, or Instances for the
+        # ones sent with add_instances
+        return self.parts
+
+
+class MayaSink(MeshSink):
+    # Materials are shading group names.  With a 'group' name, commit() puts
+    # the tree's nodes under one new transform and returns just that, so the
+    # tree can be found and deleted without searching the scene by name.
+    # Nodes are passed around by full path: earlier trees hold nodes of the
+    # same short names, which would make those ambiguous.
+
+    def __init__(self, group=None):
+        self.group = group
+        self.nodes = []
+
+    def add_mesh(self, name, mesh, material=None):
+        if mesh.face_count == 0:
+            return None
+        node = self._create(name, mesh, material)
+        self.nodes.append(node)
+        return node
+
+    def add_instances(self, name, mesh, translations, material=None):
+        # The mesh is built once, hidden, and drawn at every translation by a
+        # particle instancer: one particle call takes all the positions, so
+        # the scene calls do not grow with the number of copies.  The
+        # particles, prototype and instancer are grouped under 'name'.
+        import maya.cmds as cmds
+
+        translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+        if mesh.face_count == 0 or len(translations) == 0:
+            return None
+        particles, shape = cmds.particle(position=[tuple(t) for t in translations.tolist()], name=name + 'Points')
+        particles = _world_path(particles)
+        prototype = self._create(name + 'Cluster', mesh, material)
+        instancer = _world_path(cmds.particleInstancer(particles + '|' + shape, addObject=True, object=prototype,
+                                                       name=name + 'Instancer'))
+        cmds.hide(particles, prototype)
+        group = _world_path(cmds.group(particles, prototype, instancer, name=name))
+        self.nodes.append(group)
+        return group
+
+    def _create(self, name, mesh, material):
+        import maya.cmds as cmds
+        import maya.api.OpenMaya as om
+
+        points = om.MPointArray([om.MPoint(x, y, z) for x, y, z in mesh.points.tolist()])
+        transform = om.MFnMesh().create(points,
+                                        om.MIntArray(mesh.face_counts.tolist()),
+                                        om.MIntArray(mesh.face_connects.tolist()))
+        dag = om.MFnDagNode(transform)
+        cmds.rename(dag.fullPathName(), name)
+        # the function set follows the node, its path is the renamed one
+        node = dag.fullPathName()
+        cmds.sets(node, e=1, forceElement=material or 'initialShadingGroup')
+        return node
+
+    def commit(self):
+        if self.group is not None and self.nodes:
+            import maya.cmds as cmds
+
+            self.nodes = [_world_path(cmds.group(self.nodes, name=self.group))]
+        return self.nodes
+
+
+def _world_path(name):
+    # Full path of a node just made at the world root, from the name a
+    # command returned for it
+    return name if name.startswith('|') else '|' + name
@@ -0,0 +1,128 @@
+"""Array-backed tree skeleton, the output of the growth stage.
+
+A skeleton is a flat table with one row per tube segment, stored parents
+first.  It holds no scene objects, so trees can be grown, measured and meshed
+without Maya.
+"""
+import numpy as np
+
+from polytree.streams import foliage_draws
+
+# Foliage offsets drawn at each foliage tip, whatever foliage_n is, so that
+# changing the foliage number does not change the rest of the tree
+FOLIAGE_DRAWS = 20
+
+
+class TreeSkeleton(object):
+
+    def __init__(self, parent, base, tip, base_radius, top_radius, depth, leaf, foliage_jitter, origin):
+        self.parent = parent  # (N,) int32, -1 for the root
+        self.base = base  # (N, 3) float64 segment base points
+        self.tip = tip  # (N, 3) float64 segment tip points
+        self.base_radius = base_radius  # (N,) float64
+        self.top_radius = top_radius  # (N,) float64
+        self.depth = depth  # (N,) int32 branching level, 0 for the root
+        self.leaf = leaf  # (N,) bool, foliage grows at the tip
+        # (L, FOLIAGE_DRAWS, 3) uniform [0, 1) draws of the foliage offsets of
+        # the leaf segments, in segment order
+        self.foliage_jitter = foliage_jitter
+        # point below the root base, the root base ring is perpendicular to
+        # origin->base like every other base ring is to its parent segment
+        self.origin = origin
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def leaf_segments(self):
+        return np.flatnonzero(self.leaf)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.parent, self.base, self.tip, self.base_radius, self.top_radius,
+                                      self.depth, self.leaf, self.foliage_jitter, self.origin))
+
+    def prev_points(self):
+        # (N, 3) point below each segment base: the parent's base, or origin
+        prev = self.base[np.maximum(self.parent, 0)]
+        prev[self.parent < 0] = self.origin
+        return prev
+
+    def subset(self, keep):
+        # Skeleton of the segments where 'keep' is set, in the same order.
+        # Their parents must be kept too.  Dropped leaf segments take their
+        # foliage draws with them.
+        keep = np.asarray(keep, dtype=bool)
+        index = np.cumsum(keep) - 1
+        parent = self.parent[keep]
+        parent = np.where(parent >= 0, index[np.maximum(parent, 0)], -1).astype(np.int32)
+        return TreeSkeleton(parent, self.base[keep], self.tip[keep], self.base_radius[keep], self.top_radius[keep],
+                            self.depth[keep], self.leaf[keep], self.foliage_jitter[keep[self.leaf]], self.origin)
+
+    def foliage_centres(self, count, spread):
+        # (L * count, 3) foliage cluster centres, 'count' clusters per leaf
+        # tip jittered by up to 'spread' on each axis
+        jitter = self.foliage_jitter[:, :count, :]
+        offsets = -spread + (spread + spread) * jitter
+        return (self.tip[self.leaf][:, None, :] + offsets).reshape(-1, 3)
+
+
+class SkeletonBuilder(object):
+    # Collects segments from a growth engine and packs them into a TreeSkeleton.
+    # Engines add segments depth first, parents before children, and the
+    # foliage of a segment before any segment outside its branch.
+
+    def __init__(self):
+        self.parent = []
+        self.base = []
+        self.tip = []
+        self.base_radius = []
+        self.top_radius = []
+        self.depth = []
+        self.foliage_index = []
+        self.foliage_jitter = []
+        self.foliage_key_index = []
+        self.foliage_keys = []
+        self.origin = [0.0, 0.0, 0.0]
+
+    def add_segment(self, parent, prev, base, tip, base_radius, top_radius, depth):
+        index = len(self.parent)
+        if parent < 0:
+            self.origin = prev
+        self.parent.append(parent)
+        self.base.append(base)
+        self.tip.append(tip)
+        self.base_radius.append(base_radius)
+        self.top_radius.append(top_radius)
+        self.depth.append(depth)
+        return index
+
+    def add_foliage(self, index, jitter):
+        # jitter: FOLIAGE_DRAWS * 3 draws, x, y, z per cluster
+        self.foliage_index.append(index)
+        self.foliage_jitter.append(jitter)
+
+    def add_foliage_key(self, index, key):
+        # foliage of the branch stream 'key', drawn for all tips by build()
+        self.foliage_key_index.append(index)
+        self.foliage_keys.append(key)
+
+    def build(self):
+        count = len(self.parent)
+        index = self.foliage_index + self.foliage_key_index
+        leaf = np.zeros(count, dtype=bool)
+        leaf[index] = True
+        jitter = np.concatenate([np.array(self.foliage_jitter, dtype=np.float64).reshape(-1, FOLIAGE_DRAWS, 3),
+                                 foliage_draws(self.foliage_keys, FOLIAGE_DRAWS * 3).reshape(-1, FOLIAGE_DRAWS, 3)])
+        # foliage is drawn after a tip's children were grown, sort it back
+        # into segment order
+        jitter = jitter[np.argsort(index, kind='mergesort')]
+        return TreeSkeleton(np.array(self.parent, dtype=np.int32),
+                            np.array(self.base, dtype=np.float64).reshape(-1, 3),
+                            np.array(self.tip, dtype=np.float64).reshape(-1, 3),
+                            np.array(self.base_radius, dtype=np.float64),
+                            np.array(self.top_radius, dtype=np.float64),
+                            np.array(self.depth, dtype=np.int32),
+                            leaf,
+                            jitter,
+                            np.array(self.origin, dtype=np.float64))
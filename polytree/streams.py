@@ -0,0 +1,133 @@
+"""Random streams for the growth engines.
+
+'legacy' seeding is the scripts' single random.Random sequence: every branch
+draws from it in turn, so a branch's shape depends on how many numbers all
+earlier branches drew.
+
+'branch' seeding gives every branch its own counter-based stream.  A branch's
+key is a hash of its parent's key and its slot among the parent's children,
+and the n-th draw of a stream is a hash of (key, n).  A branch therefore grows
+the same whatever order, process or run it is grown in.  Its foliage draws
+come from a substream of their own, which builders take for all foliage tips
+at once with foliage_draws().
+"""
+import random
+
+import numpy as np
+
+SEEDINGS = ('legacy', 'branch')
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+# keeps child keys and draws of the same stream apart
+CHILD_SALT = 0xD1B54A32D192ED03
+
+# child slots: the pine trunk carries on in slot 0, branch i is slot i + 1
+TRUNK_SLOT = 0
+FOLIAGE_SLOT = 0xFFFFFFFF
+
+
+def mix64(z):
+    # splitmix64 finaliser, a bijection of 64-bit integers
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def root_key(seed):
+    return mix64(seed & MASK64)
+
+
+def child_key(key, slot):
+    return mix64(((key ^ CHILD_SALT) + (slot + 1) * GOLDEN) & MASK64)
+
+
+def draw(key, counter):
+    # the counter-th draw of the stream 'key', uniform in [0, 1)
+    return (mix64((key + (counter + 1) * GOLDEN) & MASK64) >> 11) * (1.0 / 9007199254740992.0)
+
+
+def mix64_array(z):
+    # mix64() of a uint64 array, wrapping like the masked integer version
+    with np.errstate(over='ignore'):
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def child_keys(keys, slot):
+    # child_key() of a uint64 array of keys
+    with np.errstate(over='ignore'):
+        return mix64_array((keys ^ np.uint64(CHILD_SALT)) + np.uint64(((slot + 1) * GOLDEN) & MASK64))
+
+
+def draws(keys, counters):
+    # draw() of uint64 keys and integer counters, broadcast against each other
+    with np.errstate(over='ignore'):
+        z = mix64_array(keys + (np.asarray(counters).astype(np.uint64) + np.uint64(1)) * np.uint64(GOLDEN))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+
+def foliage_draws(keys, count):
+    # (L, count) foliage draws of the branches with stream keys 'keys', the
+    # ones BranchStreams.foliage() would give one at a time
+    keys = np.asarray(keys, dtype=np.uint64).reshape(-1)
+    return draws(child_keys(keys, FOLIAGE_SLOT)[:, None], np.arange(count)[None, :])
+
+
+class BranchRandom(object):
+    # The part of the random.Random interface the growth engines use
+
+    def __init__(self, key):
+        self.key = key
+        self.counter = 0
+
+    def random(self):
+        value = draw(self.key, self.counter)
+        self.counter += 1
+        return value
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+
+class LegacyStreams(object):
+    # batched: whether foliage draws may be left to foliage_draws()
+    batched = False
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.root = 0
+
+    def node(self, key):
+        return self.rng
+
+    def foliage(self, key):
+        return self.rng
+
+    def child(self, key, slot):
+        return 0
+
+
+class BranchStreams(object):
+    batched = True
+
+    def __init__(self, seed):
+        self.root = root_key(seed)
+
+    def node(self, key):
+        return BranchRandom(key)
+
+    def foliage(self, key):
+        return BranchRandom(child_key(key, FOLIAGE_SLOT))
+
+    def child(self, key, slot):
+        return child_key(key, slot)
+
+
+def make_streams(seeding, seed):
+    if seeding == 'legacy':
+        return LegacyStreams(seed)
+    if seeding == 'branch':
+        return BranchStreams(seed)
+    raise ValueError('unknown seeding %r, expected one of %s' % (seeding, ', '.join(SEEDINGS)))
@@ -0,0 +1,97 @@
+"""Scalar vector helpers used by the growth engines.
+
+These are the exact routines of the Maya scripts, kept scalar so that grown
+trees match the original ones bit for bit.
+"""
+import math
+
+
+# Arguments: 'axis point 1', 'axis point 2', 'point to be rotated', 'angle of rotation (in radians)' >> 'new point'
+def point_rotate_3d(p1_x, p1_y, p1_z, p2_x, p2_y, p2_z, p0_x, p0_y, p0_z, theta):
+    # Translate so axis is at origin
+    p_x = p0_x - p1_x
+    p_y = p0_y - p1_y
+    p_z = p0_z - p1_z
+
+    # Initialize point q
+    q = [0.0, 0.0, 0.0]
+    N_x = (p2_x - p1_x)
+    N_y = (p2_y - p1_y)
+    N_z = (p2_z - p1_z)
+
+    Nm = math.sqrt(math.pow(N_x, 2) + math.pow(N_y, 2) + math.pow(N_z, 2))
+
+    # Rotation axis unit vector
+    n = [N_x / Nm, N_y / Nm, N_z / Nm]
+
+    # Matrix common factors
+    c = math.cos(theta)
+    t = (1 - math.cos(theta))
+    s = math.sin(theta)
+    X = n[0]
+    Y = n[1]
+    Z = n[2]
+
+    # Matrix 'M'
+    d11 = t * X ** 2 + c
+    d12 = t * X * Y - s * Z
+    d13 = t * X * Z + s * Y
+    d21 = t * X * Y + s * Z
+    d22 = t * Y ** 2 + c
+    d23 = t * Y * Z - s * X
+    d31 = t * X * Z - s * Y
+    d32 = t * Y * Z + s * X
+    d33 = t * Z ** 2 + c
+
+    #            |p.x|
+    # Matrix 'M'*|p.y|
+    #            |p.z|
+    q[0] = d11 * p_x + d12 * p_y + d13 * p_z
+    q[1] = d21 * p_x + d22 * p_y + d23 * p_z
+    q[2] = d31 * p_x + d32 * p_y + d33 * p_z
+
+    # Translate axis and rotated point back to original location
+    return [q[0] + p1_x, q[1] + p1_y, q[2] + p1_z]
+
+
+def get_sp_point(a, b, c):
+    # first convert line to normalized unit vector
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    dz = b[2] - a[2]
+    mag = math.sqrt(dx * dx + dy * dy + dz * dz)
+    dx = dx / mag
+    dy = dy / mag
+    dz = dz / mag
+    # translate the point and get the dot product
+    theta = (dx * (c[0] - a[0])) + (dy * (c[1] - a[1])) + (dz * (c[2] - a[2]))
+    x4 = (dx * theta) + a[0]
+    y4 = (dy * theta) + a[1]
+    z4 = (dz * theta) + a[2]
+    return [x4, y4, z4]
+
+
+def get_rotations(px, py, pz,
+                  pax, pay, paz,
+                  paxx, paxy, paxz):
+    # Point rotated by the euler angles pax, pay, paz about the point paxx,
+    # paxy, paxz, as the polygonal script turns its segments
+    # location - axis of rotation
+    x = px - paxx
+    y = py - paxy
+    z = pz - paxz
+    # z rotation
+    x1 = x * math.cos(paz) - y * math.sin(paz)
+    y1 = x * math.sin(paz) + y * math.cos(paz)
+    z1 = z
+    # y rotation
+    z11 = z1 * math.cos(pay) - x1 * math.sin(pay)
+    x11 = z1 * math.sin(pay) + x1 * math.cos(pay)
+    y11 = y1
+    # x rotation
+    y111 = y11 * math.cos(pax) - z11 * math.sin(pax)
+    z111 = y11 * math.sin(pax) + z11 * math.cos(pax)
+    x111 = x11
+
+    # adding axis of rotation again
+    return [x111 + paxx, y111 + paxy, z111 + paxz]
@@ -0,0 +1,87 @@
+"""Batch export of preset forests and its manifest."""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from polytree import batch
+from polytree.budget import Budget, estimate
+from polytree.params import make_params
+from polytree.presets import read_preset, write_preset
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.preset = os.path.join(self.directory, 'oak.txt')
+        write_preset(make_params(tree_depth=4, branches=3, foliage_n=2), self.preset)
+        self.output = os.path.join(self.directory, 'forest')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_manifest(self, manifest, jobs):
+        with open(os.path.join(self.output, batch.MANIFEST), 'r') as f:
+            self.assertEqual(json.load(f), json.loads(json.dumps(manifest)))
+        trees = manifest['trees']
+        self.assertEqual([(tree['preset'], tree['seed']) for tree in trees], [tuple(job) for job in jobs])
+        built = [tree for tree in trees if 'error' not in tree]
+        self.assertEqual(manifest['trees_built'], len(built))
+        self.assertEqual(manifest['trees_failed'], len(trees) - len(built))
+        for name in ('segments', 'foliage_clusters', 'vertices', 'faces'):
+            self.assertEqual(manifest[name], sum(tree[name] for tree in built))
+        for tree in built:
+            self.assertTrue(os.path.getsize(os.path.join(self.output, tree['path'])) > 0)
+
+    def test_manifest(self):
+        jobs = batch.seed_jobs(self.preset, [3, 1, 2])
+        manifest = batch.run_batch(jobs, self.output, 'ply', processes=1)
+        self.check_manifest(manifest, jobs)
+        self.assertEqual([tree['path'] for tree in manifest['trees']], ['oak_3.ply', 'oak_1.ply', 'oak_2.ply'])
+        self.assertEqual((manifest['format'], manifest['processes'], manifest['trees_failed']), ('ply', 1, 0))
+
+    def test_workers_build_the_same_trees(self):
+        jobs = batch.seed_jobs(self.preset, range(4))
+        one = batch.run_batch(jobs, self.output, processes=1)
+        two = batch.run_batch(jobs, self.output, processes=2)
+        self.check_manifest(two, jobs)
+        for name in ('segments', 'foliage_clusters', 'vertices', 'faces'):
+            self.assertEqual([tree[name] for tree in one['trees']], [tree[name] for tree in two['trees']])
+
+    def test_repeated_jobs_get_their_own_files(self):
+        jobs = batch.seed_jobs(self.preset, [5, 5, 5])
+        manifest = batch.run_batch(jobs, self.output, processes=1)
+        self.assertEqual([tree['path'] for tree in manifest['trees']], ['oak_5.obj', 'oak_5_1.obj', 'oak_5_2.obj'])
+
+    def test_trees_over_budget_are_listed_with_their_error(self):
+        params = read_preset(self.preset)
+        deep = os.path.join(self.directory, 'deep.txt')
+        write_preset(params._replace(tree_depth=8), deep)
+        jobs = [batch.Job(self.preset, 1), batch.Job(deep, 1)]
+        budget = Budget(max_segments=estimate(params).segments)
+        manifest = batch.run_batch(jobs, self.output, processes=1, budget=budget)
+        self.check_manifest(manifest, jobs)
+        self.assertEqual(manifest['trees_failed'], 1)
+        self.assertIn('over budget', manifest['trees'][1]['error'])
+        self.assertFalse(os.path.exists(os.path.join(self.output, manifest['trees'][1]['path'])))
+
+    def test_jobs_file(self):
+        path = os.path.join(self.directory, 'jobs.txt')
+        with open(path, 'w') as f:
+            f.write('# preset seed\n\noak.txt 4\n  oak.txt 9  \n')
+        self.assertEqual(batch.read_jobs(path), [batch.Job(self.preset, 4), batch.Job(self.preset, 9)])
+        with open(path, 'w') as f:
+            f.write('oak.txt\n')
+        self.assertRaises(ValueError, batch.read_jobs, path)
+
+    def test_parse_seeds(self):
+        self.assertEqual(batch.parse_seeds('2:5'), [2, 3, 4])
+        self.assertEqual(batch.parse_seeds('7,1'), [7, 1])
+        self.assertRaises(argparse.ArgumentTypeError, batch.parse_seeds, '1:x')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Expected tree sizes and the budget applied with them."""
+import unittest
+
+import numpy as np
+
+from polytree import budget, foliage, growth, pipeline
+from polytree.budget import Budget, BudgetExceeded
+from polytree.params import make_params
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.sinks import MemorySink
+
+
+class EstimateTest(unittest.TestCase):
+
+    def test_exact_when_every_branch_grows(self):
+        for tree_type, depth in ((growth.NORMAL, 5), (growth.PINE, 8)):
+            params = make_params(tree_type=tree_type, tree_depth=depth, branches=3, branch_chance=1.0, foliage_n=2,
+                                 foliage_r=1)
+            built = pipeline.build_tree(params, MemorySink())
+            cost = budget.estimate(params)
+            self.assertEqual(cost.segments, len(growth.grow(params)))
+            self.assertEqual(cost.foliage_clusters, len(growth.grow(params).foliage_centres(2, 0.0)))
+            self.assertEqual(cost.vertices, built[TRUNK_NAME].vertex_count + built[FOLIAGE_NAME].vertex_count)
+            self.assertEqual(cost.faces, built[TRUNK_NAME].face_count + built[FOLIAGE_NAME].face_count)
+
+    def test_sampled_means(self):
+        # 300 seeds put the sampled means within a few percent of the
+        # expected values
+        for tree_type, depth in ((growth.NORMAL, 5), (growth.PINE, 8)):
+            params = make_params(tree_type=tree_type, tree_depth=depth, branches=3, branch_chance=0.7, foliage_n=2)
+            cost = budget.estimate(params)
+            skeletons = [growth.grow(params._replace(seed=seed)) for seed in range(300)]
+            segments = np.mean([len(skeleton) for skeleton in skeletons])
+            clusters = np.mean([skeleton.leaf.sum() * params.foliage_n for skeleton in skeletons])
+            self.assertLess(abs(segments - cost.segments), 0.05 * cost.segments)
+            self.assertLess(abs(clusters - cost.foliage_clusters), 0.05 * cost.foliage_clusters)
+
+    def test_cluster_size(self):
+        for resolution in range(4):
+            cluster = foliage.cluster_mesh(1.0, resolution)
+            self.assertEqual(budget.cluster_size(resolution), (cluster.vertex_count, cluster.face_count))
+
+
+class BudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.params = make_params(tree_depth=7, branches=3, branch_chance=1.0, foliage_n=3, foliage_r=2)
+        self.cost = budget.estimate(self.params)
+
+    def test_within_budget_is_unchanged(self):
+        for mode in budget.MODES:
+            self.assertIs(Budget(self.cost.segments, self.cost.faces, mode).apply(self.params), self.params)
+        self.assertIs(Budget().apply(self.params), self.params)
+
+    def test_refuse(self):
+        refuse = Budget(max_faces=self.cost.faces - 1)
+        self.assertRaises(BudgetExceeded, refuse.apply, self.params)
+        self.assertRaises(BudgetExceeded, Budget(max_segments=10).apply, self.params)
+        self.assertRaises(ValueError, Budget, mode='shrink')
+
+    def test_reduce_lowers_foliage_first(self):
+        reduced = Budget(max_faces=self.cost.faces // 2, mode='reduce').apply(self.params)
+        self.assertEqual(reduced, self.params._replace(foliage_r=reduced.foliage_r))
+        self.assertLess(reduced.foliage_r, self.params.foliage_r)
+        self.assertLessEqual(budget.estimate(reduced).faces, self.cost.faces // 2)
+
+    def test_reduce_to_fit(self):
+        for max_segments, max_faces in ((None, 2000), (100, None), (50, 500)):
+            reduced = Budget(max_segments, max_faces, 'reduce').apply(self.params)
+            cost = budget.estimate(reduced)
+            self.assertFalse(Budget(max_segments, max_faces).exceeded(cost))
+            built = pipeline.build_tree(reduced, MemorySink())
+            self.assertEqual(built[TRUNK_NAME].face_count + built[FOLIAGE_NAME].face_count, cost.faces)
+        self.assertRaises(BudgetExceeded, Budget(max_segments=0, mode='reduce').apply, self.params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""In-memory LRU cache and the tree cache built on it."""
+import unittest
+
+import numpy as np
+
+from polytree import cache, mesh, pipeline
+from polytree.cache import LRUCache, TreeCache
+from polytree.params import make_params
+from polytree.sinks import MemorySink
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_goes_first(self):
+        entries = LRUCache(max_entries=3, max_bytes=100)
+        for key in 'abc':
+            entries.put(key, key.upper(), 1)
+        self.assertEqual(entries.get('a'), 'A')
+        entries.put('d', 'D', 1)
+        self.assertEqual(sorted(entries._items), ['a', 'c', 'd'])
+        self.assertNotIn('b', entries)
+        self.assertEqual((entries.hits, entries.misses), (1, 0))
+        self.assertIsNone(entries.get('b'))
+        self.assertEqual(entries.misses, 1)
+
+    def test_byte_limit(self):
+        entries = LRUCache(max_entries=10, max_bytes=10)
+        entries.put('a', 1, 4)
+        entries.put('b', 2, 4)
+        entries.put('c', 3, 4)
+        self.assertEqual(list(entries._items), ['b', 'c'])
+        self.assertEqual(entries.nbytes, 8)
+        # a value larger than the whole cache is not kept, nor evicts anything
+        entries.put('d', 4, 11)
+        self.assertEqual(list(entries._items), ['b', 'c'])
+        entries.put('b', 5, 2)
+        self.assertEqual((entries.get('b'), entries.nbytes), (5, 6))
+        entries.clear()
+        self.assertEqual((len(entries), entries.nbytes), (0, 0))
+
+
+class TreeCacheTest(unittest.TestCase):
+
+    def test_colour_and_foliage_edits_reuse_the_trunk(self):
+        trees = TreeCache()
+        params = make_params(tree_depth=4, foliage_n=2)
+        trunk = trees.trunk(params)
+        skeleton = trees.skeleton(params)
+        for edit in ({'tree_color': (0.1, 0.2, 0.3)}, {'foliage_n': 5, 'foliage_spread': 1.0, 'foliage_s': 2.0}):
+            edited = params._replace(**edit)
+            self.assertIs(trees.trunk(edited), trunk)
+            self.assertIs(trees.skeleton(edited), skeleton)
+        self.assertIsNot(trees.trunk(params._replace(polycount=params.polycount + 1)), trunk)
+        self.assertIs(trees.skeleton(params._replace(polycount=params.polycount + 1)), skeleton)
+        self.assertIsNot(trees.skeleton(params._replace(seed=params.seed + 1)), skeleton)
+        expected = mesh.tube_mesh(skeleton, params.polycount)
+        np.testing.assert_array_equal(trunk.points, expected.points)
+        np.testing.assert_array_equal(trunk.face_connects, expected.face_connects)
+
+    def test_integer_and_float_values_share_a_key(self):
+        params = make_params(tree_depth=4)
+        self.assertEqual(cache.growth_key(params), cache.growth_key(params._replace(tree_depth=4.0)))
+        self.assertNotEqual(cache.growth_key(params), cache.growth_key(params, 'branch'))
+
+    def test_cached_pipeline_builds_the_same_tree(self):
+        trees = TreeCache(max_entries=2)
+        for seed in (1, 2, 3, 1):
+            params = make_params(tree_depth=4, foliage_n=2, foliage_spread=0.5, seed=seed)
+            cached = pipeline.build_tree(params, MemorySink(), cache=trees)
+            built = pipeline.build_tree(params, MemorySink())
+            for name in built:
+                np.testing.assert_array_equal(cached[name].points, built[name].points)
+                np.testing.assert_array_equal(cached[name].face_connects, built[name].face_connects)
+        self.assertLessEqual(len(trees.entries), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Skeleton files and the disk cache directory."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from polytree import diskcache, growth
+from polytree.cache import TreeCache, growth_key
+from polytree.diskcache import DiskCache, load_skeleton, save_skeleton
+from polytree.params import make_params
+
+FIELDS = ('parent', 'base', 'tip', 'base_radius', 'top_radius', 'depth', 'leaf', 'foliage_jitter', 'origin')
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_same(self, loaded, skeleton):
+        # a reloaded tree is the grown one rounded to float32
+        for name in FIELDS:
+            expected = getattr(skeleton, name)
+            if expected.dtype.kind == 'f' and name != 'origin':
+                expected = expected.astype(np.float32)
+            np.testing.assert_array_equal(getattr(loaded, name), expected, name)
+
+    def test_round_trip(self):
+        for tree_type in (growth.NORMAL, growth.PINE):
+            skeleton = growth.grow(make_params(tree_type=tree_type, tree_depth=6, branches=3, foliage_n=2))
+            path = os.path.join(self.directory, 'tree%d.ptsk' % tree_type)
+            save_skeleton(skeleton, path)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(4), diskcache.MAGIC)
+            self.check_same(load_skeleton(path), skeleton)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['tree1.ptsk', 'tree2.ptsk'])
+
+    def test_reload_is_a_copy_on_write_map(self):
+        skeleton = growth.grow(make_params(tree_depth=4))
+        path = os.path.join(self.directory, 'tree.ptsk')
+        save_skeleton(skeleton, path)
+        loaded = load_skeleton(path)
+        self.assertIsInstance(loaded.base, np.memmap)
+        loaded.base[0] = 99.0
+        del loaded
+        self.check_same(load_skeleton(path), skeleton)
+
+    def test_broken_files_are_misses(self):
+        cache = DiskCache(self.directory)
+        skeleton = growth.grow(make_params(tree_depth=4))
+        cache.put('tree', skeleton)
+        with open(cache.path('tree'), 'rb') as f:
+            data = f.read()
+        for broken in (data[:-1], b'XXXX' + data[4:], data[:10]):
+            with open(cache.path('tree'), 'wb') as f:
+                f.write(broken)
+            self.assertRaises(ValueError, load_skeleton, cache.path('tree'))
+            self.assertIsNone(cache.get('tree'))
+        self.assertIsNone(cache.get('missing'))
+
+    def test_least_recently_used_files_go_first(self):
+        cache = DiskCache(self.directory, max_entries=3)
+        skeleton = growth.grow(make_params(tree_depth=3))
+        for i, key in enumerate('abc'):
+            cache.put(key, skeleton)
+            os.utime(cache.path(key), (1000 + i, 1000 + i))
+        # a hit renews the file
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', skeleton)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['a.ptsk', 'c.ptsk', 'd.ptsk'])
+        size = os.path.getsize(cache.path('a'))
+        cache.max_bytes = 2 * size
+        os.utime(cache.path('a'), (3000, 3000))
+        os.utime(cache.path('c'), (1000, 1000))
+        os.utime(cache.path('d'), (2000, 2000))
+        cache.evict()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['a.ptsk', 'd.ptsk'])
+
+    def test_tree_cache_reads_skeletons_from_disk(self):
+        params = make_params(tree_depth=5, branches=3, foliage_n=2)
+        grown = TreeCache(disk=DiskCache(self.directory)).skeleton(params)
+        self.assertEqual(os.listdir(self.directory), [growth_key(params) + diskcache.EXTENSION])
+        loaded = TreeCache(disk=DiskCache(self.directory)).skeleton(params)
+        self.assertIsInstance(loaded.base, np.memmap)
+        self.check_same(loaded, grown)
+
+    def test_environment_cache(self):
+        saved = os.environ.pop('POLYTREE_CACHE', None)
+        try:
+            self.assertIsNone(diskcache.environment_cache())
+            os.environ['POLYTREE_CACHE'] = self.directory
+            self.assertEqual(diskcache.environment_cache().directory, self.directory)
+        finally:
+            os.environ.pop('POLYTREE_CACHE', None)
+            if saved is not None:
+                os.environ['POLYTREE_CACHE'] = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
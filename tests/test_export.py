@@ -0,0 +1,249 @@
+"""Streaming exporter output checked against the in-memory pipeline, and the
+files it writes read back."""
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from polytree import growth, mesh, pipeline
+from polytree.export import MeshSpool, StreamingMesher, export_tree
+from polytree.params import make_params
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.sinks import MemorySink
+
+RUNS = (('iterative', 'legacy'), ('recursive', 'legacy'), ('iterative', 'branch'), ('recursive', 'branch'),
+        ('level', 'branch'))
+
+
+def faces(points, face_counts, face_connects):
+    # Every face as the tuple of its rounded corner points, sorted: meshes
+    # with the same faces compare equal whatever their point order
+    points = np.round(np.asarray(points, dtype=np.float32).astype(np.float64), 4)
+    starts = np.concatenate(([0], np.cumsum(face_counts)[:-1])).astype(np.int64)
+    return sorted(tuple(points[face_connects[start:start + count]].ravel().tolist())
+                  for start, count in zip(starts.tolist(), np.asarray(face_counts).tolist()))
+
+
+def stream(params, engine, seeding, chunk_size=7, **options):
+    # (trunk, foliage) as (points, face counts, face connects) of the
+    # exporter's spools, and the counts it returns
+    spools = [MeshSpool(TRUNK_NAME, params.tree_color), MeshSpool(FOLIAGE_NAME, params.foliage_color)]
+    try:
+        counts = growth.grow(params, builder=StreamingMesher(params, spools[0], spools[1], chunk_size, **options),
+                             engine=engine, seeding=seeding)
+        parts = []
+        for spool in spools:
+            points = list(spool.points())
+            faces = list(spool.faces())
+            parts.append((np.concatenate(points) if points else np.zeros((0, 3), dtype=np.float32),
+                          np.concatenate([c for c, f in faces]) if faces else np.zeros(0, dtype=np.int32),
+                          np.concatenate([f for c, f in faces]) if faces else np.zeros(0, dtype=np.int32)))
+        return parts, counts
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+class StreamingMesherTest(unittest.TestCase):
+
+    def check_matches_pipeline(self, params, **options):
+        for engine, seeding in RUNS:
+            parts, counts = stream(params, engine, seeding, **options)
+            built = pipeline.build_tree(params, MemorySink(), seeding=seeding, engine=engine, **options)
+            message = '%s engine, %s seeding' % (engine, seeding)
+            for part, name in zip(parts, (TRUNK_NAME, FOLIAGE_NAME)):
+                expected = built[name]
+                self.assertEqual(len(part[0]), expected.vertex_count, message)
+                self.assertEqual(faces(*part), faces(expected.points, expected.face_counts, expected.face_connects),
+                                 message)
+            self.assertEqual(counts['faces'], built[TRUNK_NAME].face_count + built[FOLIAGE_NAME].face_count)
+
+    def test_matches_pipeline(self):
+        self.check_matches_pipeline(make_params(tree_depth=5, branches=3, foliage_n=3, foliage_spread=0.5))
+
+    def test_pine_matches_pipeline(self):
+        self.check_matches_pipeline(make_params(tree_type=growth.PINE, tree_depth=8, branches=3, foliage_n=2,
+                                                foliage_spread=0.5))
+
+    def test_adaptive_rings_match_pipeline(self):
+        self.check_matches_pipeline(make_params(tree_depth=5, branches=3, polycount=12), min_polys=4,
+                                    twig_radius=0.05)
+
+    def test_no_foliage(self):
+        params = make_params(tree_depth=4, foliage_n=0)
+        for engine, seeding in RUNS:
+            parts, counts = stream(params, engine, seeding)
+            self.assertEqual(counts['foliage_clusters'], 0)
+            self.assertEqual(len(parts[1][0]), 0)
+            self.assertEqual(counts['segments'], len(growth.grow(params, engine=engine, seeding=seeding)))
+
+
+def read_obj(path):
+    # {object name: (points, face counts, face connects local to the object)}
+    objects = {}
+    points = []
+    offset = 0
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0] == '#':
+                continue
+            if fields[0] == 'o':
+                offset += len(points)
+                points, counts, connects = [], [], []
+                objects[fields[1]] = (points, counts, connects)
+            elif fields[0] == 'v':
+                points.append([float(v) for v in fields[1:]])
+            elif fields[0] == 'f':
+                counts.append(len(fields) - 1)
+                connects.extend(int(v) - 1 - offset for v in fields[1:])
+    return dict((name, (np.array(points).reshape(-1, 3), np.array(counts), np.array(connects)))
+                for name, (points, counts, connects) in objects.items())
+
+
+def read_ply(path):
+    # (header lines, vertex records, face index lists) of a binary PLY
+    with open(path, 'rb') as f:
+        data = f.read()
+    end = data.index(b'end_header\n') + len(b'end_header\n')
+    header = data[:end].decode('ascii').splitlines()
+    counts = dict((line.split()[1], int(line.split()[2])) for line in header if line.startswith('element'))
+    vertex = np.dtype([('p', '<f4', (3,)), ('c', 'u1', (3,))])
+    vertices = np.frombuffer(data, dtype=vertex, count=counts['vertex'], offset=end)
+    position = end + vertices.nbytes
+    faces = []
+    for i in range(counts['face']):
+        count = struct.unpack_from('<B', data, position)[0]
+        faces.append(list(struct.unpack_from('<%di' % count, data, position + 1)))
+        position += 1 + 4 * count
+    return header, vertices, faces, len(data) - position
+
+
+class GlbChecks(object):
+    # Mixin reading a .glb file back and checking it is valid glTF 2.0
+
+    def read_glb(self, path):
+        # (glTF json, {mesh name: [(points, triangles) of every primitive]})
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, length = struct.unpack_from('<4sII', data, 0)
+        self.assertEqual((magic, version, length), (b'glTF', 2, len(data)))
+        json_length, json_type = struct.unpack_from('<II', data, 12)
+        self.assertEqual(json_type, 0x4E4F534A)
+        self.assertEqual(json_length % 4, 0)
+        gltf = json.loads(data[20:20 + json_length].decode('utf-8'))
+        bin_length, bin_type = struct.unpack_from('<II', data, 20 + json_length)
+        self.assertEqual(bin_type, 0x004E4942)
+        binary = data[28 + json_length:]
+        self.assertEqual(len(binary), bin_length)
+        self.assertEqual(gltf['asset']['version'], '2.0')
+        self.assertEqual(gltf['buffers'], [{'byteLength': bin_length}])
+
+        def accessor(index, dtype, width):
+            accessor = gltf['accessors'][index]
+            view = gltf['bufferViews'][accessor['bufferView']]
+            self.assertLessEqual(view['byteOffset'] + view['byteLength'], bin_length)
+            self.assertEqual(view['byteOffset'] % 4, 0)
+            self.assertEqual(accessor['count'] * width * 4, view['byteLength'])
+            values = np.frombuffer(binary, dtype=dtype, count=accessor['count'] * width, offset=view['byteOffset'])
+            return accessor, values.reshape(-1, width)
+
+        meshes = {}
+        for node in gltf['nodes']:
+            self.assertLess(node['mesh'], len(gltf['meshes']))
+        self.assertEqual(gltf['scenes'][gltf['scene']]['nodes'], list(range(len(gltf['nodes']))))
+        for gltf_mesh in gltf['meshes']:
+            primitives = []
+            for primitive in gltf_mesh['primitives']:
+                self.assertEqual(primitive['mode'], 4)
+                self.assertLess(primitive['material'], len(gltf['materials']))
+                positions, points = accessor(primitive['attributes']['POSITION'], '<f4', 3)
+                self.assertEqual((positions['componentType'], positions['type']), (5126, 'VEC3'))
+                np.testing.assert_array_equal(points.min(0), np.array(positions['min'], dtype=np.float32))
+                np.testing.assert_array_equal(points.max(0), np.array(positions['max'], dtype=np.float32))
+                indices, triangles = accessor(primitive['indices'], '<u4', 1)
+                self.assertEqual((indices['componentType'], indices['type']), (5125, 'SCALAR'))
+                self.assertEqual(len(triangles) % 3, 0)
+                self.assertLess(triangles.max(), len(points))
+                primitives.append((points, triangles.reshape(-1, 3)))
+            meshes[gltf_mesh['name']] = primitives
+        return gltf, meshes
+
+
+class ExportFormatsTest(GlbChecks, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # dodecahedron clusters: pentagons next to the trunk's quads
+        self.params = make_params(tree_depth=4, branches=3, foliage_n=2, foliage_spread=0.5, foliage_r=0)
+        self.parts = stream(self.params, 'iterative', 'legacy')[0]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, format, **options):
+        path = os.path.join(self.directory, 'tree.' + format)
+        counts = export_tree(self.params, path, chunk_size=7, **options)
+        return path, counts
+
+    def test_obj(self):
+        path, counts = self.export('obj')
+        objects = read_obj(path)
+        self.assertEqual(sorted(objects), sorted((TRUNK_NAME, FOLIAGE_NAME)))
+        for name, (points, face_counts, face_connects) in zip((TRUNK_NAME, FOLIAGE_NAME), self.parts):
+            np.testing.assert_allclose(objects[name][0], points, atol=1e-5)
+            np.testing.assert_array_equal(objects[name][1], face_counts)
+            np.testing.assert_array_equal(objects[name][2], face_connects)
+        self.assertEqual(sum(len(o[1]) for o in objects.values()), counts['faces'])
+
+    def test_ply(self):
+        path, counts = self.export('ply')
+        header, vertices, faces, left = read_ply(path)
+        self.assertEqual(header[:2], ['ply', 'format binary_little_endian 1.0'])
+        self.assertEqual(left, 0)
+        points = np.concatenate([part[0] for part in self.parts])
+        np.testing.assert_array_equal(vertices['p'], points)
+        trunk = len(self.parts[0][0])
+        for colors, color in ((vertices['c'][:trunk], self.params.tree_color),
+                              (vertices['c'][trunk:], self.params.foliage_color)):
+            np.testing.assert_array_equal(np.unique(colors, axis=0), [np.round(np.array(color) * 255)])
+        # faces of one size are written together, so compare them as sets
+        expected = []
+        offset = 0
+        for part_points, face_counts, face_connects in self.parts:
+            starts = np.concatenate(([0], np.cumsum(face_counts)[:-1]))
+            expected.extend(tuple((face_connects[start:start + count] + offset).tolist())
+                            for start, count in zip(starts, face_counts))
+            offset += len(part_points)
+        self.assertEqual(sorted(map(tuple, faces)), sorted(expected))
+        self.assertEqual(len(faces), counts['faces'])
+
+    def test_glb(self):
+        path, counts = self.export('glb')
+        gltf, meshes = self.read_glb(path)
+        self.assertEqual(sorted(meshes), sorted((TRUNK_NAME, FOLIAGE_NAME)))
+        self.assertEqual(len(gltf['materials']), 2)
+        for name, (points, face_counts, face_connects) in zip((TRUNK_NAME, FOLIAGE_NAME), self.parts):
+            (glb_points, triangles), = meshes[name]
+            np.testing.assert_array_equal(glb_points, points)
+            np.testing.assert_array_equal(triangles, mesh.triangulate(face_counts, face_connects))
+
+    def test_glb_without_foliage(self):
+        self.params = self.params._replace(foliage_n=0)
+        gltf, meshes = self.read_glb(self.export('glb')[0])
+        self.assertEqual(list(meshes), [TRUNK_NAME])
+        self.assertEqual(len(gltf['nodes']), 1)
+
+    def test_foliage_points_leave_the_trunk(self):
+        points = os.path.join(self.directory, 'foliage.txt')
+        objects = read_obj(self.export('obj', foliage_points=points)[0])
+        self.assertEqual(list(objects), [TRUNK_NAME])
+        self.assertTrue(os.path.exists(points))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Foliage cluster culling: duplicates, minimum distance and occlusion."""
+import itertools
+import unittest
+
+import numpy as np
+
+from polytree import foliage, growth
+from polytree.params import make_params
+
+
+def greedy(centres, min_distance):
+    # The minimum distance pass one cluster at a time, in index order
+    kept = []
+    for i, centre in enumerate(centres):
+        if all(((centre - centres[j]) ** 2).sum() >= min_distance * min_distance for j in kept):
+            kept.append(i)
+    return kept
+
+
+class CullClustersTest(unittest.TestCase):
+
+    def test_coincident_clusters_keep_one(self):
+        # without foliage_spread every cluster of a tip sits on the tip
+        params = make_params(tree_depth=4, foliage_n=3, foliage_spread=0.0)
+        centres = growth.grow(params).foliage_centres(params.foliage_n, params.foliage_spread)
+        with np.errstate(all='raise'):
+            kept = foliage.cull_clusters(centres, 0.5, 0.0)
+        unique = set(map(tuple, centres.tolist()))
+        self.assertEqual(len(kept), len(unique))
+        self.assertEqual(set(map(tuple, centres[kept].tolist())), unique)
+        np.testing.assert_array_equal(kept, np.arange(0, len(centres), 3))
+
+    def test_min_distance_matches_greedy_pass(self):
+        rng = np.random.RandomState(3)
+        for count, spread in ((50, 1.0), (400, 4.0), (400, 12.0)):
+            centres = rng.uniform(-spread, spread, (count, 3))
+            np.testing.assert_array_equal(foliage.cull_clusters(centres, 0.0, 1.0), greedy(centres, 1.0))
+
+    def test_min_distance_along_a_chain(self):
+        # each cluster close only to its neighbours: every other one is kept
+        centres = np.zeros((9, 3))
+        centres[:, 0] = np.arange(9) * 0.6
+        np.testing.assert_array_equal(foliage.cull_clusters(centres, 0.0, 1.0), [0, 2, 4, 6, 8])
+
+    def test_enclosed_cluster_is_dropped(self):
+        # a 3x3x3 block of clusters overlapping their neighbours: only the
+        # middle one is covered on all six sides
+        centres = np.array(list(itertools.product((-1.0, 0.0, 1.0), repeat=3)))
+        kept = foliage.cull_clusters(centres, 1.0)
+        self.assertEqual(len(kept), 26)
+        self.assertNotIn(13, kept)
+
+    def test_open_side_keeps_a_cluster(self):
+        # neighbours on five sides leave the cluster visible
+        centres = np.array([[0.0, 0.0, 0.0], [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1]])
+        np.testing.assert_array_equal(foliage.cull_clusters(centres, 1.0), np.arange(6))
+        far = np.vstack((centres, [[0.0, 0.0, -2.0]]))
+        np.testing.assert_array_equal(foliage.cull_clusters(far, 1.0), np.arange(7))
+        np.testing.assert_array_equal(foliage.cull_clusters(np.vstack((centres, [[0.0, 0.0, -1.0]])), 1.0),
+                                      [1, 2, 3, 4, 5, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
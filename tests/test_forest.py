@@ -0,0 +1,97 @@
+"""Forest layouts: variant dedup, scattering and the instanced .glb."""
+import json
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from polytree import forest, mesh
+from polytree.params import make_params
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from tests.test_export import GlbChecks
+
+
+class ForestTest(GlbChecks, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.params = make_params(tree_depth=4, branches=3, foliage_n=2, foliage_spread=0.5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_repeated_trees_are_grown_once(self):
+        a, b = self.params._replace(seed=1), self.params._replace(seed=2)
+        blue = b._replace(tree_color=(0, 0, 1))
+        variants, index = forest.unique_variants([a, b, a, a._replace(tree_depth=4.0), blue])
+        self.assertEqual(variants, [a, b, blue])
+        np.testing.assert_array_equal(index, [0, 1, 0, 0, 2])
+        self.assertEqual(len(forest.unique_variants([a, a], 'legacy')[0]), 1)
+
+    def test_scatter(self):
+        a, b = self.params._replace(seed=1), self.params._replace(seed=2)
+        layout = forest.scatter([a, a, a, b], 20000, 100.0, 40.0, seed=3)
+        self.assertEqual(len(layout), 20000)
+        self.assertEqual(layout.variants, [a, b])
+        # repeated inputs keep their weight
+        self.assertAlmostEqual(np.mean(layout.variant == 0), 0.75, delta=0.02)
+        self.assertTrue((np.abs(layout.translations[:, 0]) <= 50.0).all())
+        self.assertTrue((np.abs(layout.translations[:, 2]) <= 20.0).all())
+        np.testing.assert_array_equal(layout.translations[:, 1], 0.0)
+        self.assertTrue(((layout.scale >= 0.8) & (layout.scale <= 1.2)).all())
+        np.testing.assert_allclose((layout.rotations() ** 2).sum(1), 1.0)
+        again = forest.scatter([a, a, a, b], 20000, 100.0, 40.0, seed=3)
+        np.testing.assert_array_equal(again.translations, layout.translations)
+        self.assertRaises(ValueError, forest.scatter, [], 10, 1.0)
+
+    def test_glb_holds_each_variant_once(self):
+        layout = forest.scatter([self.params._replace(seed=seed) for seed in (1, 2, 1, 2, 3)], 50, 30.0, seed=4)
+        path = os.path.join(self.directory, 'forest.glb')
+        counts = forest.write_glb(layout, path)
+        gltf, meshes = self.read_glb(path)
+        variants = forest.variant_meshes(layout)
+        self.assertEqual(len(gltf['meshes']), 3)
+        self.assertEqual(len(gltf['materials']), 2)
+        self.assertEqual(counts['vertices'], sum(t.vertex_count + l.vertex_count for t, l in variants))
+        for i, (trunk, leaves) in enumerate(variants):
+            primitives = meshes['variant%d' % (i + 1)]
+            self.assertEqual([gltf['materials'][p['material']]['name'] for p in gltf['meshes'][i]['primitives']],
+                             [TRUNK_NAME, FOLIAGE_NAME])
+            for (points, triangles), part in zip(primitives, (trunk, leaves)):
+                np.testing.assert_allclose(points, part.points, rtol=1e-6, atol=1e-6)
+                np.testing.assert_array_equal(triangles, mesh.triangulate(part.face_counts, part.face_connects))
+        self.assertEqual(counts['instances'], len(gltf['nodes']))
+        self.assertEqual(len(gltf['nodes']), 50)
+        for node, variant, translation, yaw, scale in zip(gltf['nodes'], layout.variant, layout.translations,
+                                                          layout.yaw, layout.scale):
+            self.assertEqual(node['mesh'], variant)
+            np.testing.assert_allclose(node['translation'], translation)
+            np.testing.assert_allclose(node['rotation'], [0.0, math.sin(yaw / 2), 0.0, math.cos(yaw / 2)])
+            np.testing.assert_allclose(node['scale'], [scale] * 3)
+
+    def test_empty_variants_have_no_nodes(self):
+        layout = forest.scatter([self.params._replace(tree_depth=0), self.params], 30, 10.0, seed=1)
+        path = os.path.join(self.directory, 'forest.glb')
+        counts = forest.write_glb(layout, path)
+        gltf, meshes = self.read_glb(path)
+        self.assertEqual(list(meshes), ['variant2'])
+        self.assertEqual(counts['instances'], int((layout.variant == 1).sum()))
+        self.assertEqual(len(gltf['nodes']), counts['instances'])
+        self.assertTrue(all(node['mesh'] == 0 for node in gltf['nodes']))
+
+    def test_layout(self):
+        layout = forest.scatter([self.params._replace(seed=seed) for seed in (1, 2)], 10, 30.0)
+        path = os.path.join(self.directory, 'forest.json')
+        forest.write_layout(layout, path)
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.assertEqual([variant['params']['seed'] for variant in data['variants']], [1, 2])
+        self.assertEqual([instance['variant'] for instance in data['instances']], layout.variant.tolist())
+        np.testing.assert_allclose([instance['translation'] for instance in data['instances']], layout.translations)
+
+
+if __name__ == '__main__':
+    unittest.main()
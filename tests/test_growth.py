@@ -0,0 +1,66 @@
+"""Growth engines checked against each other and against the original scripts.
+
+fixtures/legacy_trees.json holds the segments and foliage positions the Maya
+scripts' create() and createPine() produced for a few seeds: the arguments
+of every polytube() call, in call order, and of every foliage move.
+"""
+import json
+import os
+import unittest
+
+import numpy as np
+
+from polytree import growth
+from polytree.params import make_params
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'legacy_trees.json')
+
+
+class EnginesAgreeTest(unittest.TestCase):
+
+    def check(self, tree_type, seeding):
+        for seed in (1, 77, 9981):
+            params = make_params(tree_type=tree_type, seed=seed, tree_depth=5 if tree_type == growth.NORMAL else 7,
+                                 branches=3, branch_chance=0.8, foliage_n=2, foliage_spread=1.0)
+            self.assertTrue(growth.engines_agree(params, seeding), 'seed %d' % seed)
+
+    def test_normal_legacy(self):
+        self.check(growth.NORMAL, 'legacy')
+
+    def test_normal_branch(self):
+        self.check(growth.NORMAL, 'branch')
+
+    def test_pine_legacy(self):
+        self.check(growth.PINE, 'legacy')
+
+    def test_pine_branch(self):
+        self.check(growth.PINE, 'branch')
+
+
+class LegacyScriptsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(FIXTURE, 'r') as f:
+            cls.trees = json.load(f)
+
+    def test_fixture_covers_both_tree_types(self):
+        self.assertEqual(sorted(set(tree['params']['tree_type'] for tree in self.trees)), [growth.NORMAL, growth.PINE])
+
+    def test_scalar_engines_match_scripts(self):
+        for tree in self.trees:
+            params = make_params(**tree['params'])
+            for engine in ('recursive', 'iterative'):
+                skeleton = growth.grow(params, engine=engine, seeding='legacy')
+                message = '%s engine, tree type %d, seed %d' % (engine, params.tree_type, params.seed)
+                for name in ('base', 'tip', 'base_radius', 'top_radius'):
+                    np.testing.assert_array_equal(getattr(skeleton, name), np.array(tree[name]),
+                                                  '%s: %s' % (message, name))
+                # the scripts place foliage after a tip's branches were grown,
+                # the skeleton keeps it in segment order
+                centres = skeleton.foliage_centres(params.foliage_n, params.foliage_spread)
+                self.assertEqual(sorted(map(tuple, centres.tolist())), sorted(map(tuple, tree['foliage'])), message)
+
+
+if __name__ == '__main__':
+    unittest.main()
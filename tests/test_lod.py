@@ -0,0 +1,60 @@
+"""Level of detail chains: outline kept, cost lowered level by level."""
+import unittest
+
+import numpy as np
+
+from polytree import foliage, growth, lod
+from polytree.params import make_params
+
+
+def bounds(meshes):
+    points = np.concatenate([part.points for part in meshes if part.vertex_count])
+    return points.min(0), points.max(0)
+
+
+class LodTest(unittest.TestCase):
+
+    def check(self, params):
+        meshes = lod.lod_meshes(params)
+        full_min, full_max = bounds(meshes[0])
+        size = full_max - full_min
+        for trunk, leaves in meshes[1:]:
+            low, high = bounds((trunk, leaves))
+            np.testing.assert_array_less(np.abs(low - full_min), 0.15 * size)
+            np.testing.assert_array_less(np.abs(high - full_max), 0.15 * size)
+        faces = [trunk.face_count + leaves.face_count for trunk, leaves in meshes]
+        self.assertEqual(faces, sorted(faces, reverse=True))
+        self.assertLess(faces[-1], faces[0])
+
+    def test_normal_tree_outline(self):
+        self.check(make_params(tree_depth=6, branches=3, foliage_n=2, foliage_spread=0.5))
+
+    def test_pine_keeps_its_height(self):
+        params = make_params(tree_type=growth.PINE, tree_depth=10, branches=3, foliage_n=2, foliage_spread=0.5)
+        self.check(params)
+        skeleton = growth.grow(params)
+        for level in lod.default_levels(params):
+            self.assertEqual(lod.prune(skeleton, level.min_radius).tip[:, 1].max(), skeleton.tip[:, 1].max())
+
+    def test_cluster_count_goes_down(self):
+        params = make_params(tree_depth=6, branches=3, foliage_n=4, foliage_spread=0.5)
+        skeleton = growth.grow(params)
+        cluster = foliage.cluster_mesh(params.foliage_s, 0)
+        counts = [leaves.face_count // cluster.face_count
+                  for trunk, leaves in lod.lod_meshes(params, [level._replace(foliage_r=0)
+                                                                for level in lod.default_levels(params)])]
+        self.assertEqual(counts[0], len(skeleton.foliage_centres(params.foliage_n, params.foliage_spread)))
+        self.assertTrue(all(a > b for a, b in zip(counts, counts[1:])), counts)
+        self.assertLess(counts[-1], counts[0] / 4.0)
+
+    def test_trunk_is_never_pruned(self):
+        params = make_params(tree_depth=6, branches=3)
+        skeleton = growth.grow(params)
+        trunk = lod.trunk_segments(skeleton)
+        keep = lod.kept_segments(skeleton, params.radius * 2)
+        np.testing.assert_array_equal(keep, trunk)
+        self.assertTrue(trunk[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Parallel growth against growing the tree in one process."""
+import unittest
+
+import numpy as np
+
+from polytree import growth, parallel
+from polytree.params import make_params
+
+
+class GrowParallelTest(unittest.TestCase):
+
+    def check(self, params, **options):
+        expected = growth.grow(params, seeding='branch')
+        skeleton = parallel.grow_parallel(params, **options)
+        for name in ('parent', 'base', 'tip', 'base_radius', 'top_radius', 'depth', 'leaf', 'foliage_jitter'):
+            np.testing.assert_array_equal(getattr(skeleton, name), getattr(expected, name), name)
+
+    def test_normal_tree(self):
+        self.check(make_params(tree_depth=6, branches=3, branch_chance=0.8), processes=1)
+
+    def test_pine_on_two_workers(self):
+        self.check(make_params(tree_type=growth.PINE, tree_depth=9, branches=3), processes=2, split_level=3)
+
+    def test_split_and_branches_cover_the_tree(self):
+        params = make_params(tree_depth=5, branches=3)
+        top, branches = growth.grow_split(params, 2)
+        subtrees = [growth.grow_branch(params, branch) for branch, parent, grown in branches]
+        expected = growth.grow(params, seeding='branch')
+        self.assertEqual(len(top) + sum(len(subtree) for subtree in subtrees), len(expected))
+        self.assertTrue(all(0 <= parent < len(top) for branch, parent, grown in branches))
+
+    def test_needs_branch_seeding(self):
+        self.assertRaises(ValueError, parallel.grow_parallel, make_params(), seeding='legacy')
+
+
+if __name__ == '__main__':
+    unittest.main()
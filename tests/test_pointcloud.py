@@ -0,0 +1,74 @@
+"""Foliage point clouds written and read back."""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from polytree import growth, pointcloud
+from polytree.export import export_tree
+from polytree.params import make_params
+
+
+class PointCloudTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.centres = np.random.RandomState(5).uniform(-10, 10, (500, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        rows = {}
+        for format in pointcloud.FORMATS:
+            path = os.path.join(self.directory, 'points.' + format)
+            self.assertEqual(pointcloud.write_points(path, self.centres, 1.5, 42), len(self.centres))
+            rows[format] = pointcloud.read_points(path)
+            self.assertEqual(rows[format].shape, (len(self.centres), len(pointcloud.COLUMNS)))
+            np.testing.assert_allclose(rows[format][:, :3], self.centres, rtol=1e-6, atol=1e-5)
+            np.testing.assert_array_equal(rows[format][:, 3], 1.5)
+            np.testing.assert_allclose((rows[format][:, 4:] ** 2).sum(1), 1.0, rtol=1e-5)
+        np.testing.assert_allclose(rows['bin'], rows['txt'], rtol=1e-6, atol=1e-6)
+
+    def test_chunks_do_not_change_the_rotations(self):
+        whole = os.path.join(self.directory, 'whole.bin')
+        pointcloud.write_points(whole, self.centres, 1.0, 7)
+        chunked = os.path.join(self.directory, 'chunked.bin')
+        writer = pointcloud.PointWriter(chunked, 1.0, 7)
+        for start in range(0, len(self.centres), 33):
+            writer.write(self.centres[start:start + 33])
+        writer.close()
+        np.testing.assert_array_equal(pointcloud.read_points(chunked), pointcloud.read_points(whole))
+        other = os.path.join(self.directory, 'other.bin')
+        pointcloud.write_points(other, self.centres, 1.0, 8)
+        self.assertFalse(np.array_equal(pointcloud.read_points(other)[:, 4:], pointcloud.read_points(whole)[:, 4:]))
+
+    def test_rotations_are_uniform(self):
+        # a uniform rotation turns the y axis to a uniform direction
+        q = pointcloud.random_rotations(np.random.RandomState(1), 20000)
+        x, y, z, w = q.T
+        directions = np.column_stack((2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x)))
+        np.testing.assert_allclose((directions ** 2).sum(1), 1.0, rtol=1e-9)
+        np.testing.assert_allclose(directions.mean(0), 0.0, atol=0.03)
+
+    def test_empty_and_unknown_formats(self):
+        path = os.path.join(self.directory, 'empty.bin')
+        pointcloud.write_points(path, np.zeros((0, 3)), 1.0, 0)
+        self.assertEqual(pointcloud.read_points(path).shape, (0, 8))
+        self.assertRaises(ValueError, pointcloud.PointWriter, os.path.join(self.directory, 'points.csv'), 1.0, 0)
+
+    def test_exporter_writes_every_cluster(self):
+        params = make_params(tree_depth=5, branches=3, foliage_n=2, foliage_spread=0.5, foliage_s=0.7)
+        path = os.path.join(self.directory, 'foliage.bin')
+        counts = export_tree(params, os.path.join(self.directory, 'tree.obj'), chunk_size=5, foliage_points=path)
+        rows = pointcloud.read_points(path)
+        centres = growth.grow(params).foliage_centres(params.foliage_n, params.foliage_spread)
+        self.assertEqual(len(rows), counts['foliage_clusters'])
+        np.testing.assert_allclose(np.sort(rows[:, :3], axis=0), np.sort(centres, axis=0), rtol=1e-6, atol=1e-5)
+        np.testing.assert_allclose(rows[:, 3], 0.7, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Ring side counts following the branch radius, and the tubes between them."""
+import collections
+import unittest
+
+import numpy as np
+
+from polytree import growth, mesh, rings
+from polytree.params import make_params
+
+
+def directed_edges(face_counts, face_connects):
+    # Counter of the (from, to) edges of every face, in winding order
+    edges = collections.Counter()
+    start = 0
+    for count in np.asarray(face_counts).tolist():
+        face = face_connects[start:start + count].tolist()
+        edges.update(zip(face, face[1:] + face[:1]))
+        start += count
+    return edges
+
+
+class RingSidesTest(unittest.TestCase):
+
+    def test_sides_follow_the_radius(self):
+        radius = np.array([1.0, 0.5, 0.26, 0.1, 0.01])
+        np.testing.assert_array_equal(rings.ring_sides(radius, 1.0, 12), [12] * 5)
+        np.testing.assert_array_equal(rings.ring_sides(radius, 1.0, 12, 4), [12, 6, 4, 4, 4])
+        np.testing.assert_array_equal(rings.ring_sides(radius, 1.0, 12, 4, twig_radius=0.05), [12, 6, 4, 4, 3])
+        np.testing.assert_array_equal(rings.ring_sides(radius, 1.0, 12, twig_radius=0.2), [12, 12, 12, 3, 3])
+        # min_polys above polys leaves every ring at polys
+        np.testing.assert_array_equal(rings.ring_sides(radius, 1.0, 5, 8), [5] * 5)
+
+    def test_transitions_close_the_tube(self):
+        for m, n in ((8, 8), (8, 5), (5, 8), (12, 3), (3, 4)):
+            counts, connects = rings.transition_indices(m, n)
+            edges = directed_edges(counts, connects)
+            self.assertEqual(len(counts), m if m == n else m + n)
+            # each ring edge is used once, each edge between the rings once
+            # in either direction
+            for i in range(m):
+                self.assertEqual(edges[((i + 1) % m, i)], 1)
+            for j in range(n):
+                self.assertEqual(edges[(m + j, m + (j + 1) % n)], 1)
+            self.assertTrue(all(count == 1 for count in edges.values()))
+            self.assertTrue(all(edges[(b, a)] == 1 for a, b in edges if (a < m) != (b < m)))
+        self.assertIs(rings.transition_indices(8, 5)[1], rings.transition_indices(8, 5)[1])
+
+
+class AdaptiveTubeTest(unittest.TestCase):
+
+    def test_tube_mesh_is_closed_along_the_branches(self):
+        params = make_params(tree_depth=6, branches=3, radius=1.0, polycount=16)
+        skeleton = growth.grow(params)
+        fixed = mesh.tube_mesh(skeleton, params.polycount)
+        for twist in mesh.TWISTS:
+            adaptive = mesh.tube_mesh(skeleton, params.polycount, twist, min_polys=4, twig_radius=0.05)
+            self.assertLess(adaptive.vertex_count, fixed.vertex_count)
+            sides = rings.ring_sides(skeleton.top_radius, skeleton.base_radius[0], params.polycount, 4, 0.05)
+            self.assertEqual(adaptive.vertex_count, sides.sum() + params.polycount)
+            self.assertGreaterEqual(len(set(sides.tolist())), 3)
+            self.assertLess(adaptive.face_connects.max(), adaptive.vertex_count)
+            # a joint ring is shared by every branch leaving it, but the
+            # edges along a tube belong to that tube alone: each is walked
+            # once either way, so the winding agrees
+            ring = np.repeat(np.arange(len(sides) + 1), np.append(sides, params.polycount))
+            edges = directed_edges(adaptive.face_counts, adaptive.face_connects)
+            along = [(a, b) for a, b in edges if ring[a] != ring[b]]
+            self.assertTrue(along)
+            self.assertTrue(all(edges[(a, b)] == 1 and edges[(b, a)] == 1 for a, b in along))
+
+    def test_without_min_polys_rings_keep_polycount(self):
+        skeleton = growth.grow(make_params(tree_depth=5, branches=3))
+        full = mesh.tube_mesh(skeleton, 8)
+        self.assertEqual(full.vertex_count, 8 * (len(skeleton) + 1))
+        np.testing.assert_array_equal(full.face_counts, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
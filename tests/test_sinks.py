@@ -0,0 +1,38 @@
+"""Mesh sinks without Maya."""
+import unittest
+
+import numpy as np
+
+from polytree import foliage, pipeline
+from polytree.params import make_params
+from polytree.pipeline import FOLIAGE_NAME, TRUNK_NAME
+from polytree.sinks import Instances, MemorySink
+
+
+class MemorySinkTest(unittest.TestCase):
+
+    def test_commit_keeps_instances(self):
+        params = make_params(tree_depth=4, foliage_n=2, foliage_spread=0.5)
+        merged = pipeline.build_tree(params, MemorySink())
+        built = pipeline.build_tree(params, MemorySink(), instance_foliage=True)
+        self.assertEqual(list(built), [TRUNK_NAME, FOLIAGE_NAME])
+        self.assertIsInstance(built[FOLIAGE_NAME], Instances)
+        cluster, translations = built[FOLIAGE_NAME]
+        placed = foliage.place_clusters(cluster, translations)
+        np.testing.assert_array_equal(placed.points, merged[FOLIAGE_NAME].points)
+        np.testing.assert_array_equal(placed.face_connects, merged[FOLIAGE_NAME].face_connects)
+        np.testing.assert_array_equal(built[TRUNK_NAME].points, merged[TRUNK_NAME].points)
+
+    def test_parts_in_the_order_sent(self):
+        cluster = foliage.cluster_mesh(1.0, 0)
+        sink = MemorySink()
+        sink.add_instances('b', cluster, [[0.0, 1.0, 2.0]], 'leaves')
+        sink.add_mesh('a', cluster)
+        parts = sink.commit()
+        self.assertEqual(list(parts), ['b', 'a'])
+        np.testing.assert_array_equal(parts['b'].translations, [[0.0, 1.0, 2.0]])
+        self.assertEqual(sink.materials, {'a': None, 'b': 'leaves'})
+
+
+if __name__ == '__main__':
+    unittest.main()